@@ -0,0 +1,106 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+#
+# Download time of a large result file, single stream vs parallel ranged GETs.
+# Athena is mocked by moto, results are read from a local S3 stand-in (localstack, see makefile).
+# A local stand-in has no per-connection bandwidth limit, so the gain on real S3 is larger.
+#
+# $ python benchmarks/bench_athena_ranged.py --endpoint-url http://localhost:4566
+# ---------------------------------------------------------------------------
+
+import argparse
+import os
+import sys
+import time
+
+import boto3
+import numpy as np
+import pandas as pd
+from moto.athena import mock_athena
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pyawswrapper import AthenaClient  # noqa: E402
+
+bucket = 'localstack-bucket'
+
+
+def result_key(rows: int) -> str:
+    # moto reports the workplace as OutputLocation
+    return f'bench/ranged_{rows}/'
+    # end def
+
+
+def upload(rows: int) -> int:
+    my_client = boto3.client('s3')
+    response = my_client.list_objects_v2(Bucket=bucket, Prefix=result_key(rows))
+    if response.get('KeyCount', 0) > 0:
+        return response['Contents'][0]['Size']
+        # end if
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'value': np.random.rand(rows),
+        'name': [f'name_{x % 1000}' for x in range(rows)]})
+    body = df.to_csv(index=False).encode()
+    my_client.put_object(Bucket=bucket, Key=result_key(rows), Body=body)
+    return len(body)
+    # end def
+
+
+def measure(rows: int, part_size: int, concurrency: int, repeat: int) -> float:
+    my_athena = AthenaClient(
+        region='ap-northeast-1',
+        database='dummy',
+        workplace=f's3://{bucket}/{result_key(rows)}',
+        polling_time=0,
+        ranged_download_threshold=None if concurrency == 0 else part_size,
+        download_part_size=part_size,
+        download_concurrency=max(1, concurrency))
+
+    elapsed = []
+    with mock_athena():
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            count = len(my_athena.run_query('SELECT dummy'))
+            elapsed.append(time.perf_counter() - started_at)
+            assert count == rows
+            # end for
+        # end with
+    return min(elapsed)
+    # end def
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--endpoint-url', default='http://localhost:4566')
+    parser.add_argument('--rows', type=int, default=4000000)
+    parser.add_argument('--part-size', type=int, default=8 * 1024 ** 2)
+    parser.add_argument('--concurrency', type=int, nargs='*',
+                        default=[0, 2, 4, 8, 16])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ['AWS_ENDPOINT_URL_S3'] = args.endpoint_url
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'localstack')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'localstack')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+
+    size = upload(args.rows)
+    print(f'rows: {args.rows}, size: {size / 1024 ** 2:.1f} MiB, part_size: {args.part_size / 1024 ** 2:.1f} MiB')
+    print(f'{"concurrency":>12} {"seconds":>10}')
+    for concurrency in args.concurrency:
+        seconds = measure(args.rows, args.part_size,
+                          concurrency, args.repeat)
+        # 0 is the single stream
+        print(f'{concurrency if concurrency > 0 else "single":>12} {seconds:>10.2f}')
+        # end for
+    # end def
+
+
+if __name__ == '__main__':
+    main()
+    # end if
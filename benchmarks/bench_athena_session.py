@@ -0,0 +1,81 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.9.1'
+# ---------------------------------------------------------------------------
+#
+# Per-query overhead of AthenaClient against moto.
+#   before: a new AthenaClient for every query, i.e. a new boto3.Session and client per call
+#   after:  one AthenaClient, the session and client are reused
+#
+# $ python benchmarks/bench_athena_session.py
+# ---------------------------------------------------------------------------
+
+import argparse
+import os
+import sys
+import time
+
+from moto.athena import mock_athena
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pyawswrapper import AthenaClient  # noqa: E402
+
+workplace = 's3://bench-bucket/athena/'
+
+
+def new_client() -> AthenaClient:
+    return AthenaClient(
+        region='ap-northeast-1',
+        database='dummy',
+        workplace=workplace,
+        polling_time=0)
+    # end def
+
+
+def bench_before(count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        new_client().run_query('SELECT 1', return_path=True)
+        # end for
+    return (time.perf_counter() - start) / count
+    # end def
+
+
+def bench_after(count: int) -> float:
+    my_athena = new_client()
+    my_athena.run_query('SELECT 1', return_path=True)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        my_athena.run_query('SELECT 1', return_path=True)
+        # end for
+    return (time.perf_counter() - start) / count
+    # end def
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+    with mock_athena():
+        before = bench_before(args.count)
+        after = bench_after(args.count)
+        # end with
+
+    print(f'queries: {args.count}')
+    print(f'before (session per call): {before * 1000:.2f} ms/query')
+    print(f'after  (session reused)  : {after * 1000:.2f} ms/query')
+    print(f'speedup: {before / after:.1f}x')
+    # end def
+
+
+if __name__ == '__main__':
+    main()
+    # end if
@@ -0,0 +1,118 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+#
+# Peak memory of run_query and run_query_iter by result size.
+# Athena is mocked by moto, results are read from a local S3 stand-in (localstack, see makefile).
+# Each measurement runs in its own process and reports the growth of max RSS during the query.
+#
+# $ python benchmarks/bench_athena_stream.py --endpoint-url http://localhost:4566
+# ---------------------------------------------------------------------------
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+
+import boto3
+import numpy as np
+import pandas as pd
+from moto.athena import mock_athena
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pyawswrapper import AthenaClient  # noqa: E402
+
+bucket = 'localstack-bucket'
+
+
+def result_key(rows: int) -> str:
+    # moto reports the workplace as OutputLocation
+    return f'bench/stream_{rows}/'
+    # end def
+
+
+def upload(rows: int):
+    if boto3.client('s3').list_objects_v2(Bucket=bucket, Prefix=result_key(rows)).get('KeyCount', 0) > 0:
+        return
+        # end if
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'value': np.random.rand(rows),
+        'name': [f'name_{x % 1000}' for x in range(rows)]})
+    boto3.client('s3').put_object(
+        Bucket=bucket, Key=result_key(rows), Body=df.to_csv(index=False).encode())
+    # end def
+
+
+def measure(mode: str, rows: int, chunksize: int):
+    my_athena = AthenaClient(
+        region='ap-northeast-1',
+        database='dummy',
+        workplace=f's3://{bucket}/{result_key(rows)}',
+        polling_time=0)
+
+    with mock_athena():
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        count = 0
+        if mode == 'full':
+            count = len(my_athena.run_query('SELECT dummy'))
+        else:
+            for this_chunk in my_athena.run_query_iter('SELECT dummy', chunksize=chunksize):
+                count += len(this_chunk)
+                # end for
+            # end if
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # end with
+    assert count == rows
+    # ru_maxrss is KiB on Linux
+    print(f'{(peak - baseline) / 1024:.1f}')
+    # end def
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--endpoint-url', default='http://localhost:4566')
+    parser.add_argument('--rows', type=int, nargs='*',
+                        default=[250000, 1000000, 4000000])
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--measure', choices=['upload', 'full', 'iter'])
+    args = parser.parse_args()
+
+    os.environ['AWS_ENDPOINT_URL_S3'] = args.endpoint_url
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'localstack')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'localstack')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+
+    if args.measure == 'upload':
+        upload(args.rows[0])
+        return
+    elif args.measure is not None:
+        measure(args.measure, args.rows[0], args.chunksize)
+        return
+        # end if
+
+    print(f'chunksize: {args.chunksize}')
+    print(f'{"rows":>10} {"run_query MiB":>15} {"run_query_iter MiB":>20}')
+    for rows in args.rows:
+        # every step runs in its own process, max RSS is inherited by the child processes
+        peaks = []
+        for mode in ['upload', 'full', 'iter']:
+            output = subprocess.run(
+                [sys.executable, __file__, '--measure', mode, '--rows', str(rows),
+                 '--chunksize', str(args.chunksize), '--endpoint-url', args.endpoint_url],
+                check=True, capture_output=True, text=True).stdout
+            peaks.append(output.strip().split('\n')[-1])
+            # end for
+        print(f'{rows:>10} {peaks[1]:>15} {peaks[2]:>20}')
+        # end for
+    # end def
+
+
+if __name__ == '__main__':
+    main()
+    # end if
@@ -0,0 +1,93 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+#
+# Transfer time of many small files, awscli subprocess vs boto3 TransferManager.
+# Files are read from and written to a local S3 stand-in (localstack, see makefile).
+#
+# $ python benchmarks/bench_s3client_backend.py --files 500
+# ---------------------------------------------------------------------------
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pyawswrapper import s3client  # noqa: E402
+
+bucket = 'localstack-bucket'
+
+
+def make_files(directory: Path, files: int, size: int):
+    for x in range(files):
+        directory.joinpath(f'dir{x % 10}').mkdir(exist_ok=True)
+        directory.joinpath(f'dir{x % 10}', f'file{x}.bin').write_bytes(
+            os.urandom(size))
+        # end for
+    # end def
+
+
+def measure(backend: str, directory: Path, repeat: int) -> tuple:
+    my_s3client = s3client(use_local=True, backend=backend,
+                           error_as_exception=True)
+    s3target = f's3://{bucket}/bench/backend_{backend}'
+
+    up_elapsed = []
+    get_elapsed = []
+    for x in range(repeat):
+        started_at = time.perf_counter()
+        my_s3client.UpTos3(directory, s3target, recursive=True)
+        up_elapsed.append(time.perf_counter() - started_at)
+
+        get_to = directory.parent.joinpath(f'get_{backend}_{x}')
+        started_at = time.perf_counter()
+        my_s3client.GetFroms3(s3target, get_to, recursive=True)
+        get_elapsed.append(time.perf_counter() - started_at)
+        shutil.rmtree(get_to)
+        # end for
+    return (min(up_elapsed), min(get_elapsed))
+    # end def
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=500)
+    parser.add_argument('--size', type=int, default=4 * 1024)
+    parser.add_argument('--backend', nargs='*',
+                        default=['subprocess', 'boto3'])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'localstack')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'localstack')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+
+    tempdir = Path(tempfile.mkdtemp())
+    try:
+        directory = tempdir.joinpath('files')
+        directory.mkdir()
+        make_files(directory, args.files, args.size)
+
+        print(f'files: {args.files}, size: {args.size} bytes')
+        print(f'{"backend":>12} {"UpTos3":>10} {"GetFroms3":>10}')
+        for backend in args.backend:
+            up_seconds, get_seconds = measure(backend, directory, args.repeat)
+            print(f'{backend:>12} {up_seconds:>10.2f} {get_seconds:>10.2f}')
+            # end for
+    finally:
+        shutil.rmtree(tempdir)
+        # end try
+    # end def
+
+
+if __name__ == '__main__':
+    main()
+    # end if
@@ -0,0 +1,89 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+#
+# Upload time of many small files to different keys, UpTos3 per file vs upload_many.
+# Files are written to a local S3 stand-in (localstack, see makefile).
+#
+# $ python benchmarks/bench_s3client_many.py --files 200
+# ---------------------------------------------------------------------------
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from boto3.s3.transfer import TransferConfig
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pyawswrapper import s3client  # noqa: E402
+
+bucket = 'localstack-bucket'
+
+
+def per_file(backend: str, pairs: list) -> float:
+    my_s3client = s3client(use_local=True, backend=backend,
+                           error_as_exception=True)
+    started_at = time.perf_counter()
+    for source, destination in pairs:
+        # UpTos3 takes the directory of the key
+        my_s3client.UpTos3(source, destination.rsplit('/', 1)[0])
+        # end for
+    return time.perf_counter() - started_at
+    # end def
+
+
+def upload_many(pairs: list, concurrency: int) -> float:
+    my_s3client = s3client(use_local=True, error_as_exception=True,
+                           transfer_config=TransferConfig(max_concurrency=concurrency))
+    started_at = time.perf_counter()
+    my_s3client.upload_many(pairs)
+    return time.perf_counter() - started_at
+    # end def
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--size', type=int, default=4 * 1024)
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 10, 32])
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'localstack')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'localstack')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+
+    tempdir = Path(tempfile.mkdtemp())
+    try:
+        pairs = []
+        for x in range(args.files):
+            source = tempdir.joinpath(f'file{x}.bin')
+            source.write_bytes(os.urandom(args.size))
+            pairs.append(
+                (str(source), f's3://{bucket}/bench/many/dir{x}/file{x}.bin'))
+            # end for
+
+        print(f'files: {args.files}, size: {args.size} bytes')
+        print(f'{"method":>24} {"seconds":>10}')
+        for backend in ['subprocess', 'boto3']:
+            print(f'{"UpTos3 " + backend:>24} {per_file(backend, pairs):>10.2f}')
+            # end for
+        for concurrency in args.concurrency:
+            print(f'{f"upload_many {concurrency}":>24} {upload_many(pairs, concurrency):>10.2f}')
+            # end for
+    finally:
+        shutil.rmtree(tempdir)
+        # end try
+    # end def
+
+
+if __name__ == '__main__':
+    main()
+    # end if
@@ -1,11 +1,39 @@
+from .asyncathenaclient import AsyncAthenaClient
 from .athenaclient import AthenaCallException, AthenaClient
+from .athenafuture import AthenaQueryFuture
+from .instrumentation import (CallbackInstrumentation, Instrumentation,
+                              TracerInstrumentation)
+from .parseoptions import ParseOptions
+from .pollingstrategy import BackoffPolling, FixedPolling, PollingStrategy
+from .querystats import AthenaQueryStats
+from .resultcache import AthenaResultCache
 from .s3client import ClientErrorException, s3client
+from .s3object import S3Object
 from .s3path import s3path
+from .spilledresult import SpilledResult
+from .syncplan import SyncAction, SyncPlan
+from .transferresult import TransferResult
 
 __all__ = [
     'AthenaClient',
+    'AsyncAthenaClient',
     's3path',
     's3client',
+    'S3Object',
     'AthenaCallException',
-    'ClientErrorException'
+    'AthenaQueryFuture',
+    'AthenaQueryStats',
+    'AthenaResultCache',
+    'ClientErrorException',
+    'PollingStrategy',
+    'FixedPolling',
+    'BackoffPolling',
+    'Instrumentation',
+    'CallbackInstrumentation',
+    'TracerInstrumentation',
+    'ParseOptions',
+    'SpilledResult',
+    'SyncPlan',
+    'SyncAction',
+    'TransferResult'
 ]
@@ -0,0 +1,134 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+import asyncio
+from typing import Any, Coroutine, Dict, List, Union
+
+import pandas as pd
+
+from .athenaclient import AthenaClient
+from .athenafuture import AthenaQueryFuture
+
+
+class AsyncAthenaClient(object):
+    # asyncio interface of AthenaClient.
+    # Queries are polled by the shared poller of AthenaClient and blocking boto3 calls run on threads,
+    # so the event loop is never blocked.
+
+    def __init__(self, client: AthenaClient = None, **kwargs: Any):
+        super(AsyncAthenaClient, self).__init__()
+
+        if client is None:
+            client = AthenaClient(**kwargs)
+            # end if
+        self.__client = client
+        # end def
+
+    @property
+    def client(self) -> AthenaClient:
+        # get only property
+        return self.__client
+        # end def
+
+    async def run_query(self,
+                        query: str,
+                        database: str = None,
+                        dtype: Dict = None,
+                        return_path: bool = False,
+                        **kwargs: Any) -> Union[pd.DataFrame, str]:
+
+        handle = await asyncio.to_thread(self.client.submit_query,
+                                         query,
+                                         database=database,
+                                         dtype=dtype,
+                                         return_path=return_path,
+                                         **kwargs)
+        return await self.__wait(handle)
+        # end def
+
+    async def run_queries(self,
+                          queries: List[str],
+                          database: str = None,
+                          dtypes: List[Dict] = None,
+                          return_paths: bool = False,
+                          **kwargs: Any) -> List[Union[pd.DataFrame, str]]:
+
+        if dtypes is None:
+            dtypes = [None for _ in range(len(queries))]
+            # end if
+
+        return await self.__gather([self.run_query(queries[x],
+                                                   database=database,
+                                                   dtype=dtypes[x],
+                                                   return_path=return_paths,
+                                                   **kwargs) for x in range(len(queries))])
+        # end def
+
+    async def run_nonquery(self,
+                           query: str,
+                           database: str = None) -> str:
+
+        handle = await asyncio.to_thread(self.client.submit_nonquery,
+                                         query,
+                                         database=database)
+        return await self.__wait(handle)
+        # end def
+
+    async def run_nonqueries(self,
+                             queries: List[str],
+                             database: str = None) -> List[str]:
+
+        return await self.__gather([self.run_nonquery(x, database=database) for x in queries])
+        # end def
+
+    async def __gather(self, coroutines: List[Coroutine]) -> List[Any]:
+
+        tasks = [asyncio.ensure_future(x) for x in coroutines]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            # a failure or cancellation, the other queries are cancelled
+            for this_task in tasks:
+                this_task.cancel()
+                # end for
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+            # end try
+        # end def
+
+    async def __wait(self, handle: AthenaQueryFuture) -> Any:
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        handle.add_done_callback(
+            lambda x: loop.call_soon_threadsafe(self._copy_result, x, future))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # the coroutine is cancelled, so is the query
+            await asyncio.to_thread(handle.cancel)
+            raise
+            # end try
+        # end def
+
+    @staticmethod
+    def _copy_result(handle: AthenaQueryFuture, future: asyncio.Future):
+        if future.done():
+            return
+            # end if
+
+        if handle.cancelled():
+            future.cancel()
+        elif handle.exception() is not None:
+            future.set_exception(handle.exception())
+        else:
+            future.set_result(handle.result())
+            # end if
+        # end def
+
+    # end class
@@ -5,17 +5,33 @@
 # __version__ = "0.9.1"
 # ---------------------------------------------------------------------------
 
+import heapq
+import io
 import json
 import logging
+import tempfile
+import threading
 import time
-from typing import Any, Dict, List, Union
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
 
 import boto3
 import pandas as pd
 from botocore.config import Config
+from botocore.exceptions import ClientError
 from pycodehelper.json import CustomJsonEncoder
 
+from .athenafuture import AthenaQueryFuture
+from .instrumentation import Instrumentation
+from .parseoptions import ParseOptions
+from .pollingstrategy import BackoffPolling, FixedPolling, PollingStrategy
+from .querystats import AthenaQueryStats
+from .resultcache import AthenaResultCache
 from .s3path import s3path
+from .spilledresult import SpilledResult
 
 
 class AthenaCallException(Exception):
@@ -23,6 +39,36 @@ class AthenaCallException(Exception):
 
 
 class AthenaClient(object):
+    # upper limit of BatchGetQueryExecution
+    _batch_get_limit = 50
+    # retry of throttled StartQueryExecution and failed polling of the submitted queries
+    _throttling_codes = ('TooManyRequestsException', 'ThrottlingException')
+    _start_backoff = BackoffPolling(
+        initial_time=1, max_time=30, jitter=0.1, use_engine_hint=False)
+    _max_start_retries = 10
+    # retry of unprocessed ids of BatchGetQueryExecution
+    _max_unprocessed_retries = 10
+    _result_formats = ('csv', 'parquet')
+    # pandas dtypes of Athena types, date and timestamp types are parsed by `parse_dates`
+    _metadata_types = {
+        'boolean': 'boolean',
+        'tinyint': 'Int8',
+        'smallint': 'Int16',
+        'integer': 'Int32',
+        'int': 'Int32',
+        'bigint': 'Int64',
+        'float': 'float32',
+        'real': 'float32',
+        'double': 'float64',
+        'char': 'string',
+        'varchar': 'string',
+        'string': 'string'}
+    _metadata_date_types = ('date', 'timestamp', 'timestamp with time zone')
+    _result_fetch_modes = ('s3', 'api', 'auto')
+    _get_query_results_limit = 1000
+    # ranged downloads are kept in memory up to this size, then in a temporary file
+    _download_spool_size = 64 * 1024 ** 2
+
     def __init__(self,
                  profile: str = None,
                  region: str = 'ap-northeast-1',
@@ -36,7 +82,21 @@ class AthenaClient(object):
                  max_attempts: int = 0,
                  logger: logging.Logger = None,
                  error_as_exception: bool = True,
-                 non_query_massage_as_exception: bool = True):
+                 non_query_massage_as_exception: bool = True,
+                 polling_strategy: PollingStrategy = None,
+                 download_workers: int = 4,
+                 max_in_flight: int = None,
+                 use_metadata_dtypes: bool = False,
+                 result_cache: AthenaResultCache = None,
+                 result_reuse_max_age: int = None,
+                 query_timeout: float = None,
+                 instrumentation: Instrumentation = None,
+                 result_fetch_mode: str = 's3',
+                 api_fetch_threshold: int = 1024 ** 2,
+                 ranged_download_threshold: int = None,
+                 download_part_size: int = 8 * 1024 ** 2,
+                 download_concurrency: int = 8,
+                 parse_options: ParseOptions = None):
 
         super(AthenaClient, self).__init__()
 
@@ -57,6 +117,36 @@ class AthenaClient(object):
         self.__max_attempts = max_attempts
         self.__error_as_exception = error_as_exception
         self.__non_query_massage_as_exception = non_query_massage_as_exception
+        self.__polling_strategy = polling_strategy
+        self.__download_workers = download_workers
+        self.__max_in_flight = max_in_flight
+        self.__use_metadata_dtypes = use_metadata_dtypes
+        self.__result_cache = result_cache
+        self.__result_reuse_max_age = result_reuse_max_age
+        self.__query_timeout = query_timeout
+        self.instrumentation = instrumentation
+        self.result_fetch_mode = result_fetch_mode
+        self.__api_fetch_threshold = api_fetch_threshold
+        self.__ranged_download_threshold = ranged_download_threshold
+        self.__download_part_size = download_part_size
+        self.__download_concurrency = download_concurrency
+        self.__parse_options = parse_options
+        self.__last_query_stats = []
+        self.__summary_lock = threading.Lock()
+        self.__query_stats_summary = self.__empty_summary()
+
+        self.__session_lock = threading.Lock()
+        self.__session = None
+        self.__session_key = None
+        self.__clients = {}
+        self.__clients_key = None
+
+        # shared poller of the submitted queries
+        self.__poller_lock = threading.Lock()
+        self.__poller_thread = None
+        self.__poller_polling_count = 0
+        self.__submitted = {}
+        self.__download_executor = None
 
         self.__config_refresh()
         # end def
@@ -74,6 +164,37 @@ class AthenaClient(object):
         self.__config = config
         # end def
 
+    def __get_client(self, service_name: str) -> Any:
+        # boto3 clients are thread-safe, but sessions are not.
+        # The session and clients are rebuilt only when profile, region or config changed.
+        clients_key = (self.__profile, self.__region, self.__config,
+                       self.__config.connect_timeout, self.__config.read_timeout,
+                       json.dumps(self.__config.retries, sort_keys=True))
+
+        with self.__session_lock:
+            if self.__clients_key != clients_key:
+                self.__clients = {}
+                self.__clients_key = clients_key
+                # end if
+
+            if service_name not in self.__clients:
+                session_key = (self.__profile, self.__region)
+                if self.__session is None or self.__session_key != session_key:
+                    self.__session = boto3.Session(
+                        region_name=self.__region,
+                        profile_name=self.__profile)
+                    self.__session_key = session_key
+                    # end if
+
+                self.__clients[service_name] = self.__session.client(
+                    service_name,
+                    region_name=self.__region,
+                    config=self.__config)
+                # end if
+            return self.__clients[service_name]
+            # end with
+        # end def
+
     def get_profile(self) -> float:
         return self.__profile
         # end def
@@ -149,6 +270,226 @@ class AthenaClient(object):
 
     polling_time = property(get_polling_time, set_polling_time)
 
+    def get_polling_strategy(self) -> PollingStrategy:
+        # `FixedPolling(polling_time)` is used when it is None
+        return self.__polling_strategy
+        # end def
+
+    def set_polling_strategy(self, value: PollingStrategy):
+        self.__polling_strategy = value
+        # end def
+
+    polling_strategy = property(get_polling_strategy, set_polling_strategy)
+
+    def get_download_workers(self) -> int:
+        return self.__download_workers
+        # end def
+
+    def set_download_workers(self, value: int):
+        self.__download_workers = value
+        # end def
+
+    download_workers = property(get_download_workers, set_download_workers)
+
+    def get_max_in_flight(self) -> int:
+        # None means no limit
+        return self.__max_in_flight
+        # end def
+
+    def set_max_in_flight(self, value: int):
+        self.__max_in_flight = value
+        # end def
+
+    max_in_flight = property(get_max_in_flight, set_max_in_flight)
+
+    def get_use_metadata_dtypes(self) -> bool:
+        return self.__use_metadata_dtypes
+        # end def
+
+    def set_use_metadata_dtypes(self, value: bool):
+        self.__use_metadata_dtypes = value
+        # end def
+
+    use_metadata_dtypes = property(
+        get_use_metadata_dtypes,
+        set_use_metadata_dtypes)
+
+    def get_result_cache(self) -> AthenaResultCache:
+        return self.__result_cache
+        # end def
+
+    def set_result_cache(self, value: AthenaResultCache):
+        self.__result_cache = value
+        # end def
+
+    result_cache = property(get_result_cache, set_result_cache)
+
+    def get_result_reuse_max_age(self) -> int:
+        # minutes, None disables the result reuse of Athena
+        return self.__result_reuse_max_age
+        # end def
+
+    def set_result_reuse_max_age(self, value: int):
+        self.__result_reuse_max_age = value
+        # end def
+
+    result_reuse_max_age = property(
+        get_result_reuse_max_age,
+        set_result_reuse_max_age)
+
+    def get_query_timeout(self) -> float:
+        # seconds for a run_* call, None waits forever
+        return self.__query_timeout
+        # end def
+
+    def set_query_timeout(self, value: float):
+        self.__query_timeout = value
+        # end def
+
+    query_timeout = property(get_query_timeout, set_query_timeout)
+
+    def get_instrumentation(self) -> Instrumentation:
+        return self.__instrumentation
+        # end def
+
+    def set_instrumentation(self, value: Instrumentation):
+        # None disables the instrumentation
+        self.__instrumentation = value if value is not None else Instrumentation()
+        # end def
+
+    instrumentation = property(get_instrumentation, set_instrumentation)
+
+    def get_result_fetch_mode(self) -> str:
+        # 's3' downloads the result file, 'api' pages GetQueryResults, 'auto' chooses by api_fetch_threshold
+        return self.__result_fetch_mode
+        # end def
+
+    def set_result_fetch_mode(self, value: str):
+        if value not in self._result_fetch_modes:
+            raise ValueError(
+                f'result_fetch_mode should be one of {self._result_fetch_modes}: {value}')
+            # end if
+        self.__result_fetch_mode = value
+        # end def
+
+    result_fetch_mode = property(get_result_fetch_mode, set_result_fetch_mode)
+
+    def get_api_fetch_threshold(self) -> int:
+        # bytes of the result file, smaller ones are fetched with GetQueryResults in 'auto'
+        return self.__api_fetch_threshold
+        # end def
+
+    def set_api_fetch_threshold(self, value: int):
+        self.__api_fetch_threshold = value
+        # end def
+
+    api_fetch_threshold = property(
+        get_api_fetch_threshold,
+        set_api_fetch_threshold)
+
+    def get_ranged_download_threshold(self) -> int:
+        # bytes, larger result files are downloaded with parallel ranged GETs, None disables it
+        return self.__ranged_download_threshold
+        # end def
+
+    def set_ranged_download_threshold(self, value: int):
+        self.__ranged_download_threshold = value
+        # end def
+
+    ranged_download_threshold = property(
+        get_ranged_download_threshold,
+        set_ranged_download_threshold)
+
+    def get_download_part_size(self) -> int:
+        return self.__download_part_size
+        # end def
+
+    def set_download_part_size(self, value: int):
+        self.__download_part_size = value
+        # end def
+
+    download_part_size = property(
+        get_download_part_size,
+        set_download_part_size)
+
+    def get_download_concurrency(self) -> int:
+        return self.__download_concurrency
+        # end def
+
+    def set_download_concurrency(self, value: int):
+        self.__download_concurrency = value
+        # end def
+
+    download_concurrency = property(
+        get_download_concurrency,
+        set_download_concurrency)
+
+    def get_parse_options(self) -> ParseOptions:
+        # None parses with the defaults of pandas
+        return self.__parse_options
+        # end def
+
+    def set_parse_options(self, value: ParseOptions):
+        self.__parse_options = value
+        # end def
+
+    parse_options = property(get_parse_options, set_parse_options)
+
+    @property
+    def last_query_stats(self) -> List[AthenaQueryStats]:
+        # get only property
+        # stats of the last run_* call in input order, None for the queries not executed
+        return self.__last_query_stats
+        # end def
+
+    @property
+    def query_stats_summary(self) -> Dict[str, int]:
+        # get only property
+        # totals of all the executed queries since the client is created or reset
+        with self.__summary_lock:
+            return dict(self.__query_stats_summary)
+            # end with
+        # end def
+
+    def reset_query_stats_summary(self):
+        with self.__summary_lock:
+            self.__query_stats_summary = self.__empty_summary()
+            # end with
+        # end def
+
+    def __enter__(self) -> 'AthenaClient':
+        return self
+        # end def
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any):
+        self.close()
+        # end def
+
+    def close(self):
+        # stops the submitted queries that are not finished yet
+        with self.__poller_lock:
+            handles = [x[0] for x in self.__submitted.values()]
+            download_executor = self.__download_executor
+            self.__download_executor = None
+            # end with
+
+        try:
+            for handle in handles:
+                try:
+                    handle.cancel()
+                except Exception as e:
+                    # the other queries are still stopped
+                    self.logger.warning(
+                        f'Athena query is not stopped, {handle.query_id}: {e}')
+                    # end try
+                # end for
+        finally:
+            if download_executor is not None:
+                download_executor.shutdown(wait=True)
+                # end if
+            # end try
+        # end def
+
     def get_connect_timeout(self) -> float:
         return self.__connect_timeout
         # end def
@@ -205,14 +546,24 @@ class AthenaClient(object):
                   database: str = None,
                   dtype: Dict = None,
                   return_path: bool = False,
-                  **kwargs: Any) -> Union[pd.DataFrame, str]:
-
-        return self.__execute([query],
-                              database=database,
-                              is_data_query=True,
-                              dtypes=[dtype],
-                              return_paths=return_path,
-                              **kwargs)[0]
+                  result_format: str = 'csv',
+                  result_reuse_max_age: int = None,
+                  return_stats: bool = False,
+                  **kwargs: Any) -> Union[pd.DataFrame, str, Tuple[Any, AthenaQueryStats]]:
+        # return_stats=True returns a tuple of the result and its AthenaQueryStats
+
+        results, query_stats = self.__execute([query],
+                                              database=database,
+                                              is_data_query=True,
+                                              dtypes=[dtype],
+                                              return_paths=return_path,
+                                              result_format=result_format,
+                                              result_reuse_max_age=result_reuse_max_age,
+                                              **kwargs)
+        if return_stats:
+            return results[0], query_stats[0]
+            # end if
+        return results[0]
         # end def
 
     def run_queries(self,
@@ -220,14 +571,60 @@ class AthenaClient(object):
                     database: str = None,
                     dtypes: List[Dict] = None,
                     return_paths: bool = False,
-                    **kwargs: Any) -> List[Union[pd.DataFrame, str]]:
+                    priorities: List[int] = None,
+                    result_format: str = 'csv',
+                    result_reuse_max_age: int = None,
+                    return_stats: bool = False,
+                    spill_to: Union[str, Path] = None,
+                    **kwargs: Any) -> Union[List[Union[pd.DataFrame, str]], Tuple[List[Any], List[AthenaQueryStats]]]:
+        # return_stats=True returns a tuple of the results and their AthenaQueryStats
+        # spill_to writes each result to a file in the directory and returns SpilledResult instead of DataFrame
+
+        results, query_stats = self.__execute(queries,
+                                              database=database,
+                                              is_data_query=True,
+                                              dtypes=dtypes,
+                                              return_paths=return_paths,
+                                              priorities=priorities,
+                                              result_format=result_format,
+                                              result_reuse_max_age=result_reuse_max_age,
+                                              spill_to=spill_to,
+                                              **kwargs)
+        if return_stats:
+            return results, query_stats
+            # end if
+        return results
+        # end def
 
-        return self.__execute(queries,
-                              database=database,
-                              is_data_query=True,
-                              dtypes=dtypes,
-                              return_paths=return_paths,
-                              **kwargs)
+    def run_query_iter(self,
+                       query: str,
+                       database: str = None,
+                       dtype: Dict = None,
+                       chunksize: int = 100000,
+                       result_reuse_max_age: int = None,
+                       **kwargs: Any) -> Iterator[pd.DataFrame]:
+        # yields DataFrames of up to `chunksize` rows, parsed straight from the S3 stream
+
+        query_output_path = self.run_query(
+            query, database=database, return_path=True, result_reuse_max_age=result_reuse_max_age)
+        if query_output_path is None:
+            # failed with error_as_exception=False
+            return
+            # end if
+
+        dtype, kwargs = self.__apply_metadata_dtypes(
+            query_output_path, dtype, kwargs)
+        # ranged downloads buffer the whole file, the chunks are parsed from the stream instead
+        body = self.__open_result(query_output_path, ranged=False)
+        try:
+            with pd.read_csv(body, dtype=dtype, chunksize=chunksize, **kwargs) as reader:
+                for this_chunk in reader:
+                    yield this_chunk
+                    # end for
+                # end with
+        finally:
+            body.close()
+            # end try
         # end def
 
     def run_nonquery(self,
@@ -236,43 +633,81 @@ class AthenaClient(object):
 
         return self.__execute([query],
                               database=database,
-                              is_data_query=False)[0]
+                              is_data_query=False)[0][0]
         # end def
 
     def run_nonqueries(self,
                        queries: List[str],
-                       database: str = None) -> List[str]:
+                       database: str = None,
+                       priorities: List[int] = None) -> List[str]:
 
         return self.__execute(queries,
                               database=database,
-                              is_data_query=False)
+                              is_data_query=False,
+                              priorities=priorities)[0]
+        # end def
+
+    def submit_query(self,
+                     query: str,
+                     database: str = None,
+                     dtype: Dict = None,
+                     return_path: bool = False,
+                     result_reuse_max_age: int = None,
+                     **kwargs: Any) -> AthenaQueryFuture:
+
+        return self.__submit(query,
+                             database=database,
+                             is_data_query=True,
+                             dtype=dtype,
+                             return_path=return_path,
+                             result_reuse_max_age=result_reuse_max_age,
+                             **kwargs)
+        # end def
+
+    def submit_nonquery(self,
+                        query: str,
+                        database: str = None) -> AthenaQueryFuture:
+
+        return self.__submit(query,
+                             database=database,
+                             is_data_query=False)
         # end def
 
     def __execute(self,
                   queries: List[str],
                   database: str,
                   is_data_query: bool = True,
-                  dtypes: List[Dict] = None,
-                  return_paths: bool = False,
-                  **kwargs: Any) -> List[Any]:
+                  **kwargs: Any) -> Tuple[List[Any], List[AthenaQueryStats]]:
+
+        with self.instrumentation.span('athena.execute', {'athena.query_count': len(queries),
+                                                          'athena.is_data_query': is_data_query}):
+            return self.__execute_queries(
+                queries, database, is_data_query=is_data_query, **kwargs)
+            # end with
+        # end def
+
+    def __execute_queries(self,
+                          queries: List[str],
+                          database: str,
+                          is_data_query: bool = True,
+                          dtypes: List[Dict] = None,
+                          return_paths: bool = False,
+                          priorities: List[int] = None,
+                          result_format: str = 'csv',
+                          result_reuse_max_age: int = None,
+                          spill_to: Union[str, Path] = None,
+                          **kwargs: Any) -> Tuple[List[Any], List[AthenaQueryStats]]:
 
         if database is None:
             database = self.database
             # end if
 
-        output_to = self.workplace
-        if not output_to.endswith('/'):
-            output_to += '/'
-            # end if
+        output_to = self.__output_to()
 
-        my_session = boto3.Session(
-            region_name=self.region,
-            profile_name=self.profile)
+        my_client = self.__get_client('athena')
 
-        my_client = my_session.client(
-            'athena',
-            region_name=self.region,
-            config=self.config)
+        polling_strategy = self.__get_polling_strategy()
+        polling_count = 0
 
         responses = {}
         query_ids = {}
@@ -282,123 +717,1010 @@ class AthenaClient(object):
             dtypes = [None for _ in range(len(queries))]
             # end if
 
+        if result_format not in self._result_formats:
+            raise ValueError(
+                f'result_format should be one of {self._result_formats}: {result_format}')
+            # end if
+
+        # cached results are not queried at all
+        cache_keys = {}
+        if self.result_cache is not None and is_data_query and not return_paths:
+            for index in range(len(queries)):
+                cache_keys[index] = self.result_cache.key(
+                    queries[index],
+                    database=database,
+                    workgroup=self.workgroup,
+                    dtype=dtypes[index],
+                    result_format=result_format,
+                    **kwargs)
+                cached_result = self.result_cache.get(cache_keys[index])
+                if cached_result is not None:
+                    if spill_to is not None:
+                        # one cached result in memory at a time
+                        cached_result = self.__write_spill(
+                            spill_to, cached_result)
+                        # end if
+                    results[index] = cached_result
+                    query_states[index] = 'SUCCEEDED'
+                    self.instrumentation.count('athena.result_cache_hits')
+                    # end if
+                # end for
+            # end if
+
+        # the same data query runs once, its result is fanned out to the other indices
+        members: Dict[int, List[int]] = {}
+        first_indices: Dict[Tuple[str, str], int] = {}
         for index in range(len(queries)):
-            additional_args = {}
-            if self.__workgroup is not None:
-                additional_args['WorkGroup'] = self.__workgroup
+            if index in results:
+                continue
+                # end if
+            fingerprint = (queries[index], database)
+            if is_data_query and fingerprint in first_indices:
+                members[first_indices[fingerprint]].append(index)
+            else:
+                first_indices[fingerprint] = index
+                members[index] = [index]
                 # end if
-            responses[index] = my_client.start_query_execution(
-                QueryString=queries[index],
-                QueryExecutionContext={'Database': database},
-                ResultConfiguration={'OutputLocation': output_to},
-                **additional_args
-            )
-            self.logger.info(
-                json.dumps(
-                    responses[index],
-                    cls=CustomJsonEncoder))
-            query_ids[index] = responses[index]['QueryExecutionId']
             # end for
 
-        while self._keep_polling(query_states):
-            for index in range(len(queries)):
-                query_status = my_client.get_query_execution(
-                    QueryExecutionId=query_ids[index])
-                query_states[index] = query_status['QueryExecution']['Status'][
-                    'State']
+        unload_paths = {}
+        if result_format == 'parquet':
+            # each query is unloaded to its own empty prefix
+            unload_paths = {x: s3path.join(output_to, 'unload', str(uuid.uuid4())) + '/'
+                            for x in members}
+            queries = [self.__unload_query(queries[x], unload_paths[x]) if x in unload_paths else queries[x]
+                       for x in range(len(queries))]
+            # end if
 
-                if query_states[index] == 'SUCCEEDED':
-                    if index in results:
-                        # wait
-                        pass
-                    else:
+        # queries are started in order of (priority, index)
+        if priorities is None:
+            priorities = [0 for _ in range(len(queries))]
+            # end if
+        pending_queries = [(min([priorities[y] for y in members[x]]), x)
+                           for x in members]
+        heapq.heapify(pending_queries)
+        throttled_count = 0
+        next_start_time = time.monotonic()
+        if self.query_timeout is None:
+            deadline = None
+        else:
+            deadline = time.monotonic() + self.query_timeout
+            # end if
+
+        query_stats: Dict[int, AthenaQueryStats] = {}
+        unprocessed_counts: Dict[str, int] = {}
+        futures: Dict[int, Future] = {}
+        executor = ThreadPoolExecutor(max_workers=self.download_workers)
+        try:
+            while self._keep_polling(query_states):
+                # start queries as slots free up
+                in_flight = len(
+                    [x for x in query_ids if self._keep_polling({x: query_states[x]})])
+                while len(pending_queries) > 0 and time.monotonic() >= next_start_time and (
+                        self.max_in_flight is None or in_flight < self.max_in_flight):
+                    _, index = pending_queries[0]
+                    try:
+                        responses[index] = self.__start_query(
+                            my_client, queries[index], database, output_to,
+                            result_reuse_max_age=result_reuse_max_age)
+                    except ClientError as e:
+                        if e.response['Error']['Code'] not in self._throttling_codes or \
+                                throttled_count >= self._max_start_retries:
+                            raise
+                            # end if
+                        wait_time = self._start_backoff.wait_time(
+                            throttled_count, [])
+                        self.logger.warning(
+                            f'StartQueryExecution is throttled, retry after {wait_time:.1f} seconds: {e}')
+                        throttled_count += 1
+                        next_start_time = time.monotonic() + wait_time
+                        break
+                        # end try
+                    heapq.heappop(pending_queries)
+                    throttled_count = 0
+                    query_ids[index] = responses[index]['QueryExecutionId']
+                    in_flight += 1
+                    # end while
+
+                # finished queries are never polled again
+                polling_indices = [
+                    x for x in query_ids if self._keep_polling({x: query_states[x]})]
+                query_statuses = self.__get_query_executions(
+                    my_client, [query_ids[x] for x in polling_indices], unprocessed_counts)
+                unfinished_executions = []
+
+                for index in polling_indices:
+                    if query_ids[index] not in query_statuses:
+                        # unprocessed, retry on the next polling
+                        continue
+                        # end if
+                    query_status = query_statuses[query_ids[index]]
+                    if 'QueryExecution' not in query_status:
+                        raise AthenaCallException(
+                            self.__unprocessed_message(query_ids[index], queries[index], query_status))
+                        # end if
+                    query_states[index] = query_status['QueryExecution']['Status'][
+                        'State']
+                    if not self._keep_polling({index: query_states[index]}):
+                        query_stats[index] = AthenaQueryStats.from_query_execution(
+                            query_status['QueryExecution'])
+                        self.__count_finished(query_stats[index])
+                        for member in members[index][1:]:
+                            query_states[member] = query_states[index]
+                            query_stats[member] = query_stats[index]
+                            # end for
+                        # end if
+
+                    if query_states[index] == 'SUCCEEDED':
                         query_output_path = query_status['QueryExecution']['ResultConfiguration']['OutputLocation']
 
                         self.logger.info(
                             json.dumps(query_status, cls=CustomJsonEncoder))
                         if is_data_query:
+                            if index in unload_paths:
+                                query_output_path = unload_paths[index]
+                                # end if
                             if return_paths:
-                                results[index] = query_output_path
+                                for member in members[index]:
+                                    results[member] = query_output_path
+                                    # end for
                             else:
-                                results[index] = self.__obtain_data(
-                                    query_output_path, dtypes[index], **kwargs)
+                                if len(members[index]) > 1:
+                                    # one download, dtype of each index is applied afterwards
+                                    download = (self.__obtain_shared,
+                                                query_output_path,
+                                                index in unload_paths,
+                                                [dtypes[x] for x in members[index]])
+                                elif index in unload_paths:
+                                    download = (self.__obtain_parquet,
+                                                query_output_path, dtypes[index])
+                                else:
+                                    download = (self.__obtain_data,
+                                                query_output_path, dtypes[index])
+                                    # end if
+                                if spill_to is not None:
+                                    download = (self.__spill, spill_to) + download
+                                    # end if
+                                # download while the other queries are polled
+                                futures[index] = executor.submit(
+                                    *download, query_stats=query_stats[index], **kwargs)
                                 # end if
                         else:
                             # non-query
-                            results[index] = self.__check_result(
-                                query_output_path)
-                            if results[index] != '' and self.error_as_exception and self.non_query_massage_as_exception:
-                                raise AthenaCallException(
-                                    f'Athena query {query_states[index]}, {query_ids[index]}: {queries[index]}\nResult has a message: {results[index]}'
-                                )
-                                # end if
+                            futures[index] = executor.submit(
+                                self.__check_result, query_output_path)
+                            # end if
+                    elif query_states[index] == 'QUEUED' or query_states[
+                            index] == 'RUNNING':
+                        # wait
+                        unfinished_executions.append(
+                            query_status['QueryExecution'])
+                    elif query_states[index] == 'FAILED' or query_states[
+                            index] == 'CANCELLED':
+                        message = f'Athena query {query_states[index]}, {query_ids[index]}: {queries[index]}\n{json.dumps(query_status, cls=CustomJsonEncoder)}'
+                        if self.error_as_exception:
+                            raise AthenaCallException(
+                                message
+                            )
+                        else:
+                            self.logger.debug(message)
+                            for member in members[index]:
+                                results[member] = None
+                                # end for
+                            # end if
+                    else:
+                        message = f'Athena query {query_states[index]}, {query_ids[index]}: {queries[index]}\n{json.dumps(query_status, cls=CustomJsonEncoder)}'
+                        if self.error_as_exception:
+                            raise AthenaCallException(
+                                message
+                            )
+                        else:
+                            self.logger.debug(message)
+                            for member in members[index]:
+                                results[member] = None
+                                # end for
                             # end if
                         # end if
-                elif query_states[index] == 'QUEUED' or query_states[
-                        index] == 'RUNNING':
-                    # wait
-                    pass
-                elif query_states[index] == 'FAILED' or query_states[
-                        index] == 'CANCELLED':
-                    message = f'Athena query {query_states[index]}, {query_ids[index]}: {queries[index]}\n{json.dumps(query_status, cls=CustomJsonEncoder)}'
-                    if self.error_as_exception:
-                        raise AthenaCallException(
-                            message
-                        )
+                    # end for
+
+                # raise download errors as early as possible
+                for index, this_future in futures.items():
+                    if this_future.done() and this_future.exception() is not None:
+                        this_future.result()
+                        # end if
+                    # end for
+
+                if self._keep_polling(query_states):
+                    if len([x for x in query_ids if self._keep_polling({x: query_states[x]})]) == 0:
+                        # nothing is running, start the next queries without polling wait
+                        wait_time = max(0, next_start_time - time.monotonic())
                     else:
-                        self.logger.debug(message)
-                        results[index] = None
+                        wait_time = polling_strategy.wait_time(
+                            polling_count, unfinished_executions)
+                        polling_count += 1
                         # end if
+                    if deadline is not None:
+                        remaining_time = deadline - time.monotonic()
+                        if remaining_time <= 0:
+                            raise TimeoutError(
+                                f'Athena queries did not finish in {self.query_timeout} seconds')
+                            # end if
+                        # poll one last time at the deadline
+                        wait_time = min(wait_time, remaining_time)
+                        # end if
+                    with self.instrumentation.span('athena.polling_wait', {'athena.polling_count': polling_count}):
+                        time.sleep(wait_time)
+                        # end with
+                    # end if
+                # end while
+
+            for index, this_future in futures.items():
+                if len(members[index]) > 1:
+                    for member, this_result in zip(members[index], this_future.result()):
+                        results[member] = this_result
+                        # end for
                 else:
-                    message = f'Athena query {query_states[index]}, {query_ids[index]}: {queries[index]}\n{json.dumps(query_status, cls=CustomJsonEncoder)}'
-                    if self.error_as_exception:
-                        raise AthenaCallException(
-                            message
-                        )
-                    else:
-                        self.logger.debug(message)
-                        results[index] = None
+                    results[index] = this_future.result()
+                    # end if
+                for member in members[index]:
+                    if member in cache_keys and isinstance(results[member], pd.DataFrame):
+                        try:
+                            self.result_cache.put(
+                                cache_keys[member], results[member])
+                        except Exception as e:
+                            # the result is still returned
+                            self.logger.warning(f'Result is not cached: {e}')
+                            # end try
                         # end if
+                    # end for
+                if not is_data_query and results[index] != '' and self.error_as_exception and self.non_query_massage_as_exception:
+                    raise AthenaCallException(
+                        f'Athena query {query_states[index]}, {query_ids[index]}: {queries[index]}\nResult has a message: {results[index]}'
+                    )
                     # end if
                 # end for
+        except BaseException:
+            # failure, timeout or KeyboardInterrupt, nothing should keep running on Athena
+            self.__stop_queries(my_client, [
+                query_ids[x] for x in query_ids if self._keep_polling({x: query_states[x]})])
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.__last_query_stats = [
+                query_stats.get(x) for x in range(len(queries))]
+            # duplicated queries share the stats
+            self.__summarize({id(x): x for x in query_stats.values()}.values())
+            # end try
+
+        return [results[x] for x in range(len(results))], self.__last_query_stats
+        # end def
+
+    @staticmethod
+    def __empty_summary() -> Dict[str, int]:
+        return {'queries': 0,
+                'reused_queries': 0,
+                'data_scanned_in_bytes': 0,
+                'engine_execution_time_in_millis': 0,
+                'query_queue_time_in_millis': 0,
+                'query_planning_time_in_millis': 0,
+                'service_processing_time_in_millis': 0,
+                'total_execution_time_in_millis': 0,
+                'result_size_in_bytes': 0}
+        # end def
 
-            time.sleep(self.polling_time)
+    def __summarize(self, query_stats: Iterable[AthenaQueryStats]):
+        with self.__summary_lock:
+            for this_stats in query_stats:
+                if this_stats is None:
+                    continue
+                    # end if
+                self.__query_stats_summary['queries'] += 1
+                if this_stats.reused_previous_result:
+                    self.__query_stats_summary['reused_queries'] += 1
+                    # end if
+                for name, value in this_stats.to_dict().items():
+                    if name in self.__query_stats_summary and isinstance(value, int) \
+                            and not isinstance(value, bool):
+                        self.__query_stats_summary[name] += value
+                        # end if
+                    # end for
+                # end for
+            # end with
+        # end def
+
+    def __count_finished(self, query_stats: AthenaQueryStats):
+        attributes = {'athena.state': query_stats.state,
+                      'athena.reused_previous_result': query_stats.reused_previous_result}
+        self.instrumentation.count('athena.queries', 1, attributes)
+        if query_stats.data_scanned_in_bytes is not None:
+            self.instrumentation.count(
+                'athena.data_scanned_bytes', query_stats.data_scanned_in_bytes, attributes)
+            # end if
+        # end def
+
+    def _is_transient_error(self, e: Exception) -> bool:
+        # throttling and server errors are retried
+        if not isinstance(e, ClientError):
+            return False
+            # end if
+        return e.response.get('Error', {}).get('Code') in self._throttling_codes or \
+            e.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500
+        # end def
+
+    def __stop_queries(self, client: Any, query_ids: List[str]):
+        for query_id in query_ids:
+            try:
+                client.stop_query_execution(QueryExecutionId=query_id)
+                self.logger.info(f'Athena query stopped, {query_id}')
+            except Exception as e:
+                # the original error is more important
+                self.logger.warning(
+                    f'Athena query is not stopped, {query_id}: {e}')
+                # end try
+            # end for
+        # end def
+
+    def __submit(self,
+                 query: str,
+                 database: str,
+                 is_data_query: bool = True,
+                 dtype: Dict = None,
+                 return_path: bool = False,
+                 result_reuse_max_age: int = None,
+                 **kwargs: Any) -> AthenaQueryFuture:
+
+        if database is None:
+            database = self.database
+            # end if
+
+        response = self.__start_query(
+            self.__get_client('athena'), query, database, self.__output_to(),
+            result_reuse_max_age=result_reuse_max_age)
+        handle = AthenaQueryFuture(
+            query, response['QueryExecutionId'], self.__cancel_submitted)
+
+        with self.__poller_lock:
+            self.__submitted[handle.query_id] = (
+                handle, is_data_query, dtype, return_path, kwargs)
+            # new queries are polled from the initial wait time of the polling strategy
+            self.__poller_polling_count = 0
+            if self.__poller_thread is None:
+                self.__poller_thread = threading.Thread(
+                    target=self.__poll_submitted, name='AthenaClientPoller', daemon=True)
+                self.__poller_thread.start()
+                # end if
+            # end with
+        return handle
+        # end def
+
+    def __cancel_submitted(self, handle: AthenaQueryFuture) -> bool:
+        with self.__poller_lock:
+            if self.__submitted.pop(handle.query_id, None) is None:
+                # already finished
+                return False
+                # end if
+            # end with
+
+        try:
+            self.__get_client('athena').stop_query_execution(
+                QueryExecutionId=handle.query_id)
+        except BaseException as e:
+            # the handle is not polled any more, it must not be left unresolved
+            handle._set_exception(e)
+            raise
+            # end try
+        return handle._set_cancelled()
+        # end def
+
+    def __poll_submitted(self):
+        # one polling loop for all the submitted queries
+
+        my_client = self.__get_client('athena')
+        polling_strategy = self.__get_polling_strategy()
+        unprocessed_counts = {}
+        failed_count = 0
+
+        while True:
+            with self.__poller_lock:
+                if len(self.__submitted) == 0:
+                    self.__poller_thread = None
+                    return
+                    # end if
+                submitted = dict(self.__submitted)
+                # end with
+
+            try:
+                unfinished_executions = self.__poll_submitted_once(
+                    my_client, submitted, unprocessed_counts)
+            except Exception as e:
+                if self._is_transient_error(e) and failed_count < self._max_start_retries:
+                    wait_time = self._start_backoff.wait_time(failed_count, [])
+                    self.logger.warning(
+                        f'Polling submitted queries failed, retry after {wait_time:.1f} seconds: {e}')
+                    failed_count += 1
+                    time.sleep(wait_time)
+                    continue
+                    # end if
+                # nobody should wait forever, and nothing should keep running on Athena
+                self.logger.warning(f'Polling submitted queries failed: {e}')
+                failed_handles = {}
+                with self.__poller_lock:
+                    for query_id, (handle, _, _, _, _) in submitted.items():
+                        if self.__submitted.pop(query_id, None) is not None:
+                            failed_handles[query_id] = handle
+                            # end if
+                        # end for
+                    # end with
+                self.__stop_queries(my_client, list(failed_handles.keys()))
+                for handle in failed_handles.values():
+                    handle._set_exception(e)
+                    # end for
+                failed_count = 0
+                continue
+                # end try
+            failed_count = 0
+
+            with self.__poller_lock:
+                if len(self.__submitted) == 0:
+                    continue
+                    # end if
+                polling_count = self.__poller_polling_count
+                self.__poller_polling_count += 1
+                # end with
+            time.sleep(polling_strategy.wait_time(
+                polling_count, unfinished_executions))
             # end while
+        # end def
+
+    def __poll_submitted_once(self,
+                              client: Any,
+                              submitted: Dict[str, tuple],
+                              unprocessed_counts: Dict[str, int]) -> List[Dict]:
+
+        query_statuses = self.__get_query_executions(
+            client, list(submitted.keys()), unprocessed_counts)
+
+        unfinished_executions = []
+        for query_id, (handle, is_data_query, dtype, return_path, kwargs) in submitted.items():
+            if query_id not in query_statuses:
+                # unprocessed, retry on the next polling
+                continue
+                # end if
+            query_status = query_statuses[query_id]
+            if 'QueryExecution' not in query_status:
+                with self.__poller_lock:
+                    if self.__submitted.pop(query_id, None) is None:
+                        # cancelled
+                        continue
+                        # end if
+                    # end with
+                # the query may be still running
+                self.__stop_queries(client, [query_id])
+                handle._set_exception(AthenaCallException(
+                    self.__unprocessed_message(query_id, handle.query, query_status)))
+                continue
+                # end if
+            query_state = query_status['QueryExecution']['Status']['State']
+
+            if query_state == 'QUEUED' or query_state == 'RUNNING':
+                handle._set_state(query_state)
+                unfinished_executions.append(query_status['QueryExecution'])
+                continue
+                # end if
+
+            with self.__poller_lock:
+                if self.__submitted.pop(query_id, None) is None:
+                    # cancelled
+                    continue
+                    # end if
+                # end with
+            handle._set_state(query_state)
+            handle._set_stats(AthenaQueryStats.from_query_execution(
+                query_status['QueryExecution']))
+            self.__count_finished(handle.stats)
+
+            if query_state == 'SUCCEEDED':
+                self.logger.info(
+                    json.dumps(query_status, cls=CustomJsonEncoder))
+                query_output_path = query_status['QueryExecution']['ResultConfiguration']['OutputLocation']
+                if is_data_query and return_path:
+                    self.__summarize([handle.stats])
+                    handle._set_result(query_output_path)
+                else:
+                    self.__get_download_executor().submit(
+                        self.__materialize_submitted,
+                        handle, query_output_path, is_data_query, dtype, **kwargs)
+                    # end if
+            else:
+                self.__summarize([handle.stats])
+                message = f'Athena query {query_state}, {query_id}: {handle.query}\n{json.dumps(query_status, cls=CustomJsonEncoder)}'
+                if self.error_as_exception:
+                    handle._set_exception(AthenaCallException(message))
+                else:
+                    self.logger.debug(message)
+                    handle._set_result(None)
+                    # end if
+                # end if
+            # end for
+        return unfinished_executions
+        # end def
+
+    def __materialize_submitted(self,
+                                handle: AthenaQueryFuture,
+                                query_output_path: str,
+                                is_data_query: bool,
+                                dtype: Dict = None,
+                                **kwargs: Any):
+
+        try:
+            if is_data_query:
+                result = self.__obtain_data(
+                    query_output_path, dtype, query_stats=handle.stats, **kwargs)
+            else:
+                result = self.__check_result(query_output_path)
+                if result != '' and self.error_as_exception and self.non_query_massage_as_exception:
+                    raise AthenaCallException(
+                        f'Athena query {handle.state}, {handle.query_id}: {handle.query}\nResult has a message: {result}'
+                    )
+                    # end if
+                # end if
+        except Exception as e:
+            handle._set_exception(e)
+            return
+        finally:
+            self.__summarize([handle.stats])
+            # end try
+        handle._set_result(result)
+        # end def
+
+    def __get_download_executor(self) -> ThreadPoolExecutor:
+        with self.__poller_lock:
+            if self.__download_executor is None:
+                self.__download_executor = ThreadPoolExecutor(
+                    max_workers=self.download_workers)
+                # end if
+            return self.__download_executor
+            # end with
+        # end def
+
+    def __output_to(self) -> str:
+        output_to = self.workplace
+        if not output_to.endswith('/'):
+            output_to += '/'
+            # end if
+        return output_to
+        # end def
+
+    def __get_polling_strategy(self) -> PollingStrategy:
+        if self.polling_strategy is None:
+            return FixedPolling(self.polling_time)
+            # end if
+        return self.polling_strategy
+        # end def
+
+    def __start_query(self,
+                      client: Any,
+                      query: str,
+                      database: str,
+                      output_to: str,
+                      result_reuse_max_age: int = None) -> Dict:
+
+        additional_args = {}
+        if self.__workgroup is not None:
+            additional_args['WorkGroup'] = self.__workgroup
+            # end if
+
+        # the argument of the call takes priority, 0 disables it
+        if result_reuse_max_age is None:
+            result_reuse_max_age = self.result_reuse_max_age
+            # end if
+        if result_reuse_max_age is not None:
+            if result_reuse_max_age > 0:
+                reuse_configuration = {
+                    'Enabled': True, 'MaxAgeInMinutes': result_reuse_max_age}
+            else:
+                reuse_configuration = {'Enabled': False}
+                # end if
+            additional_args['ResultReuseConfiguration'] = {
+                'ResultReuseByAgeConfiguration': reuse_configuration}
+            # end if
+        with self.instrumentation.span('athena.start_query_execution', {'athena.database': database}):
+            response = client.start_query_execution(
+                QueryString=query,
+                QueryExecutionContext={'Database': database},
+                ResultConfiguration={'OutputLocation': output_to},
+                **additional_args
+            )
+            # end with
+        self.logger.info(
+            json.dumps(
+                response,
+                cls=CustomJsonEncoder))
+        return response
+        # end def
+
+    def __unprocessed_message(self, query_id: str, query: str, query_status: Dict) -> str:
+        this_unprocessed = query_status['UnprocessedQueryExecutionId']
+        return f'Athena query is not processed, {query_id}: {query}\n' + \
+            f'{this_unprocessed.get("ErrorCode")}: {this_unprocessed.get("ErrorMessage")}'
+        # end def
+
+    def __get_query_executions(self,
+                               client: Any,
+                               query_ids: List[str],
+                               unprocessed_counts: Dict[str, int] = None) -> Dict[str, Dict]:
+        # an unprocessed id is retried on the next polling, unless it is not retryable or retried too many times,
+        # then the status has only 'UnprocessedQueryExecutionId'
+
+        with self.instrumentation.span('athena.get_query_executions', {'athena.query_count': len(query_ids)}):
+            if len(query_ids) == 1:
+                return {query_ids[0]: client.get_query_execution(
+                    QueryExecutionId=query_ids[0])}
+                # end if
 
-        return [results[x] for x in range(len(results))]
+            query_statuses = {}
+            for offset in range(0, len(query_ids), self._batch_get_limit):
+                response = client.batch_get_query_execution(
+                    QueryExecutionIds=query_ids[offset:offset + self._batch_get_limit])
+                for this_execution in response['QueryExecutions']:
+                    query_statuses[this_execution['QueryExecutionId']] = {
+                        'QueryExecution': this_execution}
+                    if unprocessed_counts is not None:
+                        unprocessed_counts.pop(
+                            this_execution['QueryExecutionId'], None)
+                        # end if
+                    # end for
+                for this_unprocessed in response.get('UnprocessedQueryExecutionIds', []):
+                    self.logger.debug(
+                        json.dumps(this_unprocessed, cls=CustomJsonEncoder))
+                    query_id = this_unprocessed['QueryExecutionId']
+                    error_code = this_unprocessed.get('ErrorCode')
+                    unprocessed_count = 0
+                    if unprocessed_counts is not None:
+                        unprocessed_count = unprocessed_counts.get(
+                            query_id, 0) + 1
+                        unprocessed_counts[query_id] = unprocessed_count
+                        # end if
+                    if (error_code is not None and error_code not in self._throttling_codes) or \
+                            unprocessed_count > self._max_unprocessed_retries:
+                        query_statuses[query_id] = {
+                            'UnprocessedQueryExecutionId': this_unprocessed}
+                        # end if
+                    # end for
+                # end for
+            return query_statuses
+            # end with
         # end def
 
     def __obtain_data(self,
                       output_to: str,
                       dtype: Dict = None,
+                      query_stats: AthenaQueryStats = None,
                       **kwargs: Any) -> pd.DataFrame:
 
-        my_session = boto3.session.Session(
-            region_name=self.region,
-            profile_name=self.profile)
+        with self.instrumentation.span('athena.obtain_data', {'athena.output_location': output_to}):
+            if self.__use_api_fetch(output_to, query_stats, kwargs):
+                return self.__fetch_results(output_to, dtype)
+                # end if
 
-        my_client = my_session.client(
-            's3',
-            region_name=self.region,
-            config=self.config)
+            dtype, kwargs = self.__apply_metadata_dtypes(
+                output_to, dtype, kwargs)
+            body = self.__open_result(output_to, query_stats)
+            # the body is streamed, so this includes the download
+            with self.instrumentation.span('athena.read_csv'):
+                result = self.__read_csv(body, dtype, kwargs)
+                # end with
+            # end with
+        return result
+        # end def
+
+    def __read_csv(self, body: Any, dtype: Dict, kwargs: Dict) -> pd.DataFrame:
+        if self.parse_options is None:
+            return pd.read_csv(body, dtype=dtype, **kwargs)
+            # end if
+        result = pd.read_csv(
+            body, dtype=dtype, **self.parse_options.read_csv_kwargs(kwargs))
+        return self.parse_options.compact(result, dtype)
+        # end def
+
+    def __use_api_fetch(self,
+                        output_to: str,
+                        query_stats: AthenaQueryStats,
+                        kwargs: Dict) -> bool:
+
+        if self.result_fetch_mode == 's3' or len(kwargs) > 0:
+            # options of read_csv need the csv file
+            return False
+        elif self.result_fetch_mode == 'api':
+            return True
+            # end if
 
         bucket = s3path.bucket_name(output_to)
         key = '/'.join(s3path.to_list(output_to)[1:])
-        obj = my_client.get_object(Bucket=bucket, Key=key)
-        result = pd.read_csv(obj['Body'], dtype=dtype, **kwargs)
+        with self.instrumentation.span('athena.head_object'):
+            result_size = self.__get_client('s3').head_object(
+                Bucket=bucket, Key=key)['ContentLength']
+            # end with
+        if query_stats is not None:
+            query_stats.result_size_in_bytes = result_size
+            # end if
+        return result_size <= self.api_fetch_threshold
+        # end def
+
+    def __fetch_results(self,
+                        output_to: str,
+                        dtype: Dict = None) -> pd.DataFrame:
+        # pages GetQueryResults and builds each column from its type, without csv
+
+        my_client = self.__get_client('athena')
+
+        # the result file is named after the query execution id
+        query_id = s3path.basename(output_to).split('.')[0]
+        column_info = None
+        values = None
+        next_token = None
+        with self.instrumentation.span('athena.get_query_results'):
+            while True:
+                additional_args = {}
+                if next_token is not None:
+                    additional_args['NextToken'] = next_token
+                    # end if
+                response = my_client.get_query_results(
+                    QueryExecutionId=query_id,
+                    MaxResults=self._get_query_results_limit,
+                    **additional_args)
+                rows = response['ResultSet']['Rows']
+                if column_info is None:
+                    column_info = response['ResultSet']['ResultSetMetadata']['ColumnInfo']
+                    values = [[] for _ in column_info]
+                    # the first row of a SELECT is the header
+                    if len(rows) > 0 and [x.get('VarCharValue') for x in rows[0]['Data']] == [
+                            x['Name'] for x in column_info]:
+                        rows = rows[1:]
+                        # end if
+                    # end if
+                for this_row in rows:
+                    for position, this_data in enumerate(this_row['Data']):
+                        values[position].append(this_data.get('VarCharValue'))
+                        # end for
+                    # end for
+                next_token = response.get('NextToken')
+                if next_token is None:
+                    break
+                    # end if
+                # end while
+            # end with
+
+        result = pd.DataFrame({column_info[x]['Name']: self._metadata_column(values[x], column_info[x]['Type'])
+                               for x in range(len(column_info))})
+        if self.parse_options is not None:
+            result = self.parse_options.compact(result, dtype)
+            # end if
+        if dtype is not None:
+            result = result.astype(dtype)
+            # end if
         return result
         # end def
 
-    def __check_result(self, output_to: str) -> str:
+    def __apply_metadata_dtypes(self,
+                                output_to: str,
+                                dtype: Dict,
+                                kwargs: Dict) -> Tuple[Dict, Dict]:
+        # dtype and parse_dates from the result set metadata, those of the caller take priority
+
+        if not self.use_metadata_dtypes:
+            return dtype, kwargs
+            # end if
+
+        # the result file is named after the query execution id
+        query_id = s3path.basename(output_to).split('.')[0]
+        with self.instrumentation.span('athena.get_query_results'):
+            response = self.__get_client('athena').get_query_results(
+                QueryExecutionId=query_id, MaxResults=1)
+            # end with
+        metadata_dtype, parse_dates = self._metadata_dtypes(
+            response['ResultSet']['ResultSetMetadata']['ColumnInfo'])
+
+        if dtype is not None:
+            metadata_dtype.update(dtype)
+            parse_dates = [x for x in parse_dates if x not in dtype]
+            # end if
+        kwargs = dict(kwargs)
+        if 'parse_dates' not in kwargs and len(parse_dates) > 0:
+            kwargs['parse_dates'] = parse_dates
+            # end if
+        return metadata_dtype, kwargs
+        # end def
+
+    def __unload_query(self, query: str, unload_to: str) -> str:
+        query = query.strip().rstrip(';')
+        return f"UNLOAD ({query}) TO '{unload_to}' WITH (format = 'PARQUET')"
+        # end def
+
+    def __obtain_parquet(self,
+                         unload_to: str,
+                         dtype: Dict = None,
+                         query_stats: AthenaQueryStats = None,
+                         **kwargs: Any) -> pd.DataFrame:
+        # reads the parquet files written by UNLOAD in parallel, kwargs are passed to read_parquet
+
+        my_client = self.__get_client('s3')
+
+        bucket = s3path.bucket_name(unload_to)
+        prefix = '/'.join(s3path.to_list(unload_to)[1:])
+        keys = []
+        result_size = 0
+        for this_page in my_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            for this_object in this_page.get('Contents', []):
+                if this_object['Size'] > 0:
+                    keys.append(this_object['Key'])
+                    result_size += this_object['Size']
+                    # end if
+                # end for
+            # end for
+        if query_stats is not None:
+            query_stats.result_size_in_bytes = result_size
+            # end if
+
+        with self.instrumentation.span('athena.read_parquet', {'athena.output_location': unload_to,
+                                                               'athena.file_count': len(keys)}):
+            with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+                frames = list(executor.map(
+                    lambda x: pd.read_parquet(io.BytesIO(my_client.get_object(
+                        Bucket=bucket, Key=x)['Body'].read()), **kwargs), sorted(keys)))
+                # end with
+            # end with
+
+        if len(frames) == 0:
+            result = pd.DataFrame()
+        else:
+            result = pd.concat(frames, ignore_index=True)
+            # end if
+        if self.parse_options is not None:
+            result = self.parse_options.compact(result, dtype)
+            # end if
+        if dtype is not None:
+            result = result.astype(dtype)
+            # end if
+        return result
+        # end def
 
-        my_session = boto3.session.Session(
-            region_name=self.region,
-            profile_name=self.profile)
+    def __spill(self,
+                spill_to: Union[str, Path],
+                obtain: Any,
+                *args: Any,
+                **kwargs: Any) -> Union[SpilledResult, List[SpilledResult]]:
+        # the DataFrame is released as soon as it is written
 
-        my_client = my_session.client(
-            's3',
-            region_name=self.region,
-            config=self.config)
+        return self.__write_spill(spill_to, obtain(*args, **kwargs))
+        # end def
+
+    def __write_spill(self,
+                      spill_to: Union[str, Path],
+                      result: Union[pd.DataFrame, List[pd.DataFrame]]) -> Union[SpilledResult, List[SpilledResult]]:
+        with self.instrumentation.span('athena.spill'):
+            if isinstance(result, list):
+                return [SpilledResult.write(spill_to, x) for x in result]
+                # end if
+            return SpilledResult.write(spill_to, result)
+            # end with
+        # end def
+
+    def __obtain_shared(self,
+                        output_to: str,
+                        is_unloaded: bool,
+                        dtypes: List[Dict],
+                        query_stats: AthenaQueryStats = None,
+                        **kwargs: Any) -> List[pd.DataFrame]:
+        # one download for the duplicated queries, each gets its own DataFrame
+
+        if is_unloaded:
+            # dtype of parquet is applied after reading anyway
+            result = self.__obtain_parquet(
+                output_to, None, query_stats=query_stats, **kwargs)
+            return [result.copy() if x is None else result.astype(x) for x in dtypes]
+            # end if
+
+        if all([x == dtypes[0] for x in dtypes]):
+            result = self.__obtain_data(
+                output_to, dtypes[0], query_stats=query_stats, **kwargs)
+            return [result] + [result.copy() for _ in dtypes[1:]]
+            # end if
+
+        # dtype of csv is applied by parsing the downloaded file again
+        body = self.__open_result(output_to, query_stats).read()
+        results = []
+        for this_dtype in dtypes:
+            this_dtype, this_kwargs = self.__apply_metadata_dtypes(
+                output_to, this_dtype, kwargs)
+            results.append(self.__read_csv(
+                io.BytesIO(body), this_dtype, this_kwargs))
+            # end for
+        return results
+        # end def
+
+    def __open_result(self, output_to: str,
+                      query_stats: AthenaQueryStats = None,
+                      ranged: bool = True) -> Any:
+        # streaming body of the result file
+        # with ranged, a large file is downloaded in parallel parts and returned as a local file
+
+        my_client = self.__get_client('s3')
+
+        bucket = s3path.bucket_name(output_to)
+        key = '/'.join(s3path.to_list(output_to)[1:])
+        with self.instrumentation.span('athena.get_object'):
+            obj = my_client.get_object(Bucket=bucket, Key=key)
+            # end with
+        if query_stats is not None:
+            query_stats.result_size_in_bytes = obj.get('ContentLength')
+            # end if
+        if ranged and self.ranged_download_threshold is not None and \
+                obj.get('ContentLength', 0) > self.ranged_download_threshold:
+            return self.__download_ranges(my_client, bucket, key, obj)
+            # end if
+        return obj['Body']
+        # end def
+
+    def __download_ranges(self,
+                          client: Any,
+                          bucket: str,
+                          key: str,
+                          obj: Dict) -> Any:
+        # parts are fetched concurrently and written in order
+        # the first part is read from the body already opened
+
+        size = obj['ContentLength']
+        part_size = self.download_part_size
+        additional_args = {}
+        if 'ETag' in obj:
+            # the file must not change between the parts
+            additional_args['IfMatch'] = obj['ETag']
+            # end if
+
+        def fetch(offset: int) -> bytes:
+            if offset == 0:
+                try:
+                    return obj['Body'].read(part_size)
+                finally:
+                    obj['Body'].close()
+                    # end try
+                # end if
+            last = min(offset + part_size, size) - 1
+            return client.get_object(Bucket=bucket, Key=key,
+                                     Range=f'bytes={offset}-{last}',
+                                     **additional_args)['Body'].read()
+            # end def
+
+        result = tempfile.SpooledTemporaryFile(max_size=self._download_spool_size)
+        try:
+            with self.instrumentation.span('athena.download_ranges', {'athena.size': size,
+                                                                      'athena.part_size': part_size}):
+                with ThreadPoolExecutor(max_workers=self.download_concurrency) as executor:
+                    # no more than download_concurrency parts wait in memory
+                    pending = deque()
+                    for offset in range(0, size, part_size):
+                        pending.append(executor.submit(fetch, offset))
+                        if len(pending) >= self.download_concurrency:
+                            result.write(pending.popleft().result())
+                            # end if
+                        # end for
+                    while len(pending) > 0:
+                        result.write(pending.popleft().result())
+                        # end while
+                    # end with
+                # end with
+        except BaseException:
+            result.close()
+            raise
+            # end try
+        result.seek(0)
+        return result
+        # end def
+
+    def __check_result(self, output_to: str) -> str:
+
+        my_client = self.__get_client('s3')
 
         bucket = s3path.bucket_name(output_to)
         key = '/'.join(s3path.to_list(output_to)[1:])
@@ -407,6 +1729,36 @@ class AthenaClient(object):
         return result
         # end def
 
+    def _metadata_dtypes(self, column_info: List[Dict]) -> Tuple[Dict, List[str]]:
+        dtype = {}
+        parse_dates = []
+        for this_column in column_info:
+            this_type = this_column['Type'].lower()
+            if this_type in self._metadata_types:
+                dtype[this_column['Name']] = self._metadata_types[this_type]
+            elif this_type in self._metadata_date_types:
+                parse_dates.append(this_column['Name'])
+                # end if
+            # end for
+        return dtype, parse_dates
+        # end def
+
+    def _metadata_column(self, values: List[str], athena_type: str) -> pd.Series:
+        # NULL is a missing VarCharValue of GetQueryResults
+        this_type = athena_type.lower()
+        column = pd.Series(values, dtype='string')
+        if this_type == 'boolean':
+            return column.map({'true': True, 'false': False}).astype('boolean')
+        elif this_type in self._metadata_types:
+            return column.astype(self._metadata_types[this_type])
+        elif this_type in self._metadata_date_types:
+            return pd.to_datetime(column)
+        elif this_type == 'decimal':
+            return pd.to_numeric(column).astype('float64')
+            # end if
+        return pd.Series(values, dtype=object)
+        # end def
+
     def _keep_polling(self, states: Dict) -> bool:
         for _, this_item in states.items():
             if this_item == 'QUEUED' or this_item == 'RUNNING' or this_item is None:
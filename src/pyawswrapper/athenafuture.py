@@ -0,0 +1,103 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from .querystats import AthenaQueryStats
+
+
+class AthenaQueryFuture(object):
+
+    def __init__(self, query: str, query_id: str,
+                 canceller: Callable[['AthenaQueryFuture'], bool]):
+        super(AthenaQueryFuture, self).__init__()
+
+        self.__query = query
+        self.__query_id = query_id
+        self.__canceller = canceller
+        self.__state = 'QUEUED'
+        self.__stats = None
+        self.__future = Future()
+        # end def
+
+    @property
+    def query(self) -> str:
+        # get only property
+        return self.__query
+        # end def
+
+    @property
+    def query_id(self) -> str:
+        # get only property
+        return self.__query_id
+        # end def
+
+    @property
+    def state(self) -> str:
+        # get only property
+        # the latest state of the query execution
+        return self.__state
+        # end def
+
+    @property
+    def stats(self) -> AthenaQueryStats:
+        # get only property
+        # available once the query execution finished
+        return self.__stats
+        # end def
+
+    def result(self, timeout: float = None) -> Any:
+        return self.__future.result(timeout)
+        # end def
+
+    def exception(self, timeout: float = None) -> BaseException:
+        return self.__future.exception(timeout)
+        # end def
+
+    def done(self) -> bool:
+        return self.__future.done()
+        # end def
+
+    def cancelled(self) -> bool:
+        return self.__future.cancelled()
+        # end def
+
+    def cancel(self) -> bool:
+        # stops the query execution, a finished query can not be cancelled
+        if self.done():
+            return False
+            # end if
+        return self.__canceller(self)
+        # end def
+
+    def add_done_callback(self, fn: Callable[['AthenaQueryFuture'], Any]):
+        self.__future.add_done_callback(lambda _: fn(self))
+        # end def
+
+    def _set_state(self, value: str):
+        self.__state = value
+        # end def
+
+    def _set_stats(self, value: AthenaQueryStats):
+        self.__stats = value
+        # end def
+
+    def _set_result(self, value: Any):
+        self.__future.set_result(value)
+        # end def
+
+    def _set_exception(self, value: BaseException):
+        self.__future.set_exception(value)
+        # end def
+
+    def _set_cancelled(self) -> bool:
+        self.__state = 'CANCELLED'
+        return self.__future.cancel()
+        # end def
+
+    # end class
@@ -0,0 +1,103 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator
+
+
+class Instrumentation(object):
+    # Receives timed spans and counters from AthenaClient and s3client.
+    # This base class does nothing, so it costs almost nothing when it is not configured.
+
+    _null_span = nullcontext()
+
+    def span(self, name: str,
+             attributes: Dict[str, Any] = None) -> ContextManager:
+        return self._null_span
+        # end def
+
+    def count(self, name: str, value: int = 1,
+              attributes: Dict[str, Any] = None):
+        pass
+        # end def
+
+    # end class
+
+
+class CallbackInstrumentation(Instrumentation):
+
+    def __init__(self,
+                 on_span: Callable[[str, float, Dict[str, Any], BaseException], Any] = None,
+                 on_count: Callable[[str, int, Dict[str, Any]], Any] = None):
+        # on_span: called with (name, seconds, attributes, error) when a span ends, error is None on success
+        # on_count: called with (name, value, attributes)
+        super(CallbackInstrumentation, self).__init__()
+
+        self.on_span = on_span
+        self.on_count = on_count
+        # end def
+
+    @contextmanager
+    def span(self, name: str,
+             attributes: Dict[str, Any] = None) -> Iterator[None]:
+
+        started_at = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if self.on_span is not None:
+                self.on_span(name, time.perf_counter() - started_at,
+                             attributes if attributes is not None else {}, error)
+                # end if
+            # end try
+        # end def
+
+    def count(self, name: str, value: int = 1,
+              attributes: Dict[str, Any] = None):
+        if self.on_count is not None:
+            self.on_count(
+                name, value, attributes if attributes is not None else {})
+            # end if
+        # end def
+
+    # end class
+
+
+class TracerInstrumentation(Instrumentation):
+    # Adapter of an OpenTelemetry tracer, and optionally a meter for the counters.
+    # opentelemetry is not a dependency, any object with the same methods works.
+
+    def __init__(self, tracer: Any, meter: Any = None):
+        super(TracerInstrumentation, self).__init__()
+
+        self.tracer = tracer
+        self.meter = meter
+        self.__counters = {}
+        # end def
+
+    def span(self, name: str,
+             attributes: Dict[str, Any] = None) -> ContextManager:
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+        # end def
+
+    def count(self, name: str, value: int = 1,
+              attributes: Dict[str, Any] = None):
+        if self.meter is None:
+            return
+            # end if
+        if name not in self.__counters:
+            self.__counters[name] = self.meter.create_counter(name)
+            # end if
+        self.__counters[name].add(value, attributes=attributes)
+        # end def
+
+    # end class
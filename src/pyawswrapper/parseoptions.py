@@ -0,0 +1,98 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+from typing import Any, Dict
+
+import pandas as pd
+
+
+class ParseOptions(object):
+    # How AthenaClient parses results into DataFrames.
+    # engine and dtype_backend are passed to read_csv, the others are applied after parsing.
+    # The columns in `dtype` of the caller are left as they are.
+
+    _string_dtypes = (None, 'string[pyarrow]', 'string', 'category')
+
+    def __init__(self,
+                 engine: str = None,
+                 dtype_backend: str = None,
+                 string_dtype: str = None,
+                 downcast: bool = False):
+        super(ParseOptions, self).__init__()
+
+        if string_dtype not in self._string_dtypes:
+            raise ValueError(
+                f'string_dtype should be one of {self._string_dtypes}: {string_dtype}')
+            # end if
+
+        # e.g. 'pyarrow' for the multithreaded reader of pyarrow
+        self.engine = engine
+        # e.g. 'pyarrow' for Arrow-backed columns
+        self.dtype_backend = dtype_backend
+        self.string_dtype = string_dtype
+        # integers to the smallest type, floats to float32 when no value changes
+        self.downcast = downcast
+        # end def
+
+    def read_csv_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        # kwargs of the caller take priority
+        result = dict(kwargs)
+        if self.engine is not None:
+            result.setdefault('engine', self.engine)
+            # end if
+        if self.dtype_backend is not None:
+            result.setdefault('dtype_backend', self.dtype_backend)
+            # end if
+        return result
+        # end def
+
+    def compact(self, df: pd.DataFrame, dtype: Dict = None) -> pd.DataFrame:
+
+        if self.string_dtype is None and not self.downcast:
+            return df
+            # end if
+
+        converted = {}
+        for name in df.columns:
+            if dtype is not None and name in dtype:
+                continue
+                # end if
+            column = df[name]
+            if self.string_dtype is not None and self.__is_string(column):
+                converted[name] = column.astype(self.string_dtype)
+            elif self.downcast and pd.api.types.is_integer_dtype(column.dtype) and \
+                    not pd.api.types.is_extension_array_dtype(column.dtype):
+                converted[name] = pd.to_numeric(column, downcast='integer')
+            elif self.downcast and column.dtype == 'float64':
+                this_column = column.astype('float32')
+                if (this_column.astype('float64') == column).where(column.notna(), True).all():
+                    converted[name] = this_column
+                    # end if
+                # end if
+            # end for
+
+        if len(converted) == 0:
+            return df
+            # end if
+        df = df.copy(deep=False)
+        for name, column in converted.items():
+            df[name] = column
+            # end for
+        return df
+        # end def
+
+    @staticmethod
+    def __is_string(column: pd.Series) -> bool:
+        if isinstance(column.dtype, pd.CategoricalDtype) or \
+                not pd.api.types.is_string_dtype(column.dtype):
+            return False
+            # end if
+        # object columns also hold Decimal, date, list and so on
+        return pd.api.types.infer_dtype(column, skipna=True) in ('string', 'empty')
+        # end def
+
+    # end class
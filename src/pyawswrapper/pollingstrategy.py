@@ -0,0 +1,86 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+
+class PollingStrategy(ABC):
+
+    @abstractmethod
+    def wait_time(self, polling_count: int,
+                  query_executions: List[Dict]) -> float:
+        # polling_count: number of pollings done so far, starts with 0
+        # query_executions: `QueryExecution` of the unfinished queries on the last polling
+        pass
+        # end def
+
+    # end class
+
+
+class FixedPolling(PollingStrategy):
+
+    def __init__(self, polling_time: float = 10):
+        super(FixedPolling, self).__init__()
+
+        self.polling_time = polling_time
+        # end def
+
+    def wait_time(self, polling_count: int,
+                  query_executions: List[Dict]) -> float:
+        return self.polling_time
+        # end def
+
+    # end class
+
+
+class BackoffPolling(PollingStrategy):
+
+    def __init__(self,
+                 initial_time: float = 0.2,
+                 max_time: float = 10,
+                 multiplier: float = 2,
+                 jitter: float = 0.1,
+                 use_engine_hint: bool = True,
+                 hint_ratio: float = 0.5):
+        super(BackoffPolling, self).__init__()
+
+        self.initial_time = initial_time
+        self.max_time = max_time
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.use_engine_hint = use_engine_hint
+        self.hint_ratio = hint_ratio
+        # end def
+
+    def wait_time(self, polling_count: int,
+                  query_executions: List[Dict]) -> float:
+
+        result = min(self.max_time,
+                     self.initial_time * (self.multiplier ** polling_count))
+
+        if self.use_engine_hint:
+            # a query that has been running for N seconds is polled again in about N * hint_ratio seconds
+            # queued or just started queries report 0, they would keep the wait at initial_time
+            engine_times = [
+                x['Statistics']['EngineExecutionTimeInMillis'] for x in query_executions
+                if x.get('Statistics', {}).get('EngineExecutionTimeInMillis', 0) > 0]
+            if len(engine_times) > 0:
+                hint = max(self.initial_time,
+                           min(engine_times) / 1000 * self.hint_ratio)
+                result = min(result, hint)
+                # end if
+            # end if
+
+        if self.jitter > 0:
+            result *= 1 + random.uniform(-self.jitter, self.jitter)
+            # end if
+        return max(0, result)
+        # end def
+
+    # end class
@@ -0,0 +1,69 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+from typing import Any, Dict
+
+
+class AthenaQueryStats(object):
+
+    def __init__(self,
+                 query_id: str = None,
+                 state: str = None,
+                 data_scanned_in_bytes: int = None,
+                 engine_execution_time_in_millis: int = None,
+                 query_queue_time_in_millis: int = None,
+                 query_planning_time_in_millis: int = None,
+                 service_processing_time_in_millis: int = None,
+                 total_execution_time_in_millis: int = None,
+                 reused_previous_result: bool = False,
+                 result_size_in_bytes: int = None):
+        super(AthenaQueryStats, self).__init__()
+
+        self.query_id = query_id
+        self.state = state
+        self.data_scanned_in_bytes = data_scanned_in_bytes
+        self.engine_execution_time_in_millis = engine_execution_time_in_millis
+        self.query_queue_time_in_millis = query_queue_time_in_millis
+        self.query_planning_time_in_millis = query_planning_time_in_millis
+        self.service_processing_time_in_millis = service_processing_time_in_millis
+        self.total_execution_time_in_millis = total_execution_time_in_millis
+        self.reused_previous_result = reused_previous_result
+        # size of the downloaded result files, None when it is not downloaded
+        self.result_size_in_bytes = result_size_in_bytes
+        # end def
+
+    @classmethod
+    def from_query_execution(cls, query_execution: Dict) -> 'AthenaQueryStats':
+        # `QueryExecution` of GetQueryExecution
+        statistics = query_execution.get('Statistics', {})
+        return cls(
+            query_id=query_execution['QueryExecutionId'],
+            state=query_execution['Status']['State'],
+            data_scanned_in_bytes=statistics.get('DataScannedInBytes'),
+            engine_execution_time_in_millis=statistics.get(
+                'EngineExecutionTimeInMillis'),
+            query_queue_time_in_millis=statistics.get(
+                'QueryQueueTimeInMillis'),
+            query_planning_time_in_millis=statistics.get(
+                'QueryPlanningTimeInMillis'),
+            service_processing_time_in_millis=statistics.get(
+                'ServiceProcessingTimeInMillis'),
+            total_execution_time_in_millis=statistics.get(
+                'TotalExecutionTimeInMillis'),
+            reused_previous_result=statistics.get('ResultReuseInformation', {}).get(
+                'ReusedPreviousResult', False))
+        # end def
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+        # end def
+
+    def __repr__(self) -> str:
+        return f'AthenaQueryStats({self.to_dict()})'
+        # end def
+
+    # end class
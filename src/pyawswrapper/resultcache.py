@@ -0,0 +1,190 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Union
+
+import pandas as pd
+
+
+class AthenaResultCache(object):
+    # On-disk cache of query results.
+    # A file is written to a temporary file and renamed, so processes can share a directory.
+    # mtime of a file is when it is written (TTL) and atime is when it is read (LRU).
+
+    _file_formats = ('parquet', 'feather')
+    # string literal, quoted identifier or whitespace
+    _quoted_or_space = re.compile(r'(\'(?:[^\']|\'\')*\'|"(?:[^"]|"")*")|\s+')
+
+    def __init__(self,
+                 directory: Union[str, Path],
+                 ttl: float = 3600,
+                 max_bytes: int = 1024 ** 3,
+                 file_format: str = 'parquet'):
+        super(AthenaResultCache, self).__init__()
+
+        if file_format not in self._file_formats:
+            raise ValueError(
+                f'file_format should be one of {self._file_formats}: {file_format}')
+            # end if
+
+        self.__directory = Path(directory)
+        self.__directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.__file_format = file_format
+
+        self.__lock = threading.Lock()
+        self.__metrics = {'hits': 0, 'misses': 0, 'puts': 0, 'evictions': 0}
+        # end def
+
+    @property
+    def directory(self) -> Path:
+        # get only property
+        return self.__directory
+        # end def
+
+    @property
+    def file_format(self) -> str:
+        # get only property
+        return self.__file_format
+        # end def
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        # get only property
+        with self.__lock:
+            return dict(self.__metrics)
+            # end with
+        # end def
+
+    def key(self,
+            query: str,
+            database: str = None,
+            workgroup: str = None,
+            dtype: Dict = None,
+            **kwargs: Any) -> str:
+
+        # whitespace out of quotes and the trailing semicolon do not change the query
+        normalized_query = self._quoted_or_space.sub(
+            lambda x: x.group(1) or ' ', query).strip().rstrip(';').strip()
+        source = json.dumps({'query': normalized_query,
+                             'database': database,
+                             'workgroup': workgroup,
+                             'dtype': dtype,
+                             'kwargs': kwargs},
+                            sort_keys=True, default=str)
+        return hashlib.sha256(source.encode()).hexdigest()
+        # end def
+
+    def get(self, key: str) -> pd.DataFrame:
+        # None on miss
+        this_path = self.__path(key)
+        try:
+            written_at = this_path.stat().st_mtime
+            if time.time() - written_at > self.ttl:
+                self.__remove(this_path)
+                self.__count('misses')
+                return None
+                # end if
+            if self.file_format == 'parquet':
+                result = pd.read_parquet(this_path)
+            else:
+                result = pd.read_feather(this_path)
+                # end if
+            os.utime(this_path, (time.time(), written_at))
+        except FileNotFoundError:
+            # not cached, expired or evicted by another process
+            self.__count('misses')
+            return None
+            # end try
+        self.__count('hits')
+        return result
+        # end def
+
+    def put(self, key: str, value: pd.DataFrame):
+
+        file_no, temp_path = tempfile.mkstemp(
+            dir=self.directory, prefix='.', suffix='.tmp')
+        os.close(file_no)
+        try:
+            if self.file_format == 'parquet':
+                value.to_parquet(temp_path)
+            else:
+                value.reset_index(drop=True).to_feather(temp_path)
+                # end if
+            os.replace(temp_path, self.__path(key))
+        except BaseException:
+            self.__remove(Path(temp_path))
+            raise
+            # end try
+        self.__count('puts')
+
+        self.evict()
+        # end def
+
+    def evict(self):
+        # expired files first, then least recently used files until it fits in max_bytes
+        entries = []
+        for this_path in self.directory.glob(f'*.{self.file_format}'):
+            try:
+                this_stat = this_path.stat()
+            except FileNotFoundError:
+                continue
+                # end try
+            if time.time() - this_stat.st_mtime > self.ttl:
+                self.__remove(this_path)
+                self.__count('evictions')
+            else:
+                entries.append(
+                    (this_stat.st_atime, this_stat.st_size, this_path))
+                # end if
+            # end for
+
+        total_bytes = sum([x[1] for x in entries])
+        for _, this_size, this_path in sorted(entries, key=lambda x: x[0]):
+            if total_bytes <= self.max_bytes:
+                break
+                # end if
+            self.__remove(this_path)
+            self.__count('evictions')
+            total_bytes -= this_size
+            # end for
+        # end def
+
+    def clear(self):
+        for this_path in self.directory.glob(f'*.{self.file_format}'):
+            self.__remove(this_path)
+            # end for
+        # end def
+
+    def __path(self, key: str) -> Path:
+        return self.directory.joinpath(f'{key}.{self.file_format}')
+        # end def
+
+    def __remove(self, target: Path):
+        try:
+            target.unlink()
+        except FileNotFoundError:
+            pass
+            # end try
+        # end def
+
+    def __count(self, name: str):
+        with self.__lock:
+            self.__metrics[name] += 1
+            # end with
+        # end def
+
+    # end class
@@ -5,26 +5,110 @@
 # __version__ = '0.9.0'
 # ---------------------------------------------------------------------------
 
+import fnmatch
+import hashlib
 import logging
 import os
+import posixpath
+import queue
 import re
+import threading
+import time
 import warnings
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from os import path
-from typing import List, Tuple
+from typing import Any, Iterator, List, Tuple
 
+import boto3
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from pyshellutil import ShellCaller, SubprocessErrorException
+from s3transfer.exceptions import (RetriesExceededError, S3DownloadFailedError,
+                                   S3UploadFailedError)
+from s3transfer.subscribers import BaseSubscriber
 
+from .instrumentation import Instrumentation
+from .s3object import S3Object
 from .s3path import s3path
+from .syncplan import SyncAction, SyncPlan
+from .transferresult import TransferResult
 
 
 class ClientErrorException(Exception):
-    pass
+
+    def __init__(self, *args: Any, results: List[TransferResult] = None):
+        super(ClientErrorException, self).__init__(*args)
+        # TransferResult per pair of upload_many and download_many, None for the others
+        self.results = results
+        # end def
+
+    # end class
+
+
+class _TransferTimer(BaseSubscriber):
+    # times one transfer of TransferManager, and sets stop on a failure when it is given
+
+    def __init__(self, stop: threading.Event = None):
+        super(_TransferTimer, self).__init__()
+
+        self.started_at = None
+        self.finished_at = None
+        self.size = 0
+        self.stop = stop
+        # end def
+
+    def on_queued(self, future: Any, **kwargs):
+        # for the transfers without progress, e.g. empty files
+        self.started_at = time.perf_counter()
+        # end def
+
+    def on_progress(self, future: Any, bytes_transferred: int, **kwargs):
+        if self.size == 0 and bytes_transferred > 0:
+            self.started_at = time.perf_counter()
+            # end if
+        self.size += bytes_transferred
+        # end def
+
+    def on_done(self, future: Any, **kwargs):
+        self.finished_at = time.perf_counter()
+        if self.stop is not None:
+            try:
+                future.result()
+            except Exception:
+                # cancelling in a callback of TransferManager would deadlock
+                self.stop.set()
+                # end try
+            # end if
+        # end def
+
+    @property
+    def seconds(self) -> float:
+        # get only property
+        if self.started_at is None or self.finished_at is None:
+            return None
+            # end if
+        return self.finished_at - self.started_at
+        # end def
+
+    # end class
 
 
 class s3client(object):
 
+    _backends = ('subprocess', 'boto3')
+    # endpoint of localstack, used by the boto3 backend with use_local
+    _local_endpoint_url = 'http://localhost:4566'
+    _sync_compares = ('size_mtime', 'etag')
+    _delete_objects_limit = 1000
+    _transfer_errors = (BotoCoreError, ClientError, S3DownloadFailedError,
+                        S3UploadFailedError, RetriesExceededError, OSError)
+
     def __init__(self, profile: str = None,
-                 logger: logging.Logger = None, error_as_exception: bool = None, use_local: bool = False):
+                 logger: logging.Logger = None, error_as_exception: bool = None, use_local: bool = False,
+                 instrumentation: Instrumentation = None, backend: str = 'subprocess',
+                 transfer_config: TransferConfig = None):
+        # backend: 'subprocess' calls awscli, 'boto3' transfers in process with TransferManager
         super(s3client, self).__init__()
 
         self.__base_format = 'aws s3 cp "{0:}" "{1:}"'
@@ -37,9 +121,15 @@ class s3client(object):
         self.profile = None
         self.logger = None
         self.error_as_exception = False
+        self.instrumentation = instrumentation
+        self.backend = backend
+        self.transfer_config = transfer_config
         self.__exit_code = None
         self.__command_line = None
 
+        self.__client_lock = threading.Lock()
+        self.__clients = {}
+
         if profile is not None:
             self.profile = profile
             # end if
@@ -98,6 +188,42 @@ class s3client(object):
         get_error_as_exception,
         set_error_as_exception)
 
+    def get_instrumentation(self) -> Instrumentation:
+        return self.__instrumentation
+        # end def
+
+    def set_instrumentation(self, value: Instrumentation):
+        # None disables the instrumentation
+        self.__instrumentation = value if value is not None else Instrumentation()
+        # end def
+
+    instrumentation = property(get_instrumentation, set_instrumentation)
+
+    def get_backend(self) -> str:
+        return self.__backend
+        # end def
+
+    def set_backend(self, value: str):
+        if value not in self._backends:
+            raise ValueError(
+                f'backend should be one of {self._backends}: {value}')
+            # end if
+        self.__backend = value
+        # end def
+
+    backend = property(get_backend, set_backend)
+
+    def get_transfer_config(self) -> TransferConfig:
+        # multipart_chunksize, max_concurrency and so on of the boto3 backend
+        return self.__transfer_config
+        # end def
+
+    def set_transfer_config(self, value: TransferConfig):
+        self.__transfer_config = value if value is not None else TransferConfig()
+        # end def
+
+    transfer_config = property(get_transfer_config, set_transfer_config)
+
     def GetFroms3(self, s3target: str, target: str, recursive: bool = None,
                   exclude: str = None, include: str = None, profile_overwrite: str = None) -> str:
 
@@ -150,17 +276,30 @@ class s3client(object):
 
         self.__command_line = command
         shell = ShellCaller()
-        try:
-            shell_result = shell.call_subprocess(command)
-            result += shell.parse_result(shell_result, self.logger)
-            self.__exit_code = shell_result[0]
-        except SubprocessErrorException as e:
-            if self.error_as_exception:
-                raise ClientErrorException(str(e))
-            else:
-                self.__exit_code = 1
-                # end if
-            # end try
+        span_attributes = {'s3client.source': s3target,
+                           's3client.destination': target,
+                           's3client.recursive': bool(recursive)}
+        with self.instrumentation.span('s3client.GetFroms3', span_attributes):
+            try:
+                if self.backend == 'boto3':
+                    result += self.__download(
+                        self.__get_client(profile_overwrite), s3target, target, recursive, exclude, include)
+                    self.__exit_code = 0
+                else:
+                    shell_result = shell.call_subprocess(command)
+                    result += shell.parse_result(shell_result, self.logger)
+                    self.__exit_code = shell_result[0]
+                    # end if
+            except (SubprocessErrorException,) + self._transfer_errors as e:
+                self.instrumentation.count(
+                    's3client.errors', 1, {'s3client.operation': 'GetFroms3'})
+                if self.error_as_exception:
+                    raise ClientErrorException(str(e))
+                else:
+                    self.__exit_code = 1
+                    # end if
+                # end try
+            # end with
         return result
         # end def
 
@@ -217,17 +356,30 @@ class s3client(object):
 
         self.__command_line = command
         shell = ShellCaller()
-        try:
-            shell_result = shell.call_subprocess(command)
-            result += shell.parse_result(shell_result, self.logger)
-            self.__exit_code = shell_result[0]
-        except SubprocessErrorException as e:
-            if self.error_as_exception:
-                raise ClientErrorException(str(e))
-            else:
-                self.__exit_code = 1
-                # end if
-            # end try
+        span_attributes = {'s3client.source': target,
+                           's3client.destination': s3target,
+                           's3client.recursive': bool(recursive)}
+        with self.instrumentation.span('s3client.UpTos3', span_attributes):
+            try:
+                if self.backend == 'boto3':
+                    result += self.__upload(
+                        self.__get_client(profile_overwrite), target, s3target, recursive, exclude, include)
+                    self.__exit_code = 0
+                else:
+                    shell_result = shell.call_subprocess(command)
+                    result += shell.parse_result(shell_result, self.logger)
+                    self.__exit_code = shell_result[0]
+                    # end if
+            except (SubprocessErrorException,) + self._transfer_errors as e:
+                self.instrumentation.count(
+                    's3client.errors', 1, {'s3client.operation': 'UpTos3'})
+                if self.error_as_exception:
+                    raise ClientErrorException(str(e))
+                else:
+                    self.__exit_code = 1
+                    # end if
+                # end try
+            # end with
         return result
         # end def
 
@@ -266,17 +418,29 @@ class s3client(object):
 
         result_string = ''
         shell = ShellCaller()
-        try:
-            shell_result = shell.call_subprocess(command)
-            result_string = shell.parse_result(shell_result, self.logger)
-            self.__exit_code = shell_result[0]
-        except SubprocessErrorException as e:
-            if self.error_as_exception:
-                raise ClientErrorException(str(e))
-            else:
-                self.__exit_code = 1
-                # end if
-            # end try
+        span_attributes = {'s3client.source': s3target,
+                           's3client.recursive': bool(recursive)}
+        with self.instrumentation.span('s3client.ls', span_attributes):
+            try:
+                if self.backend == 'boto3':
+                    prefixes, files = self.__list(
+                        self.__get_client(profile_overwrite), s3target, recursive)
+                    self.__exit_code = 0
+                    return (prefixes, files)
+                    # end if
+                shell_result = shell.call_subprocess(command)
+                result_string = shell.parse_result(shell_result, self.logger)
+                self.__exit_code = shell_result[0]
+            except (SubprocessErrorException,) + self._transfer_errors as e:
+                self.instrumentation.count(
+                    's3client.errors', 1, {'s3client.operation': 'ls'})
+                if self.error_as_exception:
+                    raise ClientErrorException(str(e))
+                else:
+                    self.__exit_code = 1
+                    # end if
+                # end try
+            # end with
 
         if self.__exit_code == 0:
             candidates = result_string.split(os.linesep)
@@ -303,4 +467,663 @@ class s3client(object):
         return (prefixes, files)
         # end def
 
+    def ls_iter(self, s3target: str, recursive: bool = None, page_size: int = None,
+                profile_overwrite: str = None) -> Iterator[S3Object]:
+        # streams S3Object page by page from ListObjectsV2, with exact sizes
+        # without recursive, common prefixes under the last '/' are yielded as S3Object with is_prefix
+        # page_size: keys per request, a small value returns the first keys sooner
+
+        self.__command_line = None
+        # also for a consumer that stops early
+        self.__exit_code = 0
+        span_attributes = {'s3client.source': s3target,
+                           's3client.recursive': bool(recursive)}
+        with self.instrumentation.span('s3client.ls_iter', span_attributes):
+            try:
+                yield from self.__iter_objects(
+                    self.__get_client(profile_overwrite), s3target, recursive, page_size)
+            except GeneratorExit:
+                # the consumer stopped early, not an error
+                return
+            except self._transfer_errors as e:
+                self.instrumentation.count(
+                    's3client.errors', 1, {'s3client.operation': 'ls_iter'})
+                if self.error_as_exception:
+                    raise ClientErrorException(str(e))
+                else:
+                    self.__exit_code = 1
+                    # end if
+                # end try
+            # end with
+        # end def
+
+    def ls_parallel(self, s3target: str, max_depth: int = 2, max_concurrency: int = 8,
+                    profile_overwrite: str = None) -> Tuple[List[str], List[str]]:
+        # same result as ls with recursive, listed by ls_parallel_iter
+
+        files = []
+        span_attributes = {'s3client.source': s3target,
+                           's3client.max_depth': max_depth,
+                           's3client.max_concurrency': max_concurrency}
+        with self.instrumentation.span('s3client.ls_parallel', span_attributes):
+            for this_object in self.ls_parallel_iter(
+                    s3target, max_depth, max_concurrency, profile_overwrite):
+                if not this_object.key.endswith('/'):
+                    files.append(this_object.key)
+                    # end if
+                # end for
+            # end with
+        if self.__exit_code != 0:
+            return ([], [])
+            # end if
+        # shards finish in any order
+        files.sort()
+        return ([], files)
+        # end def
+
+    def ls_parallel_iter(self, s3target: str, max_depth: int = 2, max_concurrency: int = 8,
+                         profile_overwrite: str = None) -> Iterator[S3Object]:
+        # streams all keys under s3target like ls_iter with recursive, but lists shards concurrently
+        # common prefixes are discovered with delimiter listings down to max_depth levels,
+        # then each prefix at max_depth is listed recursively on a pool of max_concurrency threads
+        # the keys are yielded in no particular order
+
+        if max_concurrency < 1:
+            raise ValueError(
+                f'max_concurrency should be 1 or more: {max_concurrency}')
+            # end if
+
+        self.__command_line = None
+        # also for a consumer that stops early
+        self.__exit_code = 0
+        span_attributes = {'s3client.source': s3target,
+                           's3client.max_depth': max_depth,
+                           's3client.max_concurrency': max_concurrency}
+        with self.instrumentation.span('s3client.ls_parallel_iter', span_attributes):
+            try:
+                yield from self.__iter_sharded(
+                    self.__get_client(profile_overwrite), s3target, max_depth, max_concurrency)
+            except GeneratorExit:
+                # the consumer stopped early, not an error
+                return
+            except self._transfer_errors as e:
+                self.instrumentation.count(
+                    's3client.errors', 1, {'s3client.operation': 'ls_parallel'})
+                if self.error_as_exception:
+                    raise ClientErrorException(str(e))
+                else:
+                    self.__exit_code = 1
+                    # end if
+                # end try
+            # end with
+        # end def
+
+    def sync_up(self, target: str, s3target: str, delete: bool = False,
+                exclude: str = None, include: str = None, compare: str = 'size_mtime',
+                dry_run: bool = False, profile_overwrite: str = None) -> SyncPlan:
+        # uploads the files of the directory target that are new or changed under s3target
+        # delete: removes the keys under s3target that are not in target
+        # compare: 'size_mtime' like `aws s3 sync`, or 'etag' to compare MD5 where the ETag is computable
+        return self.__sync('up', target, s3target, delete, exclude, include,
+                           compare, dry_run, profile_overwrite)
+        # end def
+
+    def sync_down(self, s3target: str, target: str, delete: bool = False,
+                  exclude: str = None, include: str = None, compare: str = 'size_mtime',
+                  dry_run: bool = False, profile_overwrite: str = None) -> SyncPlan:
+        # downloads the keys under s3target that are new or changed into the directory target
+        # delete: removes the files in target that are not under s3target
+        return self.__sync('down', s3target, target, delete, exclude, include,
+                           compare, dry_run, profile_overwrite)
+        # end def
+
+    def __sync(self, direction: str, source: str, destination: str, delete: bool,
+               exclude: str, include: str, compare: str, dry_run: bool,
+               profile_overwrite: str) -> SyncPlan:
+
+        if compare not in self._sync_compares:
+            raise ValueError(
+                f'compare should be one of {self._sync_compares}: {compare}')
+            # end if
+
+        self.__command_line = None
+        plan = SyncPlan(direction, str(source), str(destination))
+        operation = f'sync_{direction}'
+        span_attributes = {'s3client.source': str(source),
+                           's3client.destination': str(destination),
+                           's3client.dry_run': dry_run}
+        with self.instrumentation.span(f's3client.{operation}', span_attributes):
+            try:
+                client = self.__get_client(profile_overwrite)
+                if direction == 'up':
+                    self.__plan_sync(client, plan, source, destination,
+                                     delete, exclude, include, compare)
+                else:
+                    self.__plan_sync(client, plan, destination, source,
+                                     delete, exclude, include, compare)
+                    # end if
+                if not dry_run:
+                    self.__execute_sync(client, plan)
+                    # end if
+                self.__exit_code = 0
+            except self._transfer_errors as e:
+                self.instrumentation.count(
+                    's3client.errors', 1, {'s3client.operation': operation})
+                if self.error_as_exception:
+                    raise ClientErrorException(str(e))
+                else:
+                    self.__exit_code = 1
+                    # end if
+                # end try
+            # end with
+        return plan
+        # end def
+
+    def __plan_sync(self, client: Any, plan: SyncPlan, target: str, s3target: str, delete: bool,
+                    exclude: str, include: str, compare: str):
+        # compares the local files with a streaming listing, only the local side is held in memory
+
+        bucket, key = self._split(s3target)
+        prefix = key if key == '' or key.endswith('/') else key + '/'
+
+        local_files = {}
+        for root, _, file_names in os.walk(target):
+            for this_name in file_names:
+                local_path = path.join(root, this_name)
+                relative = path.relpath(
+                    local_path, target).replace(os.sep, '/')
+                if self._is_included(relative, exclude, include):
+                    local_files[relative] = local_path
+                    # end if
+                # end for
+            # end for
+
+        for this_object in self.__iter_objects(client, f's3://{bucket}/{prefix}', True):
+            relative = this_object.key[len(prefix):]
+            if relative == '' or relative.endswith('/') or \
+                    not self._is_included(relative, exclude, include):
+                continue
+                # end if
+            local_path = local_files.pop(relative, None)
+            if local_path is None:
+                if plan.direction == 'down':
+                    plan.actions.append(SyncAction(
+                        'download', this_object.uri, path.join(target, *relative.split('/')),
+                        this_object.size, 'new', this_object.last_modified))
+                elif delete:
+                    plan.actions.append(SyncAction(
+                        'delete', this_object.uri, None, this_object.size, 'extra'))
+                    # end if
+                continue
+                # end if
+
+            reason = self.__changed_reason(
+                plan.direction, local_path, this_object, compare)
+            if reason is None:
+                plan.unchanged += 1
+            elif plan.direction == 'up':
+                plan.actions.append(SyncAction(
+                    'upload', local_path, this_object.uri, os.stat(local_path).st_size, reason))
+            else:
+                plan.actions.append(SyncAction(
+                    'download', this_object.uri, local_path, this_object.size, reason,
+                    this_object.last_modified))
+                # end if
+            # end for
+
+        # only in local
+        for relative, local_path in sorted(local_files.items()):
+            if plan.direction == 'up':
+                plan.actions.append(SyncAction(
+                    'upload', local_path, f's3://{bucket}/{prefix}{relative}',
+                    os.stat(local_path).st_size, 'new'))
+            elif delete:
+                plan.actions.append(SyncAction(
+                    'delete', local_path, None, os.stat(local_path).st_size, 'extra'))
+                # end if
+            # end for
+        # end def
+
+    def __changed_reason(self, direction: str, local_path: str, s3object: S3Object,
+                         compare: str) -> str:
+        # None when the file is in sync
+
+        local_stat = os.stat(local_path)
+        if local_stat.st_size != s3object.size:
+            return 'size'
+            # end if
+
+        if compare == 'etag':
+            local_etag = self._local_etag(
+                local_path, local_stat.st_size, s3object.etag, self.transfer_config.multipart_chunksize)
+            if local_etag is not None:
+                return None if local_etag == s3object.etag else 'etag'
+                # end if
+            # end if
+
+        # LastModified of S3 is in seconds
+        local_mtime = int(local_stat.st_mtime)
+        s3_mtime = int(s3object.last_modified.timestamp())
+        if direction == 'up' and local_mtime > s3_mtime:
+            return 'mtime'
+        elif direction == 'down' and s3_mtime > local_mtime:
+            return 'mtime'
+            # end if
+        return None
+        # end def
+
+    def __execute_sync(self, client: Any, plan: SyncPlan):
+
+        bucket, _ = self._split(plan.destination if plan.direction == 'up' else plan.source)
+        transfers = []
+        with create_transfer_manager(client, self.transfer_config) as manager:
+            for this_action in plan.transfers:
+                if this_action.action == 'upload':
+                    transfers.append((manager.upload(
+                        this_action.source, bucket, self._split(this_action.destination)[1]), this_action))
+                else:
+                    os.makedirs(path.dirname(this_action.destination), exist_ok=True)
+                    transfers.append((manager.download(
+                        bucket, self._split(this_action.source)[1], this_action.destination), this_action))
+                    # end if
+                # end for
+
+            for this_future, this_action in transfers:
+                this_future.result()
+                self.logger.info(
+                    f'{this_action.action}: {this_action.source} to {this_action.destination}')
+                # end for
+            # end with
+
+        if plan.direction == 'down':
+            # mtime of S3, so that the next sync_down does not download them again
+            for this_action in plan.transfers:
+                s3_mtime = this_action.last_modified.timestamp()
+                os.utime(this_action.destination, (s3_mtime, s3_mtime))
+                # end for
+            # end if
+
+        if plan.direction == 'up':
+            deletes = [self._split(x.source)[1] for x in plan.deletes]
+            for x in range(0, len(deletes), self._delete_objects_limit):
+                response = client.delete_objects(Bucket=bucket, Delete={
+                    'Objects': [{'Key': y} for y in deletes[x:x + self._delete_objects_limit]],
+                    'Quiet': True})
+                if len(response.get('Errors', [])) > 0:
+                    raise ClientError(
+                        {'Error': response['Errors'][0]}, 'DeleteObjects')
+                    # end if
+                # end for
+        else:
+            for this_action in plan.deletes:
+                os.remove(this_action.source)
+                # end for
+            # end if
+        for this_action in plan.deletes:
+            self.logger.info(f'delete: {this_action.source}')
+            # end for
+        plan.executed = True
+        # end def
+
+    def upload_many(self, pairs: List[Tuple[str, str]], stop_on_error: bool = False,
+                    profile_overwrite: str = None) -> List[TransferResult]:
+        # uploads (local file, s3 uri of the key) pairs on one TransferManager and connection pool
+        # transfer_config.max_concurrency bounds the threads
+        # a failure does not stop the others unless stop_on_error, the pending ones are cancelled then
+        return self.__transfer_many('upload', pairs, stop_on_error, profile_overwrite)
+        # end def
+
+    def download_many(self, pairs: List[Tuple[str, str]], stop_on_error: bool = False,
+                      profile_overwrite: str = None) -> List[TransferResult]:
+        # downloads (s3 uri of the key, local file) pairs, see upload_many
+        return self.__transfer_many('download', pairs, stop_on_error, profile_overwrite)
+        # end def
+
+    def __transfer_many(self, action: str, pairs: List[Tuple[str, str]], stop_on_error: bool,
+                        profile_overwrite: str) -> List[TransferResult]:
+
+        self.__command_line = None
+        operation = f'{action}_many'
+        results = [TransferResult(str(x), str(y)) for x, y in pairs]
+        stop = threading.Event() if stop_on_error else None
+        span_attributes = {'s3client.items': len(results),
+                           's3client.stop_on_error': stop_on_error}
+        with self.instrumentation.span(f's3client.{operation}', span_attributes):
+            try:
+                client = self.__get_client(profile_overwrite)
+            except self._transfer_errors as e:
+                for this_result in results:
+                    this_result.error = e
+                    # end for
+                client = None
+                # end try
+
+            transfers = []
+            if client is not None:
+                with create_transfer_manager(client, self.transfer_config) as manager:
+                    for this_result in results:
+                        if stop is not None and stop.is_set():
+                            this_result.error = CancelledError()
+                            continue
+                            # end if
+                        timer = _TransferTimer(stop)
+                        try:
+                            if action == 'upload':
+                                bucket, key = self._split(this_result.destination)
+                                this_future = manager.upload(
+                                    this_result.source, bucket, key, subscribers=[timer])
+                            else:
+                                bucket, key = self._split(this_result.source)
+                                directory = path.dirname(this_result.destination)
+                                if directory != '':
+                                    os.makedirs(directory, exist_ok=True)
+                                    # end if
+                                this_future = manager.download(
+                                    bucket, key, this_result.destination, subscribers=[timer])
+                                # end if
+                        except self._transfer_errors as e:
+                            this_result.error = e
+                            if stop is not None:
+                                stop.set()
+                                # end if
+                            continue
+                            # end try
+                        transfers.append((this_future, timer, this_result))
+                        # end for
+
+                    for x, (this_future, timer, this_result) in enumerate(transfers):
+                        if stop is not None:
+                            while not this_future.done() and not stop.is_set():
+                                stop.wait(0.05)
+                                # end while
+                            if stop.is_set():
+                                for this_one, _, _ in transfers[x:]:
+                                    # does nothing when it is already done
+                                    this_one.cancel()
+                                    # end for
+                                # end if
+                            # end if
+                        try:
+                            this_future.result()
+                        except Exception as e:
+                            this_result.error = e
+                            # end try
+                        this_result.size = timer.size
+                        this_result.seconds = timer.seconds
+                        # end for
+                    # end with
+                # end if
+
+            errors = [x for x in results if not x.succeeded]
+            for this_result in errors:
+                self.logger.warning(
+                    f'{action} failed: {this_result.source} to {this_result.destination}: {this_result.error!r}')
+                self.instrumentation.count(
+                    's3client.errors', 1, {'s3client.operation': operation})
+                # end for
+            self.__exit_code = 0 if len(errors) == 0 else 1
+            # end with
+
+        if self.error_as_exception and len(errors) > 0:
+            raise ClientErrorException(
+                f'{len(errors)} of {len(results)} failed: {errors[0].source}: {errors[0].error!r}',
+                results=results)
+            # end if
+        return results
+        # end def
+
+    def __get_client(self, profile_overwrite: str = None) -> Any:
+        # boto3 clients are thread-safe, but sessions are not
+        profile = profile_overwrite if profile_overwrite is not None else self.profile
+        with self.__client_lock:
+            if profile not in self.__clients:
+                endpoint_url = self._local_endpoint_url if self.__use_local else None
+                # a connection for every concurrent request of the transfers
+                config = Config(max_pool_connections=max(
+                    10, self.transfer_config.max_request_concurrency))
+                self.__clients[profile] = boto3.Session(profile_name=profile).client(
+                    's3', endpoint_url=endpoint_url, config=config)
+                # end if
+            return self.__clients[profile]
+            # end with
+        # end def
+
+    def __download(self, client: Any, s3target: str, target: str, recursive: bool,
+                   exclude: str, include: str) -> str:
+
+        bucket, key = self._split(s3target)
+        transfers = []
+        with create_transfer_manager(client, self.transfer_config) as manager:
+            if not recursive:
+                this_key = posixpath.join(key, path.basename(target))
+                transfers.append((manager.download(bucket, this_key, str(target)),
+                                  f'download: s3://{bucket}/{this_key} to {target}'))
+            else:
+                prefix = key if key == '' or key.endswith('/') else key + '/'
+                for this_page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+                    for this_object in this_page.get('Contents', []):
+                        relative = this_object['Key'][len(prefix):]
+                        if relative == '' or relative.endswith('/') or \
+                                not self._is_included(relative, exclude, include):
+                            continue
+                            # end if
+                        local_path = path.join(target, *relative.split('/'))
+                        os.makedirs(path.dirname(local_path), exist_ok=True)
+                        transfers.append((manager.download(bucket, this_object['Key'], local_path),
+                                          f'download: s3://{bucket}/{this_object["Key"]} to {local_path}'))
+                        # end for
+                    # end for
+                # end if
+
+            result = ''
+            for this_future, this_line in transfers:
+                this_future.result()
+                self.logger.info(this_line)
+                result += this_line + self.__newline
+                # end for
+            # end with
+        return result
+        # end def
+
+    def __upload(self, client: Any, target: str, s3target: str, recursive: bool,
+                 exclude: str, include: str) -> str:
+
+        bucket, key = self._split(s3target)
+        transfers = []
+        with create_transfer_manager(client, self.transfer_config) as manager:
+            if not recursive:
+                this_key = posixpath.join(key, path.basename(target))
+                transfers.append((manager.upload(str(target), bucket, this_key),
+                                  f'upload: {target} to s3://{bucket}/{this_key}'))
+            else:
+                for root, _, file_names in os.walk(target):
+                    for this_name in sorted(file_names):
+                        local_path = path.join(root, this_name)
+                        relative = path.relpath(
+                            local_path, target).replace(os.sep, '/')
+                        if not self._is_included(relative, exclude, include):
+                            continue
+                            # end if
+                        this_key = posixpath.join(key, relative)
+                        transfers.append((manager.upload(local_path, bucket, this_key),
+                                          f'upload: {local_path} to s3://{bucket}/{this_key}'))
+                        # end for
+                    # end for
+                # end if
+
+            result = ''
+            for this_future, this_line in transfers:
+                this_future.result()
+                self.logger.info(this_line)
+                result += this_line + self.__newline
+                # end for
+            # end with
+        return result
+        # end def
+
+    def __list(self, client: Any, s3target: str,
+               recursive: bool) -> Tuple[List[str], List[str]]:
+        # same names as `aws s3 ls`: full keys with recursive, otherwise relative to the last '/'
+
+        _, key = self._split(s3target)
+        base = '' if recursive else key[:key.rfind('/') + 1]
+
+        prefixes = []
+        files = []
+        for this_object in self.__iter_objects(client, s3target, recursive):
+            name = this_object.key[len(base):]
+            if this_object.is_prefix:
+                prefixes.append(name)
+            elif name != '' and not name.endswith('/'):
+                files.append(name)
+                # end if
+            # end for
+        return (prefixes, files)
+        # end def
+
+    def __iter_objects(self, client: Any, s3target: str, recursive: bool,
+                       page_size: int = None) -> Iterator[S3Object]:
+
+        bucket, key = self._split(s3target)
+        additional_args = {}
+        if not recursive:
+            additional_args['Delimiter'] = '/'
+            # end if
+        if page_size is not None:
+            additional_args['PaginationConfig'] = {'PageSize': page_size}
+            # end if
+
+        for this_page in client.get_paginator('list_objects_v2').paginate(
+                Bucket=bucket, Prefix=key, **additional_args):
+            for this_prefix in this_page.get('CommonPrefixes', []):
+                yield S3Object.from_common_prefix(bucket, this_prefix)
+                # end for
+            for this_object in this_page.get('Contents', []):
+                yield S3Object.from_content(bucket, this_object)
+                # end for
+            # end for
+        # end def
+
+    def __iter_sharded(self, client: Any, s3target: str, max_depth: int,
+                       max_concurrency: int) -> Iterator[S3Object]:
+
+        bucket, key = self._split(s3target)
+        # pages of the shards, bounded so memory stays constant when the consumer is slower
+        pages = queue.Queue(maxsize=max_concurrency * 2)
+        stopped = threading.Event()
+        finished = object()
+
+        def put(item: Any):
+            while not stopped.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+                    # end try
+                # end while
+            # end def
+
+        def list_shard(prefix: str, depth: int):
+            additional_args = {}
+            if depth < max_depth:
+                additional_args['Delimiter'] = '/'
+                # end if
+            try:
+                for this_page in client.get_paginator('list_objects_v2').paginate(
+                        Bucket=bucket, Prefix=prefix, **additional_args):
+                    if stopped.is_set():
+                        return
+                        # end if
+                    put((depth,
+                         [x['Prefix']
+                             for x in this_page.get('CommonPrefixes', [])],
+                         [S3Object.from_content(bucket, x) for x in this_page.get('Contents', [])]))
+                    # end for
+            except BaseException as e:
+                put(e)
+            finally:
+                put(finished)
+                # end try
+            # end def
+
+        executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix='s3client-ls')
+        try:
+            executor.submit(list_shard, key, 0)
+            pending = 1
+            while pending > 0:
+                item = pages.get()
+                if item is finished:
+                    pending -= 1
+                    continue
+                    # end if
+                if isinstance(item, BaseException):
+                    raise item
+                    # end if
+                depth, prefixes, objects = item
+                for this_prefix in prefixes:
+                    executor.submit(list_shard, this_prefix, depth + 1)
+                    pending += 1
+                    # end for
+                yield from objects
+                # end while
+        finally:
+            # also when the consumer stops early
+            stopped.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            # end try
+        # end def
+
+    @classmethod
+    def _split(cls, s3target: str) -> Tuple[str, str]:
+        # bucket and key
+        parts = str(s3target).removeprefix(s3path._s3_protocol).split('/', 1)
+        return parts[0], parts[1] if len(parts) > 1 else ''
+        # end def
+
+    @staticmethod
+    def _is_included(relative: str, exclude: str, include: str) -> bool:
+        # filters of awscli, applied in the order of the command line and the last match wins
+        result = True
+        if exclude is not None and fnmatch.fnmatchcase(relative, exclude):
+            result = False
+            # end if
+        if include is not None and fnmatch.fnmatchcase(relative, include):
+            result = True
+            # end if
+        return result
+        # end def
+
+    @staticmethod
+    def _local_etag(local_path: str, size: int, etag: str, part_size: int) -> str:
+        # ETag of S3 for the local file, None when it cannot be computed
+        # a multipart ETag is computable only when the parts were part_size long
+
+        if etag is None:
+            return None
+            # end if
+        if '-' not in etag:
+            hasher = hashlib.md5()
+            with open(local_path, 'rb') as file:
+                for this_chunk in iter(lambda: file.read(1024 ** 2), b''):
+                    hasher.update(this_chunk)
+                    # end for
+                # end with
+            return hasher.hexdigest()
+            # end if
+
+        parts = etag.rsplit('-', 1)[1]
+        if not parts.isdigit() or int(parts) != max(1, -(-size // part_size)):
+            return None
+            # end if
+        digests = b''
+        with open(local_path, 'rb') as file:
+            for this_part in iter(lambda: file.read(part_size), b''):
+                digests += hashlib.md5(this_part).digest()
+                # end for
+            # end with
+        return f'{hashlib.md5(digests).hexdigest()}-{parts}'
+        # end def
+
     # end class
@@ -0,0 +1,81 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+from datetime import datetime
+from typing import Any, Dict
+
+
+class S3Object(object):
+    # A key or a common prefix of ListObjectsV2.
+    # size, etag and last_modified are None for a common prefix.
+
+    __slots__ = ('bucket', 'key', 'size', 'etag', 'last_modified')
+
+    def __init__(self,
+                 bucket: str,
+                 key: str,
+                 size: int = None,
+                 etag: str = None,
+                 last_modified: datetime = None):
+        super(S3Object, self).__init__()
+
+        self.bucket = bucket
+        self.key = key
+        # exact size in bytes
+        self.size = size
+        # without the double quotes
+        self.etag = etag
+        self.last_modified = last_modified
+        # end def
+
+    @classmethod
+    def from_content(cls, bucket: str, content: Dict) -> 'S3Object':
+        # an element of `Contents`
+        return cls(
+            bucket=bucket,
+            key=content['Key'],
+            size=content.get('Size'),
+            etag=content.get('ETag', '').strip('"') or None,
+            last_modified=content.get('LastModified'))
+        # end def
+
+    @classmethod
+    def from_common_prefix(cls, bucket: str, common_prefix: Dict) -> 'S3Object':
+        # an element of `CommonPrefixes`
+        return cls(bucket=bucket, key=common_prefix['Prefix'])
+        # end def
+
+    @property
+    def is_prefix(self) -> bool:
+        # get only property
+        return self.size is None
+        # end def
+
+    @property
+    def uri(self) -> str:
+        # get only property
+        return f's3://{self.bucket}/{self.key}'
+        # end def
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+        # end def
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, S3Object):
+            return NotImplemented
+            # end if
+        return self.to_dict() == other.to_dict()
+        # end def
+
+    def __repr__(self) -> str:
+        values = ', '.join(
+            f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'S3Object({values})'
+        # end def
+
+    # end class
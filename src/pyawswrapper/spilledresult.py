@@ -0,0 +1,75 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Any, List, Union
+
+import pandas as pd
+
+
+class SpilledResult(object):
+    # A query result written to a local Arrow IPC (feather) file.
+    # Nothing is read until load or read_table is called.
+
+    def __init__(self, path: Union[str, Path]):
+        super(SpilledResult, self).__init__()
+
+        self.__path = Path(path)
+        # end def
+
+    @classmethod
+    def write(cls, directory: Union[str, Path], value: pd.DataFrame) -> 'SpilledResult':
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        this_path = directory.joinpath(f'{uuid.uuid4().hex}.feather')
+
+        # readers never see a partial file
+        file_no, temp_path = tempfile.mkstemp(
+            dir=directory, prefix='.', suffix='.tmp')
+        os.close(file_no)
+        try:
+            # compressed buffers would be decompressed onto the heap instead of memory-mapped
+            value.reset_index(drop=True).to_feather(
+                temp_path, compression='uncompressed')
+            os.replace(temp_path, this_path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+            # end try
+        return cls(this_path)
+        # end def
+
+    @property
+    def path(self) -> Path:
+        # get only property
+        return self.__path
+        # end def
+
+    def load(self, columns: List[str] = None) -> pd.DataFrame:
+        return pd.read_feather(self.path, columns=columns)
+        # end def
+
+    def read_table(self, memory_map: bool = True) -> Any:
+        # pyarrow.Table, memory-mapped so the pages are loaded on access
+        from pyarrow import feather
+
+        return feather.read_table(self.path, memory_map=memory_map)
+        # end def
+
+    def remove(self):
+        self.path.unlink(missing_ok=True)
+        # end def
+
+    def __repr__(self) -> str:
+        return f'SpilledResult({str(self.path)!r})'
+        # end def
+
+    # end class
@@ -0,0 +1,106 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+from datetime import datetime
+from typing import Any, Dict, List
+
+
+class SyncAction(object):
+    # One step of a SyncPlan.
+    # action: 'upload', 'download' or 'delete'
+    # reason: 'new', 'size', 'mtime', 'etag' or 'extra'
+
+    __slots__ = ('action', 'source', 'destination',
+                 'size', 'reason', 'last_modified')
+
+    def __init__(self, action: str, source: str, destination: str,
+                 size: int = None, reason: str = None, last_modified: datetime = None):
+        super(SyncAction, self).__init__()
+
+        self.action = action
+        self.source = source
+        # None for delete
+        self.destination = destination
+        self.size = size
+        self.reason = reason
+        # LastModified of the S3 object to download
+        self.last_modified = last_modified
+        # end def
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+        # end def
+
+    def __repr__(self) -> str:
+        values = ', '.join(
+            f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'SyncAction({values})'
+        # end def
+
+    # end class
+
+
+class SyncPlan(object):
+    # What s3client.sync_up or s3client.sync_down transfers and deletes.
+    # With dry_run, it is returned without being executed.
+
+    def __init__(self, direction: str, source: str, destination: str,
+                 actions: List[SyncAction] = None, unchanged: int = 0,
+                 executed: bool = False):
+        super(SyncPlan, self).__init__()
+
+        # 'up' or 'down'
+        self.direction = direction
+        self.source = source
+        self.destination = destination
+        self.actions = actions if actions is not None else []
+        # files that are already in sync
+        self.unchanged = unchanged
+        self.executed = executed
+        # end def
+
+    @property
+    def transfers(self) -> List[SyncAction]:
+        # get only property
+        return [x for x in self.actions if x.action != 'delete']
+        # end def
+
+    @property
+    def deletes(self) -> List[SyncAction]:
+        # get only property
+        return [x for x in self.actions if x.action == 'delete']
+        # end def
+
+    @property
+    def bytes_to_transfer(self) -> int:
+        # get only property
+        return sum(x.size or 0 for x in self.transfers)
+        # end def
+
+    @property
+    def is_empty(self) -> bool:
+        # get only property
+        return len(self.actions) == 0
+        # end def
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'direction': self.direction,
+            'source': self.source,
+            'destination': self.destination,
+            'actions': [x.to_dict() for x in self.actions],
+            'unchanged': self.unchanged,
+            'executed': self.executed}
+        # end def
+
+    def __repr__(self) -> str:
+        return (f'SyncPlan(direction={self.direction!r}, source={self.source!r}, '
+                f'destination={self.destination!r}, transfers={len(self.transfers)}, '
+                f'deletes={len(self.deletes)}, unchanged={self.unchanged}, executed={self.executed})')
+        # end def
+
+    # end class
@@ -0,0 +1,46 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# __author__ = 'Satoshi Imai'
+# __credits__ = ['Satoshi Imai']
+# __version__ = "0.10.0"
+# ---------------------------------------------------------------------------
+
+from typing import Any, Dict
+
+
+class TransferResult(object):
+    # Result of one item of s3client.upload_many or s3client.download_many.
+
+    __slots__ = ('source', 'destination', 'size', 'seconds', 'error')
+
+    def __init__(self, source: str, destination: str, size: int = None,
+                 seconds: float = None, error: BaseException = None):
+        super(TransferResult, self).__init__()
+
+        self.source = source
+        self.destination = destination
+        # bytes transferred
+        self.size = size
+        # from the first byte to the end, not including the time in the queue
+        self.seconds = seconds
+        # None on success
+        self.error = error
+        # end def
+
+    @property
+    def succeeded(self) -> bool:
+        # get only property
+        return self.error is None
+        # end def
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+        # end def
+
+    def __repr__(self) -> str:
+        values = ', '.join(
+            f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'TransferResult({values})'
+        # end def
+
+    # end class
@@ -0,0 +1,215 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+
+import asyncio
+import copy
+import logging
+import time
+from logging import Logger, StreamHandler
+from typing import Dict, Generator, List, Union
+from unittest.mock import Mock, patch
+
+import boto3
+import pytest
+from moto.athena import mock_athena
+
+from src.pyawswrapper import (AsyncAthenaClient, AthenaCallException,
+                              AthenaClient)
+
+mock_s3_path = 's3://localstack-bucket/athena'
+
+
+@pytest.fixture(scope='module')
+def logger() -> Generator[Logger, None, None]:
+    log = logging.getLogger(__name__)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s : %(message)s')
+    s_handler = StreamHandler()
+    s_handler.setLevel(logging.INFO)
+    s_handler.setFormatter(formatter)
+    log.addHandler(s_handler)
+
+    yield log
+    # end def
+
+
+def mock_athena_session(states: List[str], running_seconds: Union[float, List[float]]) -> Mock:
+    # queries are RUNNING for `running_seconds`, then they are in `states`
+    if not isinstance(running_seconds, list):
+        running_seconds = [running_seconds for _ in range(len(states))]
+        # end if
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    executions = {}
+    start_results = []
+    for this_state in states:
+        start_result = my_client.start_query_execution(
+            QueryString='SELECT stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        this_execution = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])['QueryExecution']
+        this_execution['Status']['State'] = this_state
+        executions[start_result['QueryExecutionId']] = (
+            this_execution, running_seconds[len(executions)])
+        # end for
+    started_at = time.monotonic()
+
+    def batch_get_query_execution(QueryExecutionIds: List[str]) -> Dict:
+        query_executions = []
+        for this_id in QueryExecutionIds:
+            this_execution = copy.deepcopy(executions[this_id][0])
+            if time.monotonic() - started_at < executions[this_id][1]:
+                this_execution['Status']['State'] = 'RUNNING'
+                # end if
+            query_executions.append(this_execution)
+            # end for
+        return {'QueryExecutions': query_executions,
+                'UnprocessedQueryExecutionIds': []}
+        # end def
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.side_effect = batch_get_query_execution
+    mock_athena_client.get_query_execution.side_effect = lambda QueryExecutionId: {
+        'QueryExecution': batch_get_query_execution([QueryExecutionId])['QueryExecutions'][0]}
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+    return mock_session
+    # end def
+
+
+@pytest.mark.run(order=10)
+def test_init(logger: Logger):
+
+    logger.info('test init')
+
+    my_athena = AthenaClient(database='dummy', logger=logger)
+    assert AsyncAthenaClient(my_athena).client is my_athena
+
+    my_async_athena = AsyncAthenaClient(database='dummy', workplace=mock_s3_path)
+    assert my_async_athena.client.database == 'dummy'
+    assert my_async_athena.client.workplace == mock_s3_path
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=20)
+def test_run_queries(logger: Logger):
+
+    logger.info('run_queries')
+
+    mock_session = mock_athena_session(['SUCCEEDED', 'SUCCEEDED'], 0.5)
+
+    my_async_athena = AsyncAthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0.05,
+        logger=logger)
+
+    async def run() -> List:
+        ticks = 0
+        task = asyncio.ensure_future(my_async_athena.run_queries(
+            ['SELECT dummy1', 'SELECT dummy2'], return_paths=True))
+        while not task.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+            # end while
+        return ticks, task.result()
+        # end def
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        ticks, results = asyncio.run(run())
+        # end with
+
+    # the event loop is not blocked while polling
+    assert ticks > 10
+    assert len(results) == 2
+    assert all([x == mock_s3_path for x in results])
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=30)
+def test_run_query_exception(logger: Logger):
+
+    logger.info('run_query exception')
+
+    mock_session = mock_athena_session(['FAILED', 'FAILED'], 0)
+
+    my_async_athena = AsyncAthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0.01,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        with pytest.raises(AthenaCallException):
+            asyncio.run(my_async_athena.run_query('SELECT dummy'))
+            # end with
+
+        my_async_athena.client.error_as_exception = False
+        assert asyncio.run(my_async_athena.run_query('SELECT dummy')) is None
+        # end with
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=40)
+def test_cancel(logger: Logger):
+
+    logger.info('cancel')
+
+    mock_session = mock_athena_session(['SUCCEEDED'], 60)
+
+    my_async_athena = AsyncAthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0.01,
+        logger=logger)
+
+    async def run():
+        await asyncio.wait_for(my_async_athena.run_nonquery(
+            'MSCK REPAIR TABLE stuff'), timeout=0.2)
+        # end def
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(run())
+            # end with
+        # end with
+
+    mock_session.client.return_value.stop_query_execution.assert_called_once()
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=50)
+def test_run_queries_exception(logger: Logger):
+
+    logger.info('run_queries exception')
+
+    mock_session = mock_athena_session(['FAILED', 'SUCCEEDED'], [0, 60])
+
+    my_async_athena = AsyncAthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0.01,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        with pytest.raises(AthenaCallException):
+            asyncio.run(my_async_athena.run_queries(
+                ['SELECT dummy1', 'SELECT dummy2']))
+            # end with
+        # end with
+
+    # the other query is cancelled
+    mock_session.client.return_value.stop_query_execution.assert_called_once()
+    # end def
@@ -6,13 +6,16 @@
 # ---------------------------------------------------------------------------
 
 import copy
+import io
 import logging
 import shutil
 import tempfile
+import threading
 import time
+import uuid
 from logging import Logger, StreamHandler
 from pathlib import Path
-from typing import Dict, Generator
+from typing import Any, Dict, Generator, List
 from unittest.mock import Mock, patch
 
 import boto3
@@ -20,15 +23,35 @@ import localstack_client.session
 import pandas as pd
 import pytest
 from botocore.config import Config
+from botocore.exceptions import ClientError
 from moto.athena import mock_athena
 
-from src.pyawswrapper import (AthenaCallException, AthenaClient, s3client,
-                              s3path)
+from src.pyawswrapper import (AthenaCallException, AthenaClient,
+                              AthenaQueryStats, AthenaResultCache,
+                              BackoffPolling, CallbackInstrumentation,
+                              ParseOptions, PollingStrategy, SpilledResult,
+                              s3client, s3path)
 
 mock_s3_path = 's3://localstack-bucket/athena'
 MOTO_ACCOUNT_ID = '123456789012'
 
 
+def mock_session_with(athena_client: Mock, s3_session: Any) -> Mock:
+    # athena calls go to the mock, s3 calls go to localstack
+    def client(service_name: str, **kwargs: Any) -> Any:
+        if service_name == 'athena':
+            return athena_client
+        else:
+            return s3_session.client(service_name)
+            # end if
+        # end def
+
+    mock_session = Mock()
+    mock_session.client.side_effect = client
+    return mock_session
+    # end def
+
+
 @pytest.fixture(scope='session', autouse=True)
 def setup_and_teardown(tempdir: Path):
     # setup
@@ -289,8 +312,7 @@ def test_run_query(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
     mock_athena_client.start_query_execution.return_value = start_result
     mock_athena_client.get_query_execution.return_value = get_result
 
-    mock_session = Mock()
-    mock_session.client.return_value = mock_athena_client
+    mock_session = mock_session_with(mock_athena_client, localstack_session)
 
     my_athena = AthenaClient(
         database='dummy',
@@ -301,19 +323,15 @@ def test_run_query(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
     type_def = {'column_a': int, 'column_b': int, 'column_c': int}
 
     with patch.object(boto3, 'Session', return_value=mock_session):
-        with patch.object(boto3.session, 'Session', return_value=localstack_session):
-            result_df = my_athena.run_query('SELECT dummy', dtype=type_def)
-            # end with
+        result_df = my_athena.run_query('SELECT dummy', dtype=type_def)
         # end with
 
     sub_df = result_df - test_df
     assert sub_df.values.sum() == 0
 
     with patch.object(boto3, 'Session', return_value=mock_session):
-        with patch.object(boto3.session, 'Session', return_value=localstack_session):
-            result_df_2 = my_athena.run_query(
-                'SELECT dummy', dtype=type_def, chunksize=1)
-            # end with
+        result_df_2 = my_athena.run_query(
+            'SELECT dummy', dtype=type_def, chunksize=1)
         # end with
 
     chunk_count = 0
@@ -372,11 +390,12 @@ def test_run_queries(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
     mock_athena_client = Mock()
     mock_athena_client.start_query_execution.side_effect = [
         start_result, start_result_2]
-    mock_athena_client.get_query_execution.side_effect = [
-        get_result_3, get_result_2, get_result, get_result_2]
+    mock_athena_client.batch_get_query_execution.return_value = {
+        'QueryExecutions': [get_result_3['QueryExecution'], get_result_2['QueryExecution']],
+        'UnprocessedQueryExecutionIds': []}
+    mock_athena_client.get_query_execution.return_value = get_result
 
-    mock_session = Mock()
-    mock_session.client.return_value = mock_athena_client
+    mock_session = mock_session_with(mock_athena_client, localstack_session)
 
     my_athena = AthenaClient(
         database='dummy',
@@ -385,16 +404,20 @@ def test_run_queries(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
         logger=logger)
 
     with patch.object(boto3, 'Session', return_value=mock_session):
-        with patch.object(boto3.session, 'Session', return_value=localstack_session):
-            results = my_athena.run_queries(
-                ['SELECT dummy1', 'SELECT dummy2'], return_paths=True)
-            # end with
+        results = my_athena.run_queries(
+            ['SELECT dummy1', 'SELECT dummy2'], return_paths=True)
         # end with
 
     logger.info(results)
 
     assert results[0] == get_result['QueryExecution']['ResultConfiguration']['OutputLocation']
     assert results[1] == get_result_2['QueryExecution']['ResultConfiguration']['OutputLocation']
+
+    # finished query is not polled again
+    mock_athena_client.batch_get_query_execution.assert_called_once_with(
+        QueryExecutionIds=[exec_id, exec_id_2])
+    mock_athena_client.get_query_execution.assert_called_once_with(
+        QueryExecutionId=exec_id)
     # end def
 
 
@@ -440,8 +463,7 @@ def test_run_nonquery(tempdir: Path, logger: Logger):
     mock_athena_client.start_query_execution.return_value = start_result
     mock_athena_client.get_query_execution.return_value = get_result
 
-    mock_session = Mock()
-    mock_session.client.return_value = mock_athena_client
+    mock_session = mock_session_with(mock_athena_client, localstack_session)
 
     my_athena = AthenaClient(
         database='dummy',
@@ -450,9 +472,7 @@ def test_run_nonquery(tempdir: Path, logger: Logger):
         logger=logger)
 
     with patch.object(boto3, 'Session', return_value=mock_session):
-        with patch.object(boto3.session, 'Session', return_value=localstack_session):
-            result = my_athena.run_nonquery('MSCK REPAIR TABLE stuff')
-            # end with
+        result = my_athena.run_nonquery('MSCK REPAIR TABLE stuff')
         # end with
 
     assert result == ''
@@ -519,11 +539,12 @@ def test_run_nonqueries(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
     mock_athena_client = Mock()
     mock_athena_client.start_query_execution.side_effect = [
         start_result, start_result_2]
-    mock_athena_client.get_query_execution.side_effect = [
-        get_result, get_result_3, get_result, get_result_2]
+    mock_athena_client.batch_get_query_execution.return_value = {
+        'QueryExecutions': [get_result['QueryExecution'], get_result_3['QueryExecution']],
+        'UnprocessedQueryExecutionIds': []}
+    mock_athena_client.get_query_execution.return_value = get_result_2
 
-    mock_session = Mock()
-    mock_session.client.return_value = mock_athena_client
+    mock_session = mock_session_with(mock_athena_client, localstack_session)
 
     my_athena = AthenaClient(
         database='dummy',
@@ -532,15 +553,19 @@ def test_run_nonqueries(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
         logger=logger)
 
     with patch.object(boto3, 'Session', return_value=mock_session):
-        with patch.object(boto3.session, 'Session', return_value=localstack_session):
-            results = my_athena.run_nonqueries(
-                ['MSCK REPAIR TABLE stuff1', 'MSCK REPAIR TABLE stuff2'])
-            # end with
+        results = my_athena.run_nonqueries(
+            ['MSCK REPAIR TABLE stuff1', 'MSCK REPAIR TABLE stuff2'])
         # end with
 
     logger.info(results)
 
     assert results == ['', '']
+
+    # finished query is not polled again
+    mock_athena_client.batch_get_query_execution.assert_called_once_with(
+        QueryExecutionIds=[exec_id, exec_id_2])
+    mock_athena_client.get_query_execution.assert_called_once_with(
+        QueryExecutionId=exec_id_2)
     # end def
 
 
@@ -589,8 +614,7 @@ def test_run_nonquery_exception(tempdir: Path, logger: Logger):
     mock_athena_client.start_query_execution.return_value = start_result
     mock_athena_client.get_query_execution.return_value = get_result
 
-    mock_session = Mock()
-    mock_session.client.return_value = mock_athena_client
+    mock_session = mock_session_with(mock_athena_client, localstack_session)
 
     my_athena = AthenaClient(
         database='dummy',
@@ -600,18 +624,14 @@ def test_run_nonquery_exception(tempdir: Path, logger: Logger):
 
     with pytest.raises(AthenaCallException):
         with patch.object(boto3, 'Session', return_value=mock_session):
-            with patch.object(boto3.session, 'Session', return_value=localstack_session):
-                my_athena.run_nonquery('MSCK REPAIR TABLE stuff')
-                # end with
+            my_athena.run_nonquery('MSCK REPAIR TABLE stuff')
             # end with
         # end with
 
     my_athena.non_query_massage_as_exception = False
     with patch.object(boto3, 'Session', return_value=mock_session):
-        with patch.object(boto3.session, 'Session', return_value=localstack_session):
-            result = my_athena.run_nonquery(
-                'MSCK REPAIR TABLE stuff')
-            # end with
+        result = my_athena.run_nonquery(
+            'MSCK REPAIR TABLE stuff')
         # end with
 
     assert result == 'Some messages'
@@ -650,8 +670,7 @@ def test_run_query_exception(logger: Logger):
     mock_athena_client.start_query_execution.return_value = start_result
     mock_athena_client.get_query_execution.return_value = get_result
 
-    mock_session = Mock()
-    mock_session.client.return_value = mock_athena_client
+    mock_session = mock_session_with(mock_athena_client, localstack_session)
 
     my_athena = AthenaClient(
         database='dummy',
@@ -661,17 +680,13 @@ def test_run_query_exception(logger: Logger):
 
     with pytest.raises(AthenaCallException):
         with patch.object(boto3, 'Session', return_value=mock_session):
-            with patch.object(boto3.session, 'Session', return_value=localstack_session):
-                my_athena.run_query('SELECT dummy')
-                # end with
+            my_athena.run_query('SELECT dummy')
             # end with
         # end with
 
     my_athena.error_as_exception = False
     with patch.object(boto3, 'Session', return_value=mock_session):
-        with patch.object(boto3.session, 'Session', return_value=localstack_session):
-            result = my_athena.run_query('SELECT dummy')
-            # end with
+        result = my_athena.run_query('SELECT dummy')
         # end with
 
     assert result is None
@@ -710,8 +725,7 @@ def test_run_query_exception_02(logger: Logger):
     mock_athena_client.start_query_execution.return_value = start_result
     mock_athena_client.get_query_execution.return_value = get_result
 
-    mock_session = Mock()
-    mock_session.client.return_value = mock_athena_client
+    mock_session = mock_session_with(mock_athena_client, localstack_session)
 
     my_athena = AthenaClient(
         database='dummy',
@@ -721,39 +735,484 @@ def test_run_query_exception_02(logger: Logger):
 
     with pytest.raises(AthenaCallException):
         with patch.object(boto3, 'Session', return_value=mock_session):
-            with patch.object(boto3.session, 'Session', return_value=localstack_session):
-                my_athena.run_query('SELECT dummy')
-                # end with
+            my_athena.run_query('SELECT dummy')
             # end with
         # end with
 
     my_athena.error_as_exception = False
     with patch.object(boto3, 'Session', return_value=mock_session):
-        with patch.object(boto3.session, 'Session', return_value=localstack_session):
-            result = my_athena.run_query('SELECT dummy')
-            # end with
+        result = my_athena.run_query('SELECT dummy')
         # end with
 
     assert result is None
     # end def
 
 
-@pytest.mark.run(order=500)
-@pytest.mark.parametrize('states,expected',
-                         [({0: 'RUNNING', 1: 'RUNNING', 2: 'RUNNING', 3: 'RUNNING'}, True),
-                          ({0: 'QUEUED', 1: 'RUNNING',
-                           2: 'RUNNING', 3: 'RUNNING'}, True),
-                          ({0: 'QUEUED', 1: 'QUEUED', 2: 'QUEUED', 3: 'QUEUED'}, True),
-                          ({0: 'STOPPED', 1: 'STOPPED',
-                           2: 'STOPPED', 3: 'RUNNING'}, True),
-                          ({0: 'QUEUED', 1: 'RUNNING', 2: None, 3: None}, True),
-                          ({0: 'STOPPED', 1: 'ERROR',
-                           2: 'STOPPED', 3: 'STOPPED'}, False),
-                          ({0: 'FAILED', 1: 'ERROR', 2: 'FAILED', 3: 'FAILED'}, False),
-                          ({0: None, 1: None, 2: None, 3: None}, True)])
-def test__keep_polling(states: Dict[int, str], expected: bool, logger: Logger):
+@mock_athena
+@pytest.mark.run(order=270)
+def test_client_reuse(logger: Logger):
 
-    logger.info('_keep_polling')
+    logger.info('client reuse')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='MSCK REPAIR TABLE stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId']
+    )
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+
+    mock_s3_client = Mock()
+    mock_s3_client.get_object.side_effect = lambda **kwargs: {
+        'Body': Mock(read=Mock(return_value=b''))}
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session) as session_class:
+        my_athena.run_nonquery('MSCK REPAIR TABLE stuff')
+        my_athena.run_nonquery('MSCK REPAIR TABLE stuff')
+        assert session_class.call_count == 1
+        assert mock_session.client.call_count == 2
+
+        # same value does not rebuild anything
+        my_athena.region = my_athena.region
+        my_athena.run_nonquery('MSCK REPAIR TABLE stuff')
+        assert session_class.call_count == 1
+        assert mock_session.client.call_count == 2
+
+        my_athena.read_timeout = 30
+        my_athena.run_nonquery('MSCK REPAIR TABLE stuff')
+        assert session_class.call_count == 1
+        assert mock_session.client.call_count == 4
+
+        my_athena.region = 'us-east-1'
+        my_athena.run_nonquery('MSCK REPAIR TABLE stuff')
+        assert session_class.call_count == 2
+        assert mock_session.client.call_count == 6
+        # end with
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=280)
+def test_run_queries_batch_polling(logger: Logger):
+
+    logger.info('run_queries batch polling')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_results = []
+    executions = {}
+    for _ in range(60):
+        start_result = my_client.start_query_execution(
+            QueryString='SELECT stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        executions[start_result['QueryExecutionId']] = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])['QueryExecution']
+        # end for
+
+    # the last 5 queries are still running on the first polling
+    running_ids = [x['QueryExecutionId'] for x in start_results[55:]]
+
+    def batch_get_query_execution(QueryExecutionIds: List[str]) -> Dict:
+        query_executions = []
+        for this_id in QueryExecutionIds:
+            this_execution = copy.deepcopy(executions[this_id])
+            if this_id in running_ids:
+                this_execution['Status']['State'] = 'RUNNING'
+                running_ids.remove(this_id)
+                # end if
+            query_executions.append(this_execution)
+            # end for
+        return {'QueryExecutions': query_executions,
+                'UnprocessedQueryExecutionIds': []}
+        # end def
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.side_effect = batch_get_query_execution
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        results = my_athena.run_queries(
+            [f'SELECT dummy{x}' for x in range(60)], return_paths=True)
+        # end with
+
+    assert len(results) == 60
+    polled_counts = [len(x.kwargs['QueryExecutionIds'])
+                     for x in mock_athena_client.batch_get_query_execution.call_args_list]
+    assert polled_counts == [50, 10, 5]
+    mock_athena_client.get_query_execution.assert_not_called()
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=290)
+def test_polling_strategy(logger: Logger):
+
+    logger.info('polling strategy')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId']
+    )
+    get_result_2 = copy.deepcopy(get_result)
+    get_result_2['QueryExecution']['Status']['State'] = 'RUNNING'
+    get_result_2['QueryExecution']['Statistics']['EngineExecutionTimeInMillis'] = 1000
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.side_effect = [
+        get_result_2, get_result_2, get_result]
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+
+    mock_strategy = Mock(spec=PollingStrategy)
+    mock_strategy.wait_time.return_value = 0
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_strategy=mock_strategy,
+        logger=logger)
+
+    assert my_athena.polling_strategy is mock_strategy
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        with patch.object(time, 'sleep') as mock_sleep:
+            my_athena.run_query('SELECT dummy', return_path=True)
+            # end with
+        # end with
+
+    # no sleep after the last query finished
+    assert mock_sleep.call_count == 2
+    assert [x.args[0] for x in mock_strategy.wait_time.call_args_list] == [0, 1]
+    assert mock_strategy.wait_time.call_args_list[0].args[1] == [
+        get_result_2['QueryExecution']]
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=300)
+def test_download_while_polling(logger: Logger):
+
+    logger.info('download while polling')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_results = []
+    get_results = []
+    for _ in range(2):
+        start_result = my_client.start_query_execution(
+            QueryString='MSCK REPAIR TABLE stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        get_result = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])
+        get_result['QueryExecution']['ResultConfiguration']['OutputLocation'] = s3path.join(
+            mock_s3_path, f'{start_result["QueryExecutionId"]}.txt')
+        get_results.append(get_result)
+        # end for
+
+    get_result_running = copy.deepcopy(get_results[1])
+    get_result_running['QueryExecution']['Status']['State'] = 'RUNNING'
+
+    polled_again = threading.Event()
+
+    def get_query_execution(QueryExecutionId: str) -> Dict:
+        polled_again.set()
+        return get_results[1]
+        # end def
+
+    def get_object(Bucket: str, Key: str) -> Dict:
+        if start_results[0]['QueryExecutionId'] in Key:
+            # the first result is not downloaded until the second query is polled again
+            assert polled_again.wait(timeout=10)
+            # end if
+        return {'Body': Mock(read=Mock(return_value=Key.encode()))}
+        # end def
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.return_value = {
+        'QueryExecutions': [get_results[0]['QueryExecution'], get_result_running['QueryExecution']],
+        'UnprocessedQueryExecutionIds': []}
+    mock_athena_client.get_query_execution.side_effect = get_query_execution
+
+    mock_s3_client = Mock()
+    mock_s3_client.get_object.side_effect = get_object
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        download_workers=2,
+        non_query_massage_as_exception=False,
+        logger=logger)
+
+    assert my_athena.download_workers == 2
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        results = my_athena.run_nonqueries(
+            ['MSCK REPAIR TABLE stuff1', 'MSCK REPAIR TABLE stuff2'])
+        # end with
+
+    # in input order
+    assert start_results[0]['QueryExecutionId'] in results[0]
+    assert start_results[1]['QueryExecutionId'] in results[1]
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=310)
+def test_max_in_flight(logger: Logger):
+
+    logger.info('max_in_flight')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    executions = {}
+    started_queries = []
+    poll_counts = {}
+    in_flight = []
+    max_in_flight = []
+
+    def start_query_execution(QueryString: str, **kwargs: Any) -> Dict:
+        if len(started_queries) == 1 and QueryString not in started_queries:
+            # throttled once
+            started_queries.append(QueryString)
+            raise ClientError({'Error': {'Code': 'TooManyRequestsException', 'Message': 'Rate exceeded'}},
+                              'StartQueryExecution')
+            # end if
+        start_result = my_client.start_query_execution(
+            QueryString=QueryString, **kwargs)
+        this_id = start_result['QueryExecutionId']
+        executions[this_id] = my_client.get_query_execution(
+            QueryExecutionId=this_id)['QueryExecution']
+        executions[this_id]['ResultConfiguration']['OutputLocation'] = QueryString
+        poll_counts[this_id] = 0
+        started_queries.append(QueryString)
+        in_flight.append(this_id)
+        max_in_flight.append(len(in_flight))
+        return start_result
+        # end def
+
+    def query_execution(this_id: str) -> Dict:
+        # RUNNING on the first polling, SUCCEEDED on the second polling
+        this_execution = copy.deepcopy(executions[this_id])
+        poll_counts[this_id] += 1
+        if poll_counts[this_id] == 1:
+            this_execution['Status']['State'] = 'RUNNING'
+        else:
+            in_flight.remove(this_id)
+            # end if
+        return this_execution
+        # end def
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_query_execution
+    mock_athena_client.get_query_execution.side_effect = lambda QueryExecutionId: {
+        'QueryExecution': query_execution(QueryExecutionId)}
+    mock_athena_client.batch_get_query_execution.side_effect = lambda QueryExecutionIds: {
+        'QueryExecutions': [query_execution(x) for x in QueryExecutionIds],
+        'UnprocessedQueryExecutionIds': []}
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        max_in_flight=2,
+        logger=logger)
+
+    assert my_athena.max_in_flight == 2
+
+    queries = [f'SELECT {x}' for x in range(5)]
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        with patch.object(AthenaClient, '_start_backoff',
+                          BackoffPolling(initial_time=0.01, jitter=0, use_engine_hint=False)):
+            results = my_athena.run_queries(
+                queries, return_paths=True, priorities=[2, 2, 1, 0, 2])
+            # end with
+        # end with
+
+    # results are in input order
+    assert results == queries
+    assert max(max_in_flight) == 2
+    # started by priority, the throttled query is retried
+    assert started_queries == [
+        'SELECT 3', 'SELECT 2', 'SELECT 2', 'SELECT 0', 'SELECT 1', 'SELECT 4']
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=320)
+def test_submit_query(logger: Logger):
+
+    logger.info('submit_query')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    executions = {}
+    start_results = []
+    for this_state in ['SUCCEEDED', 'FAILED', 'RUNNING']:
+        start_result = my_client.start_query_execution(
+            QueryString='SELECT stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        this_execution = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])['QueryExecution']
+        this_execution['Status']['State'] = this_state
+        executions[start_result['QueryExecutionId']] = this_execution
+        # end for
+
+    poller_threads = set()
+    release = threading.Event()
+
+    def batch_get_query_execution(QueryExecutionIds: List[str]) -> Dict:
+        poller_threads.add(threading.current_thread().ident)
+        query_executions = []
+        for this_id in QueryExecutionIds:
+            this_execution = copy.deepcopy(executions[this_id])
+            if not release.is_set():
+                this_execution['Status']['State'] = 'QUEUED'
+                # end if
+            query_executions.append(this_execution)
+            # end for
+        return {'QueryExecutions': query_executions,
+                'UnprocessedQueryExecutionIds': []}
+        # end def
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.side_effect = batch_get_query_execution
+    mock_athena_client.get_query_execution.side_effect = lambda QueryExecutionId: {
+        'QueryExecution': batch_get_query_execution([QueryExecutionId])['QueryExecutions'][0]}
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0.01,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        handle_1 = my_athena.submit_query('SELECT dummy1', return_path=True)
+        handle_2 = my_athena.submit_query('SELECT dummy2', return_path=True)
+        handle_3 = my_athena.submit_nonquery('MSCK REPAIR TABLE stuff')
+
+        with pytest.raises(TimeoutError):
+            handle_1.result(timeout=0.1)
+            # end with
+        assert handle_1.state == 'QUEUED'
+        assert not handle_1.done()
+
+        assert handle_3.cancel()
+        release.set()
+
+        assert handle_1.result(timeout=10) == executions[handle_1.query_id]['ResultConfiguration']['OutputLocation']
+        assert handle_1.state == 'SUCCEEDED'
+        assert isinstance(handle_2.exception(timeout=10), AthenaCallException)
+        assert handle_2.state == 'FAILED'
+        assert handle_3.cancelled()
+        assert handle_3.state == 'CANCELLED'
+        assert not handle_3.cancel()
+        # end with
+
+    mock_athena_client.stop_query_execution.assert_called_once_with(
+        QueryExecutionId=handle_3.query_id)
+    # one polling loop for all the queries
+    assert len(poller_threads) == 1
+    assert threading.current_thread().ident not in poller_threads
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=330)
+def test_run_query_iter(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('run_query_iter')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    query = 'SELECT stuff'
+    location = mock_s3_path
+    database = 'dummy'
+
+    start_result = my_client.start_query_execution(
+        QueryString=query,
+        QueryExecutionContext={'Database': database},
+        ResultConfiguration={'OutputLocation': location},
+    )
+    exec_id = start_result['QueryExecutionId']
+
+    dump_to = tempdir.joinpath('Athena', f'{exec_id}.csv')
+    dump_to.parent.mkdir(parents=True, exist_ok=True)
+    test_df.to_csv(dump_to, header=True, index=False)
+
+    my_s3client = s3client(use_local=True)
+    my_s3client.UpTos3(dump_to, mock_s3_path)
+
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=exec_id
+    )
+
+    # patch wrong OutputLocation
+    get_result['QueryExecution']['ResultConfiguration']['OutputLocation'] = s3path.join(
+        mock_s3_path, f'{exec_id}.csv')
+
+    localstack_session = localstack_client.session.Session()
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+
+    mock_session = mock_session_with(mock_athena_client, localstack_session)
 
     my_athena = AthenaClient(
         database='dummy',
@@ -761,5 +1220,1277 @@ def test__keep_polling(states: Dict[int, str], expected: bool, logger: Logger):
         workgroup='dummy',
         logger=logger)
 
-    assert my_athena._keep_polling(states) == expected
+    type_def = {'column_a': 'int32', 'column_b': 'int32', 'column_c': 'int32'}
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        chunks = list(my_athena.run_query_iter(
+            'SELECT dummy', dtype=type_def, chunksize=2))
+        # end with
+
+    assert [len(x) for x in chunks] == [2, 1]
+    for this_chunk in chunks:
+        assert (this_chunk.dtypes == 'int32').all()
+        # end for
+
+    result_df = pd.concat(chunks, ignore_index=True)
+    sub_df = result_df - test_df
+    assert sub_df.values.sum() == 0
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=340)
+def test_run_query_parquet(test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('run_query parquet')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId']
+    )
+
+    unload_id = uuid.uuid4()
+    unload_to = s3path.join(mock_s3_path, 'unload', str(unload_id)) + '/'
+
+    # UNLOAD writes some files
+    localstack_session = localstack_client.session.Session()
+    my_s3 = localstack_session.client('s3')
+    for index in range(len(test_df)):
+        buffer = io.BytesIO()
+        test_df.iloc[index:index + 1].to_parquet(buffer, index=False)
+        my_s3.put_object(Bucket=s3path.bucket_name(unload_to),
+                         Key='/'.join(s3path.to_list(unload_to)[1:]) + f'part_{index}',
+                         Body=buffer.getvalue())
+        # end for
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+
+    mock_session = mock_session_with(mock_athena_client, localstack_session)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        with patch.object(uuid, 'uuid4', return_value=unload_id):
+            result_df = my_athena.run_query(
+                'SELECT dummy;', result_format='parquet', dtype={'column_a': 'float64'})
+            result_path = my_athena.run_query(
+                'SELECT dummy', result_format='parquet', return_path=True)
+            # end with
+
+        with pytest.raises(ValueError):
+            my_athena.run_query('SELECT dummy', result_format='json')
+            # end with
+        # end with
+
+    assert mock_athena_client.start_query_execution.call_args.kwargs['QueryString'] == \
+        f"UNLOAD (SELECT dummy) TO '{unload_to}' WITH (format = 'PARQUET')"
+    assert result_df['column_a'].dtype == 'float64'
+    sub_df = result_df - test_df
+    assert sub_df.values.sum() == 0
+    assert result_path == unload_to
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=350)
+def test_use_metadata_dtypes(tempdir: Path, logger: Logger):
+
+    logger.info('use_metadata_dtypes')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    exec_id = start_result['QueryExecutionId']
+
+    dump_to = tempdir.joinpath('Athena', f'{exec_id}.csv')
+    dump_to.parent.mkdir(parents=True, exist_ok=True)
+    with open(dump_to, 'w') as file:
+        file.write('"id","name","flag","created","score"\n')
+        file.write('"9007199254740993","a","true","2024-01-02","1.5"\n')
+        file.write('"","b","false","2024-01-03","2.5"\n')
+        # end with
+
+    my_s3client = s3client(use_local=True)
+    my_s3client.UpTos3(dump_to, mock_s3_path)
+
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=exec_id
+    )
+
+    # patch wrong OutputLocation
+    get_result['QueryExecution']['ResultConfiguration']['OutputLocation'] = s3path.join(
+        mock_s3_path, f'{exec_id}.csv')
+
+    localstack_session = localstack_client.session.Session()
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+    mock_athena_client.get_query_results.return_value = {
+        'ResultSet': {'ResultSetMetadata': {'ColumnInfo': [
+            {'Name': 'id', 'Type': 'bigint'},
+            {'Name': 'name', 'Type': 'varchar'},
+            {'Name': 'flag', 'Type': 'boolean'},
+            {'Name': 'created', 'Type': 'date'},
+            {'Name': 'score', 'Type': 'double'}]}}}
+
+    mock_session = mock_session_with(mock_athena_client, localstack_session)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        use_metadata_dtypes=True,
+        logger=logger)
+
+    assert my_athena.use_metadata_dtypes is True
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        result_df = my_athena.run_query(
+            'SELECT dummy', dtype={'score': 'float32'})
+        # end with
+
+    mock_athena_client.get_query_results.assert_called_once_with(
+        QueryExecutionId=exec_id, MaxResults=1)
+    assert str(result_df['id'].dtype) == 'Int64'
+    # not parsed as float
+    assert result_df['id'][0] == 9007199254740993
+    assert pd.isna(result_df['id'][1])
+    assert str(result_df['name'].dtype) == 'string'
+    assert str(result_df['flag'].dtype) == 'boolean'
+    assert pd.api.types.is_datetime64_any_dtype(result_df['created'])
+    # the caller takes priority
+    assert str(result_df['score'].dtype) == 'float32'
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=360)
+def test_result_cache(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('result_cache')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId']
+    )
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+
+    mock_s3_client = Mock()
+    mock_s3_client.get_object.side_effect = lambda **kwargs: {
+        'Body': io.BytesIO(test_df.to_csv(index=False).encode())}
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    my_cache = AthenaResultCache(tempdir.joinpath('cache'))
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        result_cache=my_cache,
+        logger=logger)
+
+    assert my_athena.result_cache is my_cache
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        result_df = my_athena.run_query('SELECT dummy')
+        result_df_2 = my_athena.run_query('SELECT  dummy;')
+        results = my_athena.run_queries(['SELECT dummy', 'SELECT dummy2'])
+        # end with
+
+    pd.testing.assert_frame_equal(result_df, test_df)
+    pd.testing.assert_frame_equal(result_df_2, test_df)
+    pd.testing.assert_frame_equal(results[0], test_df)
+    pd.testing.assert_frame_equal(results[1], test_df)
+
+    # the cache hits are not queried
+    assert [x.kwargs['QueryString'] for x in mock_athena_client.start_query_execution.call_args_list] == [
+        'SELECT dummy', 'SELECT dummy2']
+    assert my_cache.metrics == {'hits': 2, 'misses': 2, 'puts': 2, 'evictions': 0}
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=370)
+def test_result_reuse(test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('result_reuse')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId']
+    )
+    get_result['QueryExecution']['Statistics']['DataScannedInBytes'] = 0
+    get_result['QueryExecution']['Statistics']['ResultReuseInformation'] = {
+        'ReusedPreviousResult': True}
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+    mock_athena_client.batch_get_query_execution.return_value = {
+        'QueryExecutions': [get_result['QueryExecution']],
+        'UnprocessedQueryExecutionIds': []}
+
+    mock_s3_client = Mock()
+    mock_s3_client.get_object.side_effect = lambda **kwargs: {
+        'Body': io.BytesIO(test_df.to_csv(index=False).encode())}
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        result_reuse_max_age=60,
+        logger=logger)
+
+    assert my_athena.result_reuse_max_age == 60
+    assert my_athena.last_query_stats == []
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        result_df = my_athena.run_query('SELECT dummy')
+        stats = my_athena.last_query_stats
+
+        # the argument of the call takes priority
+        my_athena.run_query('SELECT dummy', result_reuse_max_age=0)
+
+        my_athena.result_reuse_max_age = None
+        my_athena.run_query('SELECT dummy')
+        # end with
+
+    pd.testing.assert_frame_equal(result_df, test_df)
+
+    call_args_list = mock_athena_client.start_query_execution.call_args_list
+    assert call_args_list[0].kwargs['ResultReuseConfiguration'] == {
+        'ResultReuseByAgeConfiguration': {'Enabled': True, 'MaxAgeInMinutes': 60}}
+    assert call_args_list[1].kwargs['ResultReuseConfiguration'] == {
+        'ResultReuseByAgeConfiguration': {'Enabled': False}}
+    assert 'ResultReuseConfiguration' not in call_args_list[2].kwargs
+
+    assert len(stats) == 1
+    assert isinstance(stats[0], AthenaQueryStats)
+    assert stats[0].query_id == start_result['QueryExecutionId']
+    assert stats[0].state == 'SUCCEEDED'
+    assert stats[0].data_scanned_in_bytes == 0
+    assert stats[0].reused_previous_result
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=380)
+def test_run_queries_deduplication(test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('run_queries deduplication')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_results = []
+    executions = {}
+    for _ in range(2):
+        start_result = my_client.start_query_execution(
+            QueryString='SELECT stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        executions[start_result['QueryExecutionId']] = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])
+        # end for
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.side_effect = lambda QueryExecutionIds: {
+        'QueryExecutions': [executions[x]['QueryExecution'] for x in QueryExecutionIds],
+        'UnprocessedQueryExecutionIds': []}
+    mock_athena_client.get_query_execution.side_effect = lambda QueryExecutionId: executions[
+        QueryExecutionId]
+
+    mock_s3_client = Mock()
+    mock_s3_client.get_object.side_effect = lambda **kwargs: {
+        'Body': io.BytesIO(test_df.to_csv(index=False).encode())}
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        results = my_athena.run_queries(
+            ['SELECT a', 'SELECT b', 'SELECT a', 'SELECT a'],
+            dtypes=[None, None, {'column_a': str}, None],
+            priorities=[1, 1, 1, 0])
+        # end with
+
+    # each distinct query runs once, the one with the highest priority first
+    assert [x.kwargs['QueryString'] for x in mock_athena_client.start_query_execution.call_args_list] == [
+        'SELECT a', 'SELECT b']
+    # one download for 'SELECT a'
+    assert mock_s3_client.get_object.call_count == 2
+
+    pd.testing.assert_frame_equal(results[0], test_df)
+    pd.testing.assert_frame_equal(results[1], test_df)
+    pd.testing.assert_frame_equal(
+        results[2], test_df.astype({'column_a': str}))
+    pd.testing.assert_frame_equal(results[3], test_df)
+    # each index has its own DataFrame
+    assert results[0] is not results[3]
+
+    stats = my_athena.last_query_stats
+    assert stats[0].query_id == stats[2].query_id == stats[3].query_id
+    assert stats[0].query_id != stats[1].query_id
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=390)
+def test_stop_queries(logger: Logger):
+
+    logger.info('stop queries')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_results = []
+    executions = {}
+    for _ in range(5):
+        start_result = my_client.start_query_execution(
+            QueryString='SELECT stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        this_execution = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])['QueryExecution']
+        this_execution['Status']['State'] = 'RUNNING'
+        executions[start_result['QueryExecutionId']] = this_execution
+        # end for
+    failed_id = start_results[0]['QueryExecutionId']
+    executions[failed_id]['Status']['State'] = 'FAILED'
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.side_effect = lambda QueryExecutionIds: {
+        'QueryExecutions': [executions[x] for x in QueryExecutionIds],
+        'UnprocessedQueryExecutionIds': []}
+    mock_athena_client.get_query_execution.side_effect = lambda QueryExecutionId: {
+        'QueryExecution': executions[QueryExecutionId]}
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0.2,
+        query_timeout=0.5,
+        logger=logger)
+
+    assert my_athena.query_timeout == 0.5
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        # the other query is stopped when one fails
+        with pytest.raises(AthenaCallException):
+            my_athena.run_queries(['SELECT a', 'SELECT b'], return_paths=True)
+            # end with
+        assert [x.kwargs['QueryExecutionId'] for x in mock_athena_client.stop_query_execution.call_args_list] == [
+            start_results[1]['QueryExecutionId']]
+        mock_athena_client.stop_query_execution.reset_mock()
+
+        # timeout
+        with pytest.raises(TimeoutError):
+            my_athena.run_queries(['SELECT c', 'SELECT d'], return_paths=True)
+            # end with
+        assert [x.kwargs['QueryExecutionId'] for x in mock_athena_client.stop_query_execution.call_args_list] == [
+            start_results[2]['QueryExecutionId'], start_results[3]['QueryExecutionId']]
+        mock_athena_client.stop_query_execution.reset_mock()
+
+        # the submitted queries are stopped on leaving the context
+        with my_athena as this_athena:
+            handle = this_athena.submit_query('SELECT e')
+            # end with
+        # end with
+
+    assert handle.cancelled()
+    mock_athena_client.stop_query_execution.assert_called_once_with(
+        QueryExecutionId=start_results[4]['QueryExecutionId'])
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=391)
+def test_cancel_stop_error(logger: Logger):
+
+    logger.info('cancel: stop_query_execution fails')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_results = []
+    executions = {}
+    for _ in range(1):
+        start_result = my_client.start_query_execution(
+            QueryString='SELECT stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        this_execution = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])['QueryExecution']
+        this_execution['Status']['State'] = 'RUNNING'
+        executions[start_result['QueryExecutionId']] = this_execution
+        # end for
+    throttled = ClientError(
+        {'Error': {'Code': 'ThrottlingException', 'Message': 'dummy'}}, 'StopQueryExecution')
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.side_effect = lambda QueryExecutionIds: {
+        'QueryExecutions': [executions[x] for x in QueryExecutionIds],
+        'UnprocessedQueryExecutionIds': []}
+    mock_athena_client.get_query_execution.side_effect = lambda QueryExecutionId: {
+        'QueryExecution': executions[QueryExecutionId]}
+    mock_athena_client.stop_query_execution.side_effect = throttled
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0.2,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        handle = my_athena.submit_query('SELECT a')
+        with pytest.raises(ClientError):
+            handle.cancel()
+            # end with
+        # end with
+
+    # the handle is not polled any more, but resolved
+    assert handle.exception(timeout=1) is throttled
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=392)
+def test_close_stop_error(logger: Logger):
+
+    logger.info('close: stop_query_execution fails')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_results = []
+    executions = {}
+    for _ in range(2):
+        start_result = my_client.start_query_execution(
+            QueryString='SELECT stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        this_execution = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])['QueryExecution']
+        this_execution['Status']['State'] = 'RUNNING'
+        executions[start_result['QueryExecutionId']] = this_execution
+        # end for
+    throttled = ClientError(
+        {'Error': {'Code': 'ThrottlingException', 'Message': 'dummy'}}, 'StopQueryExecution')
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.side_effect = lambda QueryExecutionIds: {
+        'QueryExecutions': [executions[x] for x in QueryExecutionIds],
+        'UnprocessedQueryExecutionIds': []}
+    mock_athena_client.get_query_execution.side_effect = lambda QueryExecutionId: {
+        'QueryExecution': executions[QueryExecutionId]}
+    mock_athena_client.stop_query_execution.side_effect = [throttled, {}]
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0.2,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        handles = [my_athena.submit_query('SELECT a'),
+                   my_athena.submit_query('SELECT b')]
+        my_athena.close()
+        # end with
+
+    # the failed stop resolves its handle, and the other one is still stopped
+    assert handles[0].exception(timeout=1) is throttled
+    assert handles[1].cancelled()
+    assert mock_athena_client.stop_query_execution.call_count == 2
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=395)
+def test_query_timeout_last_polling(logger: Logger):
+
+    logger.info('query_timeout: last polling at the deadline')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    this_execution = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId'])['QueryExecution']
+    started_at = time.monotonic()
+
+    def batch_get_query_execution(QueryExecutionIds):
+        # succeeds after the first polling wait, before the deadline
+        this_execution['Status']['State'] = 'SUCCEEDED' if time.monotonic(
+        ) - started_at > 1.2 else 'RUNNING'
+        return {'QueryExecutions': [this_execution],
+                'UnprocessedQueryExecutionIds': []}
+        # end def
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.batch_get_query_execution.side_effect = batch_get_query_execution
+    mock_athena_client.get_query_execution.side_effect = lambda QueryExecutionId: {
+        'QueryExecution': batch_get_query_execution([QueryExecutionId])['QueryExecutions'][0]}
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=1.0,
+        query_timeout=1.5,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        result = my_athena.run_queries(['SELECT a'], return_paths=True)
+        # end with
+
+    assert result == [this_execution['ResultConfiguration']['OutputLocation']]
+    assert time.monotonic() - started_at < 2.0
+    mock_athena_client.stop_query_execution.assert_not_called()
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=396)
+def test_unprocessed_query_ids(logger: Logger):
+
+    logger.info('unprocessed query ids of BatchGetQueryExecution')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_results = []
+    executions = {}
+    for _ in range(4):
+        start_result = my_client.start_query_execution(
+            QueryString='SELECT stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        this_execution = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])['QueryExecution']
+        this_execution['Status']['State'] = 'RUNNING'
+        executions[start_result['QueryExecutionId']] = this_execution
+        # end for
+    # the second query of each pair is never processed
+    invalid_ids = [start_results[1]['QueryExecutionId'],
+                   start_results[3]['QueryExecutionId']]
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.side_effect = lambda QueryExecutionIds: {
+        'QueryExecutions': [executions[x] for x in QueryExecutionIds if x not in invalid_ids],
+        'UnprocessedQueryExecutionIds': [
+            {'QueryExecutionId': x, 'ErrorCode': 'InvalidRequestException', 'ErrorMessage': 'dummy'}
+            for x in QueryExecutionIds if x in invalid_ids]}
+    mock_athena_client.get_query_execution.side_effect = lambda QueryExecutionId: {
+        'QueryExecution': executions[QueryExecutionId]}
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0.2,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        with pytest.raises(AthenaCallException, match='InvalidRequestException'):
+            my_athena.run_queries(['SELECT a', 'SELECT b'], return_paths=True)
+            # end with
+
+        handles = [my_athena.submit_query('SELECT c'),
+                   my_athena.submit_query('SELECT d')]
+        assert isinstance(handles[1].exception(timeout=5), AthenaCallException)
+        # the other query is still polled
+        assert not handles[0].done()
+        handles[0].cancel()
+        # end with
+
+    stopped_ids = [x.kwargs['QueryExecutionId']
+                   for x in mock_athena_client.stop_query_execution.call_args_list]
+    assert start_results[0]['QueryExecutionId'] in stopped_ids
+    assert start_results[1]['QueryExecutionId'] in stopped_ids
+    assert start_results[3]['QueryExecutionId'] in stopped_ids
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=397)
+def test_submitted_polling_error(logger: Logger):
+
+    logger.info('submit_query: polling of the submitted queries fails')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_results = []
+    executions = {}
+    for _ in range(4):
+        start_result = my_client.start_query_execution(
+            QueryString='SELECT stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        this_execution = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])['QueryExecution']
+        this_execution['Status']['State'] = 'SUCCEEDED'
+        executions[start_result['QueryExecutionId']] = this_execution
+        # end for
+    throttled = ClientError(
+        {'Error': {'Code': 'ThrottlingException', 'Message': 'dummy'}}, 'BatchGetQueryExecution')
+    denied = ClientError(
+        {'Error': {'Code': 'AccessDeniedException', 'Message': 'dummy'}}, 'BatchGetQueryExecution')
+    polling_errors = [throttled, throttled]
+
+    def batch_get_query_execution(QueryExecutionIds: List[str]) -> Dict:
+        if len(polling_errors) > 0:
+            raise polling_errors.pop(0)
+            # end if
+        return {'QueryExecutions': [executions[x] for x in QueryExecutionIds],
+                'UnprocessedQueryExecutionIds': []}
+        # end def
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.side_effect = batch_get_query_execution
+    mock_athena_client.get_query_execution.side_effect = lambda QueryExecutionId: {
+        'QueryExecution': batch_get_query_execution([QueryExecutionId])['QueryExecutions'][0]}
+
+    mock_session = Mock()
+    mock_session.client.return_value = mock_athena_client
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0.1,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        with patch.object(AthenaClient, '_start_backoff',
+                          BackoffPolling(initial_time=0.01, jitter=0, use_engine_hint=False)):
+            # throttling is retried
+            handles = [my_athena.submit_query('SELECT a', return_path=True),
+                       my_athena.submit_query('SELECT b', return_path=True)]
+            assert [x.result(timeout=5) for x in handles] == [
+                executions[x['QueryExecutionId']]['ResultConfiguration']['OutputLocation']
+                for x in start_results[:2]]
+            mock_athena_client.stop_query_execution.assert_not_called()
+
+            # the others are failed and stopped
+            for start_result in start_results[2:]:
+                executions[start_result['QueryExecutionId']]['Status']['State'] = 'RUNNING'
+                # end for
+            handles = [my_athena.submit_query('SELECT c', return_path=True),
+                       my_athena.submit_query('SELECT d', return_path=True)]
+            polling_errors.append(denied)
+            assert all([x.exception(timeout=5) is denied for x in handles])
+            # end with
+        # end with
+
+    stopped_ids = [x.kwargs['QueryExecutionId']
+                   for x in mock_athena_client.stop_query_execution.call_args_list]
+    assert sorted(stopped_ids) == sorted(
+        [x['QueryExecutionId'] for x in start_results[2:]])
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=400)
+def test_return_stats(test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('return_stats')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId']
+    )
+    get_result['QueryExecution']['Statistics'] = {
+        'DataScannedInBytes': 1000,
+        'EngineExecutionTimeInMillis': 300,
+        'QueryQueueTimeInMillis': 20,
+        'QueryPlanningTimeInMillis': 40,
+        'ServiceProcessingTimeInMillis': 10,
+        'TotalExecutionTimeInMillis': 330}
+    result_body = test_df.to_csv(index=False).encode()
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+    mock_athena_client.batch_get_query_execution.side_effect = lambda QueryExecutionIds: {
+        'QueryExecutions': [get_result['QueryExecution'] for _ in QueryExecutionIds],
+        'UnprocessedQueryExecutionIds': []}
+
+    mock_s3_client = Mock()
+    mock_s3_client.get_object.side_effect = lambda **kwargs: {
+        'Body': io.BytesIO(result_body), 'ContentLength': len(result_body)}
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        result_df, stats = my_athena.run_query(
+            'SELECT dummy', return_stats=True)
+        results, stats_list = my_athena.run_queries(
+            ['SELECT dummy', 'SELECT dummy2'], return_paths=True, return_stats=True)
+        # end with
+
+    pd.testing.assert_frame_equal(result_df, test_df)
+    assert stats.to_dict() == {'query_id': start_result['QueryExecutionId'],
+                               'state': 'SUCCEEDED',
+                               'data_scanned_in_bytes': 1000,
+                               'engine_execution_time_in_millis': 300,
+                               'query_queue_time_in_millis': 20,
+                               'query_planning_time_in_millis': 40,
+                               'service_processing_time_in_millis': 10,
+                               'total_execution_time_in_millis': 330,
+                               'reused_previous_result': False,
+                               'result_size_in_bytes': len(result_body)}
+
+    assert len(results) == 2
+    assert len(stats_list) == 2
+    # not downloaded
+    assert stats_list[0].result_size_in_bytes is None
+
+    assert my_athena.query_stats_summary == {'queries': 3,
+                                             'reused_queries': 0,
+                                             'data_scanned_in_bytes': 3000,
+                                             'engine_execution_time_in_millis': 900,
+                                             'query_queue_time_in_millis': 60,
+                                             'query_planning_time_in_millis': 120,
+                                             'service_processing_time_in_millis': 30,
+                                             'total_execution_time_in_millis': 990,
+                                             'result_size_in_bytes': len(result_body)}
+    my_athena.reset_query_stats_summary()
+    assert my_athena.query_stats_summary['queries'] == 0
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=410)
+def test_instrumentation(test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('instrumentation')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId']
+    )
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+
+    mock_s3_client = Mock()
+    mock_s3_client.get_object.side_effect = lambda **kwargs: {
+        'Body': io.BytesIO(test_df.to_csv(index=False).encode())}
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    spans = []
+    counts = []
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        instrumentation=CallbackInstrumentation(
+            on_span=lambda *args: spans.append(args),
+            on_count=lambda *args: counts.append(args)),
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        result_df = my_athena.run_query('SELECT dummy')
+        # end with
+
+    pd.testing.assert_frame_equal(result_df, test_df)
+
+    span_names = [x[0] for x in spans]
+    assert span_names == ['athena.start_query_execution',
+                          'athena.get_query_executions',
+                          'athena.get_object',
+                          'athena.read_csv',
+                          'athena.obtain_data',
+                          'athena.execute']
+    assert spans[-1][2] == {'athena.query_count': 1,
+                            'athena.is_data_query': True}
+    assert counts[0][:2] == ('athena.queries', 1)
+    assert counts[0][2]['athena.state'] == 'SUCCEEDED'
+
+    # disabled
+    my_athena.instrumentation = None
+    assert my_athena.instrumentation is not None
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=420)
+def test_result_fetch_mode(test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('result_fetch_mode')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId']
+    )
+    get_result['QueryExecution']['ResultConfiguration']['OutputLocation'] = s3path.join(
+        mock_s3_path, start_result['QueryExecutionId'] + '.csv')
+
+    column_info = [{'Name': x, 'Type': 'integer'} for x in test_df.columns]
+    rows = [{'Data': [{'VarCharValue': x} for x in test_df.columns]}] + [
+        {'Data': [{'VarCharValue': str(y)} for y in x]} for x in test_df.itertuples(index=False)]
+
+    def get_query_results(QueryExecutionId: str, MaxResults: int, NextToken: str = None) -> Dict:
+        # 2 rows per page
+        offset = 0 if NextToken is None else int(NextToken)
+        response = {'ResultSet': {'Rows': rows[offset:offset + 2],
+                                  'ResultSetMetadata': {'ColumnInfo': column_info}}}
+        if offset + 2 < len(rows):
+            response['NextToken'] = str(offset + 2)
+            # end if
+        return response
+        # end def
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+    mock_athena_client.get_query_results.side_effect = get_query_results
+
+    result_body = test_df.to_csv(index=False).encode()
+    mock_s3_client = Mock()
+    mock_s3_client.head_object.return_value = {
+        'ContentLength': len(result_body)}
+    mock_s3_client.get_object.side_effect = lambda **kwargs: {
+        'Body': io.BytesIO(result_body)}
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        result_fetch_mode='api',
+        logger=logger)
+
+    with pytest.raises(ValueError):
+        my_athena.result_fetch_mode = 'dummy'
+        # end with
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        result_df = my_athena.run_query('SELECT dummy')
+        assert mock_athena_client.get_query_results.call_count == 2
+        mock_s3_client.get_object.assert_not_called()
+
+        # over the threshold
+        my_athena.result_fetch_mode = 'auto'
+        my_athena.api_fetch_threshold = len(result_body) - 1
+        result_df_2 = my_athena.run_query('SELECT dummy')
+        assert mock_athena_client.get_query_results.call_count == 2
+        mock_s3_client.get_object.assert_called_once()
+
+        # under the threshold
+        my_athena.api_fetch_threshold = len(result_body)
+        result_df_3 = my_athena.run_query(
+            'SELECT dummy', dtype={'column_a': 'float64'})
+        assert mock_athena_client.get_query_results.call_count == 4
+        mock_s3_client.get_object.assert_called_once()
+        # end with
+
+    pd.testing.assert_frame_equal(
+        result_df, test_df.astype('Int32'))
+    pd.testing.assert_frame_equal(result_df_2, test_df)
+    pd.testing.assert_frame_equal(
+        result_df_3, test_df.astype('Int32').astype({'column_a': 'float64'}))
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=430)
+def test_ranged_download(logger: Logger):
+
+    logger.info('ranged download')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId']
+    )
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+
+    expected_df = pd.DataFrame({'column_a': range(1000),
+                                'column_b': [f'value_{x}' for x in range(1000)]})
+    result_body = expected_df.to_csv(index=False).encode()
+
+    def get_object(Bucket: str, Key: str, Range: str = None, IfMatch: str = None) -> Dict:
+        assert IfMatch in (None, '"dummy-etag"')
+        if Range is None:
+            return {'Body': io.BytesIO(result_body),
+                    'ContentLength': len(result_body),
+                    'ETag': '"dummy-etag"'}
+            # end if
+        first, last = [int(x) for x in Range[len('bytes='):].split('-')]
+        return {'Body': io.BytesIO(result_body[first:last + 1])}
+        # end def
+
+    mock_s3_client = Mock()
+    mock_s3_client.get_object.side_effect = get_object
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        ranged_download_threshold=len(result_body) - 1,
+        download_part_size=1000,
+        download_concurrency=3,
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        result_df = my_athena.run_query('SELECT dummy')
+        # the first part is read from the first response
+        assert mock_s3_client.get_object.call_count == (
+            len(result_body) + 999) // 1000
+        assert mock_s3_client.get_object.call_args_list[-1].kwargs['Range'] == (
+            f'bytes={(len(result_body) - 1) // 1000 * 1000}-{len(result_body) - 1}')
+
+        # under the threshold
+        mock_s3_client.get_object.reset_mock()
+        my_athena.ranged_download_threshold = len(result_body)
+        result_df_2 = my_athena.run_query('SELECT dummy')
+        mock_s3_client.get_object.assert_called_once()
+
+        # run_query_iter parses the stream without downloading the whole file first
+        mock_s3_client.get_object.reset_mock()
+        my_athena.ranged_download_threshold = len(result_body) - 1
+        chunks = my_athena.run_query_iter('SELECT dummy', chunksize=100)
+        first_chunk = next(chunks)
+        mock_s3_client.get_object.assert_called_once()
+        assert 'Range' not in mock_s3_client.get_object.call_args.kwargs
+        result_df_3 = pd.concat([first_chunk] + list(chunks), ignore_index=True)
+        # end with
+
+    pd.testing.assert_frame_equal(result_df, expected_df)
+    pd.testing.assert_frame_equal(result_df_2, expected_df)
+    pd.testing.assert_frame_equal(result_df_3, expected_df)
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=440)
+def test_parse_options(logger: Logger):
+
+    logger.info('parse_options')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_result = my_client.start_query_execution(
+        QueryString='SELECT stuff',
+        QueryExecutionContext={'Database': 'dummy'},
+        ResultConfiguration={'OutputLocation': mock_s3_path},
+    )
+    get_result = my_client.get_query_execution(
+        QueryExecutionId=start_result['QueryExecutionId']
+    )
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.return_value = start_result
+    mock_athena_client.get_query_execution.return_value = get_result
+
+    expected_df = pd.DataFrame({'column_a': [1, 2, 3],
+                                'column_b': ['x', 'y', 'x']})
+    mock_s3_client = Mock()
+    mock_s3_client.get_object.side_effect = lambda **kwargs: {
+        'Body': io.BytesIO(expected_df.to_csv(index=False).encode())}
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        parse_options=ParseOptions(
+            engine='pyarrow', string_dtype='category', downcast=True),
+        logger=logger)
+
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        result_df = my_athena.run_query('SELECT dummy')
+        # end with
+
+    assert str(result_df['column_a'].dtype) == 'int8'
+    assert str(result_df['column_b'].dtype) == 'category'
+    pd.testing.assert_frame_equal(
+        result_df.astype(expected_df.dtypes.to_dict()), expected_df)
+    # end def
+
+
+@mock_athena
+@pytest.mark.run(order=450)
+def test_spill_to(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('spill_to')
+
+    # generate mock stuff
+    my_client = boto3.client('athena', region_name='ap-northeast-1')
+    start_results = []
+    executions = {}
+    for _ in range(2):
+        start_result = my_client.start_query_execution(
+            QueryString='SELECT stuff',
+            QueryExecutionContext={'Database': 'dummy'},
+            ResultConfiguration={'OutputLocation': mock_s3_path},
+        )
+        start_results.append(start_result)
+        executions[start_result['QueryExecutionId']] = my_client.get_query_execution(
+            QueryExecutionId=start_result['QueryExecutionId'])
+        # end for
+
+    mock_athena_client = Mock()
+    mock_athena_client.start_query_execution.side_effect = start_results
+    mock_athena_client.batch_get_query_execution.side_effect = lambda QueryExecutionIds: {
+        'QueryExecutions': [executions[x]['QueryExecution'] for x in QueryExecutionIds],
+        'UnprocessedQueryExecutionIds': []}
+
+    mock_s3_client = Mock()
+    mock_s3_client.get_object.side_effect = lambda **kwargs: {
+        'Body': io.BytesIO(test_df.to_csv(index=False).encode())}
+
+    mock_session = Mock()
+    mock_session.client.side_effect = lambda service_name, **kwargs: (
+        mock_athena_client if service_name == 'athena' else mock_s3_client)
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        logger=logger)
+
+    spill_to = tempdir.joinpath('spill')
+    with patch.object(boto3, 'Session', return_value=mock_session):
+        results = my_athena.run_queries(
+            ['SELECT a', 'SELECT a', 'SELECT b'],
+            dtypes=[None, {'column_a': str}, None],
+            spill_to=spill_to)
+        # end with
+
+    assert all([isinstance(x, SpilledResult) for x in results])
+    assert len(set([x.path for x in results])) == 3
+    assert all([x.path.parent == spill_to for x in results])
+
+    pd.testing.assert_frame_equal(results[0].load(), test_df)
+    pd.testing.assert_frame_equal(
+        results[1].load(), test_df.astype({'column_a': str}))
+    pd.testing.assert_frame_equal(results[2].load(), test_df)
+    # end def
+
+
+@pytest.mark.run(order=460)
+def test_spill_to_cache_hits(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('spill_to: cache hits')
+
+    my_cache = AthenaResultCache(tempdir.joinpath('spill_cache'))
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        polling_time=0,
+        result_cache=my_cache,
+        logger=logger)
+    for this_query in ['SELECT a', 'SELECT b', 'SELECT c']:
+        my_cache.put(my_cache.key(this_query, database='dummy', workgroup=my_athena.workgroup,
+                                  result_format='csv'), test_df)
+        # end for
+
+    spill_to = tempdir.joinpath('spill_cache_hits')
+    spilled_counts = []
+    cache_get = my_cache.get
+
+    def get(key: str) -> pd.DataFrame:
+        spilled_counts.append(
+            len(list(spill_to.iterdir())) if spill_to.exists() else 0)
+        return cache_get(key)
+        # end def
+
+    with patch.object(my_cache, 'get', side_effect=get):
+        results = my_athena.run_queries(
+            ['SELECT a', 'SELECT b', 'SELECT c'], spill_to=spill_to)
+        # end with
+
+    # each hit is written before the next one is read
+    assert spilled_counts == [0, 1, 2]
+    assert all([isinstance(x, SpilledResult) for x in results])
+    pd.testing.assert_frame_equal(results[2].load(), test_df)
+    # end def
+
+
+@pytest.mark.run(order=500)
+@pytest.mark.parametrize('states,expected',
+                         [({0: 'RUNNING', 1: 'RUNNING', 2: 'RUNNING', 3: 'RUNNING'}, True),
+                          ({0: 'QUEUED', 1: 'RUNNING',
+                           2: 'RUNNING', 3: 'RUNNING'}, True),
+                          ({0: 'QUEUED', 1: 'QUEUED', 2: 'QUEUED', 3: 'QUEUED'}, True),
+                          ({0: 'STOPPED', 1: 'STOPPED',
+                           2: 'STOPPED', 3: 'RUNNING'}, True),
+                          ({0: 'QUEUED', 1: 'RUNNING', 2: None, 3: None}, True),
+                          ({0: 'STOPPED', 1: 'ERROR',
+                           2: 'STOPPED', 3: 'STOPPED'}, False),
+                          ({0: 'FAILED', 1: 'ERROR', 2: 'FAILED', 3: 'FAILED'}, False),
+                          ({0: None, 1: None, 2: None, 3: None}, True)])
+def test__keep_polling(states: Dict[int, str], expected: bool, logger: Logger):
+
+    logger.info('_keep_polling')
+
+    my_athena = AthenaClient(
+        database='dummy',
+        workplace=mock_s3_path,
+        workgroup='dummy',
+        logger=logger)
+
+    assert my_athena._keep_polling(states) == expected
+    # end def
+
+
+@pytest.mark.run(order=510)
+def test__metadata_dtypes(logger: Logger):
+
+    logger.info('_metadata_dtypes')
+
+    my_athena = AthenaClient(logger=logger)
+
+    dtype, parse_dates = my_athena._metadata_dtypes([
+        {'Name': 'a', 'Type': 'tinyint'},
+        {'Name': 'b', 'Type': 'integer'},
+        {'Name': 'c', 'Type': 'real'},
+        {'Name': 'd', 'Type': 'timestamp'},
+        {'Name': 'e', 'Type': 'decimal'},
+        {'Name': 'f', 'Type': 'array'}])
+
+    assert dtype == {'a': 'Int8', 'b': 'Int32', 'c': 'float32'}
+    assert parse_dates == ['d']
+    # end def
+
+
+@pytest.mark.run(order=520)
+def test__metadata_column(logger: Logger):
+
+    logger.info('_metadata_column')
+
+    my_athena = AthenaClient(logger=logger)
+
+    assert my_athena._metadata_column(['1', None], 'integer').tolist() == [1, pd.NA]
+    assert str(my_athena._metadata_column(['1', None], 'bigint').dtype) == 'Int64'
+    assert my_athena._metadata_column(
+        ['true', 'false', None], 'boolean').tolist() == [True, False, pd.NA]
+    assert my_athena._metadata_column(['1.5'], 'double').tolist() == [1.5]
+    assert my_athena._metadata_column(['1.25'], 'decimal').tolist() == [1.25]
+    assert my_athena._metadata_column(['a', None], 'varchar').tolist() == ['a', pd.NA]
+    assert my_athena._metadata_column(
+        ['2024-01-02 03:04:05.000'], 'timestamp').tolist() == [pd.Timestamp('2024-01-02 03:04:05')]
+    assert my_athena._metadata_column(['[1, 2]', None], 'array').tolist() == ['[1, 2]', None]
     # end def
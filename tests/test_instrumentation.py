@@ -0,0 +1,107 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+
+import logging
+from logging import Logger, StreamHandler
+from typing import Generator
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.pyawswrapper import (CallbackInstrumentation, Instrumentation,
+                              TracerInstrumentation)
+
+
+@pytest.fixture(scope='module')
+def logger() -> Generator[Logger, None, None]:
+    log = logging.getLogger(__name__)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s : %(message)s')
+    s_handler = StreamHandler()
+    s_handler.setLevel(logging.INFO)
+    s_handler.setFormatter(formatter)
+    log.addHandler(s_handler)
+
+    yield log
+    # end def
+
+
+@pytest.mark.run(order=10)
+def test_instrumentation(logger: Logger):
+
+    logger.info('Instrumentation')
+
+    instrumentation = Instrumentation()
+
+    # no-op
+    with instrumentation.span('dummy', {'key': 'value'}):
+        instrumentation.count('dummy')
+        # end with
+    # end def
+
+
+@pytest.mark.run(order=20)
+def test_callback_instrumentation(logger: Logger):
+
+    logger.info('CallbackInstrumentation')
+
+    spans = []
+    counts = []
+    instrumentation = CallbackInstrumentation(
+        on_span=lambda *args: spans.append(args),
+        on_count=lambda *args: counts.append(args))
+
+    with instrumentation.span('outer', {'key': 'value'}):
+        with instrumentation.span('inner'):
+            instrumentation.count('dummy', 3)
+            # end with
+        # end with
+
+    with pytest.raises(ValueError):
+        with instrumentation.span('error'):
+            raise ValueError('dummy')
+            # end with
+        # end with
+
+    assert [x[0] for x in spans] == ['inner', 'outer', 'error']
+    assert spans[0][2] == {}
+    assert spans[1][2] == {'key': 'value'}
+    assert spans[1][1] >= spans[0][1]
+    assert spans[0][3] is None
+    assert isinstance(spans[2][3], ValueError)
+    assert counts == [('dummy', 3, {})]
+
+    # callbacks are optional
+    with CallbackInstrumentation().span('dummy'):
+        CallbackInstrumentation().count('dummy')
+        # end with
+    # end def
+
+
+@pytest.mark.run(order=30)
+def test_tracer_instrumentation(logger: Logger):
+
+    logger.info('TracerInstrumentation')
+
+    tracer = MagicMock()
+    meter = MagicMock()
+    instrumentation = TracerInstrumentation(tracer, meter)
+
+    with instrumentation.span('dummy', {'key': 'value'}):
+        instrumentation.count('counter', 2, {'key': 'value'})
+        instrumentation.count('counter')
+        # end with
+
+    tracer.start_as_current_span.assert_called_once_with(
+        'dummy', attributes={'key': 'value'})
+    # the counter is created once
+    meter.create_counter.assert_called_once_with('counter')
+    assert meter.create_counter.return_value.add.call_count == 2
+
+    # without a meter, the counters are dropped
+    TracerInstrumentation(tracer).count('counter')
+    # end def
@@ -0,0 +1,121 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+
+import datetime
+import logging
+from logging import Logger, StreamHandler
+from decimal import Decimal
+from typing import Generator
+
+import pandas as pd
+import pytest
+
+from src.pyawswrapper import ParseOptions
+
+
+@pytest.fixture(scope='module')
+def logger() -> Generator[Logger, None, None]:
+    log = logging.getLogger(__name__)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s : %(message)s')
+    s_handler = StreamHandler()
+    s_handler.setLevel(logging.INFO)
+    s_handler.setFormatter(formatter)
+    log.addHandler(s_handler)
+
+    yield log
+    # end def
+
+
+@pytest.fixture(scope='module')
+def test_df() -> Generator[pd.DataFrame, None, None]:
+
+    test_df = pd.DataFrame({'small': [1, 2, 3],
+                            'large': [1, 2, 2 ** 40],
+                            'exact': [0.5, 1.25, None],
+                            'inexact': [0.1, 0.2, 0.3],
+                            'name': ['a', 'b', None]})
+
+    yield test_df
+    # end def
+
+
+@pytest.mark.run(order=10)
+def test_init(logger: Logger):
+
+    logger.info('ParseOptions')
+
+    with pytest.raises(ValueError):
+        ParseOptions(string_dtype='dummy')
+        # end with
+    # end def
+
+
+@pytest.mark.run(order=20)
+def test_read_csv_kwargs(logger: Logger):
+
+    logger.info('read_csv_kwargs')
+
+    assert ParseOptions().read_csv_kwargs({'sep': ','}) == {'sep': ','}
+    assert ParseOptions(engine='pyarrow', dtype_backend='pyarrow').read_csv_kwargs({}) == {
+        'engine': 'pyarrow', 'dtype_backend': 'pyarrow'}
+    # the caller takes priority
+    assert ParseOptions(engine='pyarrow').read_csv_kwargs({'engine': 'c'}) == {
+        'engine': 'c'}
+    # end def
+
+
+@pytest.mark.run(order=30)
+def test_compact(test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('compact')
+
+    # nothing to do
+    assert ParseOptions().compact(test_df) is test_df
+
+    result_df = ParseOptions(string_dtype='category',
+                             downcast=True).compact(test_df)
+
+    assert str(result_df['small'].dtype) == 'int8'
+    assert str(result_df['large'].dtype) == 'int64'
+    assert str(result_df['exact'].dtype) == 'float32'
+    # float32 changes the values
+    assert str(result_df['inexact'].dtype) == 'float64'
+    assert str(result_df['name'].dtype) == 'category'
+    pd.testing.assert_frame_equal(result_df.astype(test_df.dtypes.to_dict()), test_df)
+    # the original is left as it is
+    assert str(test_df['small'].dtype) == 'int64'
+
+    # dtype of the caller
+    result_df = ParseOptions(string_dtype='category', downcast=True).compact(
+        test_df, {'small': 'int64', 'name': 'string'})
+    assert str(result_df['small'].dtype) == 'int64'
+    assert str(result_df['name'].dtype) != 'category'
+    # end def
+
+
+@pytest.mark.run(order=40)
+def test_compact_object(logger: Logger):
+
+    logger.info('compact: object columns')
+
+    test_df = pd.DataFrame({'decimal': [Decimal('1.10'), None, Decimal('2.25')],
+                            'date': [datetime.date(2024, 1, 1), datetime.date(2024, 1, 2), None],
+                            'array': [[1, 2], [3], None],
+                            'name': ['a', None, 'c']})
+
+    for string_dtype in ['string', 'category']:
+        result_df = ParseOptions(string_dtype=string_dtype,
+                                 downcast=True).compact(test_df)
+
+        # only the strings are converted
+        assert str(result_df['name'].dtype) == string_dtype
+        for name in ['decimal', 'date', 'array']:
+            pd.testing.assert_series_equal(result_df[name], test_df[name])
+            # end for
+        # end for
+    # end def
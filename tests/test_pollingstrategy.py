@@ -0,0 +1,101 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+
+import logging
+from logging import Logger, StreamHandler
+from typing import Generator
+
+import pytest
+
+from src.pyawswrapper import BackoffPolling, FixedPolling, PollingStrategy
+
+
+@pytest.fixture(scope='module')
+def logger() -> Generator[Logger, None, None]:
+    log = logging.getLogger(__name__)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s : %(message)s')
+    s_handler = StreamHandler()
+    s_handler.setLevel(logging.INFO)
+    s_handler.setFormatter(formatter)
+    log.addHandler(s_handler)
+
+    yield log
+    # end def
+
+
+@pytest.mark.run(order=10)
+def test_fixed_polling(logger: Logger):
+
+    logger.info('FixedPolling')
+
+    strategy = FixedPolling(3)
+
+    assert strategy.wait_time(0, []) == 3
+    assert strategy.wait_time(10, []) == 3
+    # end def
+
+
+@pytest.mark.run(order=20)
+def test_backoff_polling(logger: Logger):
+
+    logger.info('BackoffPolling')
+
+    strategy = BackoffPolling(
+        initial_time=0.5, max_time=4, multiplier=2, jitter=0, use_engine_hint=False)
+
+    assert [strategy.wait_time(x, []) for x in range(5)] == [0.5, 1, 2, 4, 4]
+    # end def
+
+
+@pytest.mark.run(order=30)
+def test_backoff_polling_jitter(logger: Logger):
+
+    logger.info('BackoffPolling jitter')
+
+    strategy = BackoffPolling(
+        initial_time=1, max_time=4, multiplier=2, jitter=0.1, use_engine_hint=False)
+
+    for _ in range(100):
+        assert 3.6 <= strategy.wait_time(3, []) <= 4.4
+        # end for
+    # end def
+
+
+@pytest.mark.run(order=40)
+@pytest.mark.parametrize('engine_times,expected',
+                         [([], 8),
+                          ([1000], 0.5),
+                          ([100], 0.2),
+                          ([60000, 2000], 1),
+                          ([60000], 8),
+                          # queued queries do not shorten the wait
+                          ([0], 8),
+                          ([0, 60000], 8)])
+def test_backoff_polling_engine_hint(engine_times: list, expected: float, logger: Logger):
+
+    logger.info('BackoffPolling engine hint')
+
+    strategy = BackoffPolling(
+        initial_time=0.2, max_time=8, multiplier=2, jitter=0, hint_ratio=0.5)
+
+    query_executions = [
+        {'Statistics': {'EngineExecutionTimeInMillis': x}} for x in engine_times]
+    assert strategy.wait_time(10, query_executions) == expected
+    # end def
+
+
+@pytest.mark.run(order=50)
+def test_polling_strategy(logger: Logger):
+
+    logger.info('PollingStrategy')
+
+    # wait_time is abstract
+    with pytest.raises(TypeError):
+        PollingStrategy()
+        # end with
+    # end def
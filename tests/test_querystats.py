@@ -0,0 +1,61 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+
+import logging
+from logging import Logger, StreamHandler
+from typing import Generator
+
+import pytest
+
+from src.pyawswrapper import AthenaQueryStats
+
+
+@pytest.fixture(scope='module')
+def logger() -> Generator[Logger, None, None]:
+    log = logging.getLogger(__name__)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s : %(message)s')
+    s_handler = StreamHandler()
+    s_handler.setLevel(logging.INFO)
+    s_handler.setFormatter(formatter)
+    log.addHandler(s_handler)
+
+    yield log
+    # end def
+
+
+@pytest.mark.run(order=10)
+def test_from_query_execution(logger: Logger):
+
+    logger.info('from_query_execution')
+
+    stats = AthenaQueryStats.from_query_execution({
+        'QueryExecutionId': 'dummy-id',
+        'Status': {'State': 'SUCCEEDED'},
+        'Statistics': {'DataScannedInBytes': 1024,
+                       'EngineExecutionTimeInMillis': 300,
+                       'ResultReuseInformation': {'ReusedPreviousResult': True}}})
+
+    assert stats.to_dict() == {'query_id': 'dummy-id',
+                               'state': 'SUCCEEDED',
+                               'data_scanned_in_bytes': 1024,
+                               'engine_execution_time_in_millis': 300,
+                               'query_queue_time_in_millis': None,
+                               'query_planning_time_in_millis': None,
+                               'service_processing_time_in_millis': None,
+                               'total_execution_time_in_millis': None,
+                               'reused_previous_result': True,
+                               'result_size_in_bytes': None}
+
+    # no statistics yet
+    stats = AthenaQueryStats.from_query_execution({
+        'QueryExecutionId': 'dummy-id',
+        'Status': {'State': 'FAILED'}})
+
+    assert stats.data_scanned_in_bytes is None
+    assert not stats.reused_previous_result
+    # end def
@@ -0,0 +1,173 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from logging import Logger, StreamHandler
+from pathlib import Path
+from typing import Generator
+
+import pandas as pd
+import pytest
+
+from src.pyawswrapper import AthenaResultCache
+
+
+@pytest.fixture(scope='module')
+def logger() -> Generator[Logger, None, None]:
+    log = logging.getLogger(__name__)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s : %(message)s')
+    s_handler = StreamHandler()
+    s_handler.setLevel(logging.INFO)
+    s_handler.setFormatter(formatter)
+    log.addHandler(s_handler)
+
+    yield log
+    # end def
+
+
+@pytest.fixture(scope='function')
+def tempdir() -> Generator[Path, None, None]:
+
+    tempdir = Path(tempfile.mkdtemp())
+    yield tempdir
+    if tempdir.exists():
+        shutil.rmtree(tempdir)
+        # end if
+    # end def
+
+
+@pytest.fixture(scope='session')
+def test_df() -> Generator[pd.DataFrame, None, None]:
+
+    test_df = pd.DataFrame([[1, 2, 'a'], [2, 3, 'b'], [5, 6, 'c']], columns=[
+                           'column_a', 'column_b', 'column_c'])
+
+    yield test_df
+    # end def
+
+
+@pytest.mark.run(order=10)
+def test_init(tempdir: Path, logger: Logger):
+
+    logger.info('test init')
+
+    my_cache = AthenaResultCache(tempdir.joinpath('cache'), ttl=10,
+                                 max_bytes=100, file_format='feather')
+
+    assert my_cache.directory == tempdir.joinpath('cache')
+    assert my_cache.directory.exists()
+    assert my_cache.ttl == 10
+    assert my_cache.max_bytes == 100
+    assert my_cache.file_format == 'feather'
+    assert my_cache.metrics == {'hits': 0, 'misses': 0, 'puts': 0, 'evictions': 0}
+
+    with pytest.raises(ValueError):
+        AthenaResultCache(tempdir, file_format='csv')
+        # end with
+    # end def
+
+
+@pytest.mark.run(order=20)
+def test_key(tempdir: Path, logger: Logger):
+
+    logger.info('key')
+
+    my_cache = AthenaResultCache(tempdir)
+
+    key = my_cache.key('SELECT a\n  FROM b;', database='db', workgroup='wg')
+    assert key == my_cache.key('  SELECT a FROM b ', database='db', workgroup='wg')
+    assert key != my_cache.key('SELECT a FROM b', database='db2', workgroup='wg')
+    assert key != my_cache.key('SELECT a FROM b', database='db', workgroup='wg2')
+    assert key != my_cache.key('SELECT a FROM b', database='db', workgroup='wg',
+                               dtype={'a': int})
+    assert key != my_cache.key('SELECT a FROM b', database='db', workgroup='wg',
+                               usecols=['a'])
+
+    # whitespace in quotes is a part of the query
+    key = my_cache.key("SELECT 'a  b'  AS \"c  d\"")
+    assert key == my_cache.key("SELECT 'a  b' AS \"c  d\";")
+    assert key != my_cache.key("SELECT 'a b' AS \"c  d\"")
+    assert key != my_cache.key("SELECT 'a  b' AS \"c d\"")
+    assert my_cache.key("SELECT 'it''s  a'") != my_cache.key("SELECT 'it''s a'")
+    # end def
+
+
+@pytest.mark.run(order=30)
+@pytest.mark.parametrize('file_format', ['parquet', 'feather'])
+def test_get_put(tempdir: Path, test_df: pd.DataFrame, file_format: str, logger: Logger):
+
+    logger.info('get and put')
+
+    my_cache = AthenaResultCache(tempdir, file_format=file_format)
+    key = my_cache.key('SELECT stuff')
+
+    assert my_cache.get(key) is None
+    my_cache.put(key, test_df)
+    pd.testing.assert_frame_equal(my_cache.get(key), test_df)
+
+    # another process sharing the directory
+    pd.testing.assert_frame_equal(
+        AthenaResultCache(tempdir, file_format=file_format).get(key), test_df)
+
+    assert my_cache.metrics == {'hits': 1, 'misses': 1, 'puts': 1, 'evictions': 0}
+    # no temporary file is left
+    assert [x.name for x in tempdir.iterdir()] == [f'{key}.{file_format}']
+    # end def
+
+
+@pytest.mark.run(order=40)
+def test_ttl(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('ttl')
+
+    my_cache = AthenaResultCache(tempdir, ttl=60)
+    key = my_cache.key('SELECT stuff')
+    my_cache.put(key, test_df)
+
+    # written 2 minutes ago
+    written_at = time.time() - 120
+    os.utime(tempdir.joinpath(f'{key}.parquet'), (written_at, written_at))
+
+    assert my_cache.get(key) is None
+    assert not tempdir.joinpath(f'{key}.parquet').exists()
+    # end def
+
+
+@pytest.mark.run(order=50)
+def test_evict(tempdir: Path, test_df: pd.DataFrame, logger: Logger):
+
+    logger.info('evict')
+
+    my_cache = AthenaResultCache(tempdir)
+    keys = [my_cache.key(f'SELECT {x}') for x in range(3)]
+    for index, this_key in enumerate(keys):
+        my_cache.put(this_key, test_df)
+        # accessed in order
+        accessed_at = time.time() - 100 + index
+        os.utime(tempdir.joinpath(f'{this_key}.parquet'), (accessed_at, time.time()))
+        # end for
+
+    # read the oldest one
+    assert my_cache.get(keys[0]) is not None
+
+    file_size = tempdir.joinpath(f'{keys[0]}.parquet').stat().st_size
+    my_cache.max_bytes = file_size * 2
+    my_cache.evict()
+
+    assert my_cache.get(keys[0]) is not None
+    assert my_cache.get(keys[1]) is None
+    assert my_cache.get(keys[2]) is not None
+    assert my_cache.metrics['evictions'] == 1
+
+    my_cache.clear()
+    assert list(tempdir.iterdir()) == []
+    # end def
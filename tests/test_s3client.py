@@ -16,7 +16,8 @@ from unittest.mock import patch
 import pyshellutil
 import pytest
 
-from src.pyawswrapper import ClientErrorException, s3client, s3path
+from src.pyawswrapper import (CallbackInstrumentation, ClientErrorException,
+                              s3client, s3path)
 
 mock_s3_path = 's3://localstack-bucket'
 
@@ -536,3 +537,30 @@ def test_ls_02(tempdir: Path, logger: Logger):
         # end with
 
     # end def
+
+
+@pytest.mark.run(order=180)
+def test_instrumentation(logger: Logger):
+
+    logger.info('instrumentation')
+
+    spans = []
+    counts = []
+    my_s3client = s3client(use_local=True, instrumentation=CallbackInstrumentation(
+        on_span=lambda *args: spans.append(args),
+        on_count=lambda *args: counts.append(args)))
+
+    with patch.object(pyshellutil.ShellCaller, 'call_subprocess', side_effect=pyshellutil.SubprocessErrorException):
+        my_s3client.ls(s3path.join(mock_s3_path, 'ls01/'))
+        # end with
+
+    assert len(spans) == 1
+    name, seconds, attributes, error = spans[0]
+    assert name == 's3client.ls'
+    assert seconds >= 0
+    assert attributes == {'s3client.source': 's3://localstack-bucket/ls01/',
+                          's3client.recursive': False}
+    # handled by exit_code
+    assert error is None
+    assert counts == [('s3client.errors', 1, {'s3client.operation': 'ls'})]
+    # end def
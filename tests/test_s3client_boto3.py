@@ -0,0 +1,686 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from logging import Logger, StreamHandler
+from pathlib import Path
+from typing import Generator
+
+import boto3
+import pytest
+from boto3.s3.transfer import TransferConfig
+
+from src.pyawswrapper import (CallbackInstrumentation, ClientErrorException,
+                              S3Object, SyncPlan, s3client, s3path)
+
+mock_s3_path = 's3://localstack-bucket/boto3'
+
+
+@pytest.fixture(scope='module')
+def logger() -> Generator[Logger, None, None]:
+    log = logging.getLogger(__name__)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s : %(message)s')
+    s_handler = StreamHandler()
+    s_handler.setLevel(logging.INFO)
+    s_handler.setFormatter(formatter)
+    log.addHandler(s_handler)
+
+    yield log
+    # end def
+
+
+@pytest.fixture(scope='module')
+def tempdir() -> Generator[Path, None, None]:
+
+    tempdir = Path(tempfile.mkdtemp())
+    tempdir.joinpath('dir1').mkdir()
+    for this_name in ['file1.txt', 'file2.txt', 'dir1/file3.txt', 'dir1/file4.txt']:
+        tempdir.joinpath(this_name).write_text(Path(this_name).stem)
+        # end for
+    yield tempdir
+    if tempdir.exists():
+        shutil.rmtree(tempdir)
+        # end if
+    # end def
+
+
+def clear(s3target: str):
+    # the local S3 stand-in keeps the objects of the previous runs
+    my_client = boto3.client('s3', endpoint_url=s3client._local_endpoint_url)
+    for this_object in s3client(use_local=True).ls_iter(s3target + '/', recursive=True):
+        my_client.delete_object(Bucket=this_object.bucket, Key=this_object.key)
+        # end for
+    # end def
+
+
+@pytest.mark.run(order=10)
+def test_init(logger: Logger):
+
+    logger.info('test init')
+
+    my_s3client = s3client(use_local=True, backend='boto3')
+    assert my_s3client.backend == 'boto3'
+    assert isinstance(my_s3client.transfer_config, TransferConfig)
+
+    my_config = TransferConfig(max_concurrency=4)
+    my_s3client.transfer_config = my_config
+    assert my_s3client.transfer_config is my_config
+
+    assert s3client(use_local=True).backend == 'subprocess'
+
+    with pytest.raises(ValueError):
+        s3client(use_local=True, backend='dummy')
+        # end with
+    # end def
+
+
+@pytest.mark.run(order=20)
+def test_UpTos3_01(tempdir: Path, logger: Logger):
+
+    logger.info('UpTos3')
+
+    my_s3client = s3client(use_local=True, backend='boto3')
+    test_prefix = 'Up01'
+
+    result = my_s3client.UpTos3(
+        tempdir.joinpath('file1.txt'), s3path.join(mock_s3_path, test_prefix))
+
+    assert my_s3client.exit_code == 0
+    assert result == f'upload: {tempdir.joinpath("file1.txt")} to {mock_s3_path}/{test_prefix}/file1.txt\n'
+
+    _, files = my_s3client.ls(s3path.join(mock_s3_path, test_prefix) + '/')
+    assert files == ['file1.txt']
+    # end def
+
+
+@pytest.mark.run(order=30)
+def test_UpTos3_02(tempdir: Path, logger: Logger):
+
+    logger.info('UpTos3: recursive')
+
+    my_s3client = s3client(profile='default', use_local=True, backend='boto3')
+    test_prefix = 'Up02'
+
+    my_s3client.UpTos3(
+        tempdir, s3path.join(mock_s3_path, test_prefix), recursive=True)
+
+    assert my_s3client.exit_code == 0
+    prefixes, files = my_s3client.ls(
+        s3path.join(mock_s3_path, test_prefix) + '/')
+    assert ['file1.txt', 'file2.txt'] == files
+    assert ['dir1/'] == prefixes
+    # end def
+
+
+@pytest.mark.run(order=40)
+def test_UpTos3_03(tempdir: Path, logger: Logger):
+
+    logger.info('UpTos3: exclude and include')
+
+    my_s3client = s3client(use_local=True, backend='boto3')
+    test_prefix = 'Up03'
+
+    my_s3client.UpTos3(
+        tempdir, s3path.join(mock_s3_path, test_prefix),
+        recursive=True, exclude='*', include='**/file3*',
+        profile_overwrite='default')
+
+    prefixes, files = my_s3client.ls(
+        s3path.join(mock_s3_path, test_prefix) + '/', recursive=True)
+    assert prefixes == []
+    assert files == ['boto3/Up03/dir1/file3.txt']
+    # end def
+
+
+@pytest.mark.run(order=50)
+def test_GetFroms3_01(tempdir: Path, logger: Logger):
+
+    logger.info('GetFroms3')
+
+    my_s3client = s3client(use_local=True, backend='boto3')
+    test_prefix = 'Get01'
+
+    my_s3client.UpTos3(
+        tempdir, s3path.join(mock_s3_path, test_prefix),
+        recursive=True, exclude='Get*')
+    get_to = tempdir.joinpath(test_prefix)
+    get_to.mkdir(parents=True, exist_ok=True)
+
+    my_s3client.GetFroms3(
+        s3path.join(mock_s3_path, test_prefix), get_to.joinpath('file1.txt'))
+
+    assert my_s3client.exit_code == 0
+    assert get_to.joinpath('file1.txt').read_text() == 'file1'
+    # end def
+
+
+@pytest.mark.run(order=60)
+def test_GetFroms3_02(tempdir: Path, logger: Logger):
+
+    logger.info('GetFroms3: recursive')
+
+    my_s3client = s3client(use_local=True, backend='boto3')
+    test_prefix = 'Get02'
+
+    my_s3client.UpTos3(
+        tempdir, s3path.join(mock_s3_path, test_prefix),
+        recursive=True, exclude='Get*')
+    get_to = tempdir.joinpath(test_prefix)
+
+    my_s3client.GetFroms3(
+        s3path.join(mock_s3_path, test_prefix), get_to, recursive=True)
+
+    assert my_s3client.exit_code == 0
+    assert get_to.joinpath('file1.txt').exists()
+    assert get_to.joinpath('dir1', 'file4.txt').read_text() == 'file4'
+
+    get_to = tempdir.joinpath(f'{test_prefix}_filtered')
+    my_s3client.GetFroms3(
+        s3path.join(mock_s3_path, test_prefix), get_to, recursive=True,
+        exclude='*', include='dir1/file*.txt')
+
+    assert not get_to.joinpath('file1.txt').exists()
+    assert get_to.joinpath('dir1', 'file3.txt').exists()
+    assert get_to.joinpath('dir1', 'file4.txt').exists()
+    # end def
+
+
+@pytest.mark.run(order=70)
+def test_GetFroms3_03(tempdir: Path, logger: Logger):
+
+    logger.info('GetFroms3: error')
+
+    my_s3client = s3client(use_local=True, backend='boto3')
+    test_prefix = 'Get03'
+    get_to = tempdir.joinpath(test_prefix)
+
+    my_s3client.GetFroms3(
+        s3path.join(mock_s3_path, test_prefix, 'nofile.txt'), get_to)
+
+    assert my_s3client.exit_code != 0
+
+    my_s3client.error_as_exception = True
+    with pytest.raises(ClientErrorException):
+        my_s3client.GetFroms3(
+            s3path.join(mock_s3_path, test_prefix, 'nofile.txt'), get_to)
+        # end with
+    # end def
+
+
+@pytest.mark.run(order=80)
+def test_ls_01(tempdir: Path, logger: Logger):
+
+    logger.info('ls')
+
+    my_s3client = s3client(use_local=True, backend='boto3')
+    test_prefix = 'ls01'
+
+    my_s3client.UpTos3(
+        tempdir, s3path.join(mock_s3_path, test_prefix),
+        recursive=True, exclude='Get*')
+
+    prefixes, files = my_s3client.ls(
+        s3path.join(mock_s3_path, test_prefix + '/'), recursive=True,
+        profile_overwrite='default')
+
+    assert prefixes == []
+    assert set(files) == set([
+        'boto3/ls01/file1.txt',
+        'boto3/ls01/file2.txt',
+        'boto3/ls01/dir1/file3.txt',
+        'boto3/ls01/dir1/file4.txt'])
+
+    # partial names like `aws s3 ls`
+    prefixes, files = my_s3client.ls(
+        s3path.join(mock_s3_path, test_prefix, 'fi'))
+    assert prefixes == []
+    assert files == ['file1.txt', 'file2.txt']
+    # end def
+
+
+@pytest.mark.run(order=90)
+def test_ls_02(logger: Logger):
+
+    logger.info('ls: error')
+
+    my_s3client = s3client(use_local=True, backend='boto3')
+
+    prefixes, files = my_s3client.ls('s3://no-such-bucket/ls02/')
+
+    assert my_s3client.exit_code != 0
+    assert prefixes == []
+    assert files == []
+
+    my_s3client.error_as_exception = True
+    with pytest.raises(ClientErrorException):
+        my_s3client.ls('s3://no-such-bucket/ls02/')
+        # end with
+    # end def
+
+
+@pytest.mark.run(order=100)
+def test_ls_iter_01(tempdir: Path, logger: Logger):
+
+    logger.info('ls_iter')
+
+    # ls_iter does not depend on backend
+    my_s3client = s3client(use_local=True)
+    test_prefix = 'ls_iter01'
+
+    s3client(use_local=True, backend='boto3').UpTos3(
+        tempdir, s3path.join(mock_s3_path, test_prefix),
+        recursive=True, exclude='*', include='file*')
+
+    iterator = my_s3client.ls_iter(
+        s3path.join(mock_s3_path, test_prefix) + '/', recursive=True, page_size=1)
+    first = next(iterator)
+    objects = [first] + list(iterator)
+
+    assert my_s3client.exit_code == 0
+    assert [x.key for x in objects] == [
+        'boto3/ls_iter01/file1.txt', 'boto3/ls_iter01/file2.txt']
+    assert isinstance(first, S3Object)
+    assert first.bucket == 'localstack-bucket'
+    assert first.uri == f'{mock_s3_path}/{test_prefix}/file1.txt'
+    assert first.size == len('file1')
+    assert first.etag == hashlib.md5(b'file1').hexdigest()
+    assert first.last_modified is not None
+    assert not first.is_prefix
+    # end def
+
+
+@pytest.mark.run(order=110)
+def test_ls_iter_02(tempdir: Path, logger: Logger):
+
+    logger.info('ls_iter: prefix mode')
+
+    my_s3client = s3client(use_local=True)
+    test_prefix = 'ls_iter02'
+
+    s3client(use_local=True, backend='boto3').UpTos3(
+        tempdir, s3path.join(mock_s3_path, test_prefix),
+        recursive=True, exclude='Get*')
+
+    objects = list(my_s3client.ls_iter(
+        s3path.join(mock_s3_path, test_prefix) + '/'))
+
+    assert [(x.key, x.is_prefix) for x in objects] == [
+        ('boto3/ls_iter02/dir1/', True),
+        ('boto3/ls_iter02/file1.txt', False),
+        ('boto3/ls_iter02/file2.txt', False)]
+    assert objects[0] == S3Object('localstack-bucket', 'boto3/ls_iter02/dir1/')
+    assert objects[0].to_dict() == {'bucket': 'localstack-bucket', 'key': 'boto3/ls_iter02/dir1/',
+                                    'size': None, 'etag': None, 'last_modified': None}
+    # end def
+
+
+@pytest.mark.run(order=120)
+def test_ls_iter_03(logger: Logger):
+
+    logger.info('ls_iter: error')
+
+    my_s3client = s3client(use_local=True)
+
+    assert list(my_s3client.ls_iter('s3://no-such-bucket/ls_iter03/')) == []
+    assert my_s3client.exit_code != 0
+
+    # a consumer that stops early does not see the previous exit_code
+    for _ in my_s3client.ls_iter(s3path.join(mock_s3_path, 'ls_iter01') + '/', recursive=True):
+        break
+        # end for
+    assert my_s3client.exit_code == 0
+
+    my_s3client.error_as_exception = True
+    with pytest.raises(ClientErrorException):
+        list(my_s3client.ls_iter('s3://no-such-bucket/ls_iter03/'))
+        # end with
+
+    # one span for the whole iteration
+    spans = []
+    my_s3client.instrumentation = CallbackInstrumentation(
+        on_span=lambda *args: spans.append(args))
+    with pytest.raises(ClientErrorException):
+        list(my_s3client.ls_iter('s3://no-such-bucket/ls_iter03/'))
+        # end with
+    for _ in my_s3client.ls_iter(s3path.join(mock_s3_path, 'ls_iter01') + '/', recursive=True):
+        break
+        # end for
+    assert [(x[0], x[2]) for x in spans] == [
+        ('s3client.ls_iter', {'s3client.source': 's3://no-such-bucket/ls_iter03/',
+                              's3client.recursive': False}),
+        ('s3client.ls_iter', {'s3client.source': f'{mock_s3_path}/ls_iter01/',
+                              's3client.recursive': True})]
+    assert isinstance(spans[0][3], ClientErrorException)
+    # stopping early is not an error
+    assert spans[1][3] is None
+    # end def
+
+
+@pytest.mark.run(order=130)
+def test_ls_parallel_01(tempdir: Path, logger: Logger):
+
+    logger.info('ls_parallel')
+
+    my_s3client = s3client(use_local=True)
+    test_prefix = 'ls_parallel01'
+
+    s3client(use_local=True, backend='boto3').UpTos3(
+        tempdir, s3path.join(mock_s3_path, test_prefix),
+        recursive=True, exclude='Get*')
+    s3client(use_local=True, backend='boto3').UpTos3(
+        tempdir.joinpath('dir1'), s3path.join(mock_s3_path, test_prefix, 'dir1', 'dir2'),
+        recursive=True)
+
+    s3target = s3path.join(mock_s3_path, test_prefix) + '/'
+    expected = [x.key for x in my_s3client.ls_iter(s3target, recursive=True)]
+    assert len(expected) == 6
+
+    for max_depth in [0, 1, 2, 5]:
+        for max_concurrency in [1, 4]:
+            assert my_s3client.ls_parallel(
+                s3target, max_depth=max_depth, max_concurrency=max_concurrency) == ([], expected)
+            assert my_s3client.exit_code == 0
+
+            objects = list(my_s3client.ls_parallel_iter(
+                s3target, max_depth=max_depth, max_concurrency=max_concurrency))
+            assert sorted(x.key for x in objects) == expected
+            assert all(not x.is_prefix for x in objects)
+            # end for
+        # end for
+
+    # without the trailing '/'
+    assert my_s3client.ls_parallel(s3target.rstrip('/')) == ([], expected)
+
+    # the consumer can stop early
+    iterator = my_s3client.ls_parallel_iter(s3target, max_concurrency=2)
+    assert next(iterator).key in expected
+    iterator.close()
+
+    with pytest.raises(ValueError):
+        list(my_s3client.ls_parallel_iter(s3target, max_concurrency=0))
+        # end with
+    # end def
+
+
+@pytest.mark.run(order=140)
+def test_ls_parallel_02(logger: Logger):
+
+    logger.info('ls_parallel: error')
+
+    my_s3client = s3client(use_local=True)
+
+    assert my_s3client.ls_parallel('s3://no-such-bucket/ls_parallel02/') == ([], [])
+    assert my_s3client.exit_code != 0
+
+    # a consumer that stops early does not see the previous exit_code
+    for _ in my_s3client.ls_parallel_iter(s3path.join(mock_s3_path, 'ls_parallel01') + '/'):
+        break
+        # end for
+    assert my_s3client.exit_code == 0
+
+    my_s3client.error_as_exception = True
+    with pytest.raises(ClientErrorException):
+        list(my_s3client.ls_parallel_iter('s3://no-such-bucket/ls_parallel02/'))
+        # end with
+
+    # one span for the whole iteration
+    spans = []
+    my_s3client.instrumentation = CallbackInstrumentation(
+        on_span=lambda *args: spans.append(args))
+    with pytest.raises(ClientErrorException):
+        list(my_s3client.ls_parallel_iter('s3://no-such-bucket/ls_parallel02/'))
+        # end with
+    for _ in my_s3client.ls_parallel_iter(s3path.join(mock_s3_path, 'ls_parallel01') + '/', max_depth=1):
+        break
+        # end for
+    assert [(x[0], x[2]) for x in spans] == [
+        ('s3client.ls_parallel_iter', {'s3client.source': 's3://no-such-bucket/ls_parallel02/',
+                                       's3client.max_depth': 2, 's3client.max_concurrency': 8}),
+        ('s3client.ls_parallel_iter', {'s3client.source': f'{mock_s3_path}/ls_parallel01/',
+                                       's3client.max_depth': 1, 's3client.max_concurrency': 8})]
+    assert isinstance(spans[0][3], ClientErrorException)
+    # stopping early is not an error
+    assert spans[1][3] is None
+    # end def
+
+
+@pytest.mark.run(order=150)
+def test_sync_up(tempdir: Path, logger: Logger):
+
+    logger.info('sync_up')
+
+    my_s3client = s3client(use_local=True, error_as_exception=True, backend='boto3')
+    test_prefix = 'sync_up'
+    source = tempdir.joinpath(test_prefix)
+    shutil.copytree(tempdir, source, ignore=shutil.ignore_patterns('Get*', 'sync*', 'ls*'))
+    s3target = s3path.join(mock_s3_path, test_prefix)
+    clear(s3target)
+
+    plan = my_s3client.sync_up(source, s3target, dry_run=True)
+    assert isinstance(plan, SyncPlan)
+    assert not plan.executed
+    assert [(x.action, x.reason) for x in plan.actions] == [('upload', 'new')] * 4
+    assert plan.bytes_to_transfer == 20
+    assert my_s3client.ls(s3target + '/') == ([], [])
+
+    plan = my_s3client.sync_up(source, s3target)
+    assert plan.executed
+    assert my_s3client.exit_code == 0
+    assert len(my_s3client.ls(s3target + '/', recursive=True)[1]) == 4
+
+    plan = my_s3client.sync_up(source, s3target)
+    assert plan.is_empty
+    assert plan.unchanged == 4
+
+    # changed size, changed content of the same size, newer mtime
+    source.joinpath('file1.txt').write_text('file1 changed')
+    source.joinpath('file2.txt').write_text('FILE2')
+    future = source.joinpath('dir1', 'file3.txt').stat().st_mtime + 3600
+    os.utime(source.joinpath('dir1', 'file3.txt'), (future, future))
+    os.utime(source.joinpath('file2.txt'), (0, 0))
+
+    plan = my_s3client.sync_up(source, s3target, dry_run=True)
+    assert {x.source: x.reason for x in plan.actions} == {
+        str(source.joinpath('file1.txt')): 'size',
+        str(source.joinpath('dir1', 'file3.txt')): 'mtime'}
+
+    plan = my_s3client.sync_up(source, s3target, compare='etag')
+    assert {x.source: x.reason for x in plan.actions} == {
+        str(source.joinpath('file1.txt')): 'size',
+        str(source.joinpath('file2.txt')): 'etag'}
+    assert my_s3client.sync_up(source, s3target, compare='etag').unchanged == 4
+
+    # delete and filters
+    source.joinpath('dir1', 'file4.txt').unlink()
+    plan = my_s3client.sync_up(
+        source, s3target, delete=True, exclude='file*', compare='etag')
+    assert [(x.action, x.source) for x in plan.actions] == [
+        ('delete', f'{s3target}/dir1/file4.txt')]
+    _, files = my_s3client.ls(s3target + '/', recursive=True)
+    assert sorted(files) == ['boto3/sync_up/dir1/file3.txt',
+                             'boto3/sync_up/file1.txt', 'boto3/sync_up/file2.txt']
+
+    with pytest.raises(ValueError):
+        my_s3client.sync_up(source, s3target, compare='dummy')
+        # end with
+    # end def
+
+
+@pytest.mark.run(order=160)
+def test_sync_down(tempdir: Path, logger: Logger):
+
+    logger.info('sync_down')
+
+    my_s3client = s3client(use_local=True, error_as_exception=True, backend='boto3')
+    test_prefix = 'sync_down'
+    s3target = s3path.join(mock_s3_path, test_prefix)
+    clear(s3target)
+    source = tempdir.joinpath(f'{test_prefix}_source')
+    shutil.copytree(tempdir, source, ignore=shutil.ignore_patterns('Get*', 'sync*', 'ls*'))
+    my_s3client.UpTos3(source, s3target, recursive=True)
+    get_to = tempdir.joinpath(test_prefix)
+
+    plan = my_s3client.sync_down(s3target, get_to)
+    assert [(x.action, x.reason) for x in plan.actions] == [('download', 'new')] * 4
+    assert get_to.joinpath('dir1', 'file3.txt').read_text() == 'file3'
+
+    plan = my_s3client.sync_down(s3target, get_to)
+    assert plan.is_empty
+    assert plan.unchanged == 4
+
+    get_to.joinpath('file1.txt').write_text('file1 changed')
+    get_to.joinpath('extra.txt').write_text('extra')
+    plan = my_s3client.sync_down(s3target, get_to, delete=True, dry_run=True)
+    assert [(x.action, x.reason) for x in plan.actions] == [
+        ('download', 'size'), ('delete', 'extra')]
+    assert get_to.joinpath('extra.txt').exists()
+
+    my_s3client.sync_down(s3target, get_to, delete=True)
+    assert get_to.joinpath('file1.txt').read_text() == 'file1'
+    assert not get_to.joinpath('extra.txt').exists()
+    # end def
+
+
+@pytest.mark.run(order=170)
+def test_sync_error(tempdir: Path, logger: Logger):
+
+    logger.info('sync: error')
+
+    my_s3client = s3client(use_local=True)
+
+    plan = my_s3client.sync_up(tempdir, 's3://no-such-bucket/sync/')
+    assert my_s3client.exit_code != 0
+    assert not plan.executed
+
+    my_s3client.error_as_exception = True
+    with pytest.raises(ClientErrorException):
+        my_s3client.sync_down('s3://no-such-bucket/sync/', tempdir)
+        # end with
+    # end def
+
+
+@pytest.mark.run(order=180)
+def test_local_etag(tempdir: Path, logger: Logger):
+
+    logger.info('local etag')
+
+    local_path = tempdir.joinpath('etag.bin')
+    local_path.write_bytes(b'a' * 10 + b'b' * 5)
+
+    assert s3client._local_etag(local_path, 15, 'dummy', 10) == hashlib.md5(
+        b'a' * 10 + b'b' * 5).hexdigest()
+    multipart = hashlib.md5(hashlib.md5(b'a' * 10).digest() +
+                            hashlib.md5(b'b' * 5).digest()).hexdigest()
+    assert s3client._local_etag(local_path, 15, 'dummy-2', 10) == f'{multipart}-2'
+    # the part size is unknown
+    assert s3client._local_etag(local_path, 15, 'dummy-3', 10) is None
+    assert s3client._local_etag(local_path, 15, None, 10) is None
+    local_path.unlink()
+    # end def
+
+
+@pytest.mark.run(order=190)
+def test_upload_many(tempdir: Path, logger: Logger):
+
+    logger.info('upload_many')
+
+    my_s3client = s3client(use_local=True, backend='boto3')
+    test_prefix = 'upload_many'
+    s3target = s3path.join(mock_s3_path, test_prefix)
+    clear(s3target)
+
+    source = tempdir.joinpath(test_prefix)
+    source.mkdir()
+    pairs = []
+    for x in range(20):
+        source.joinpath(f'file{x}.txt').write_text(f'file{x}')
+        pairs.append((source.joinpath(f'file{x}.txt'),
+                      s3path.join(s3target, f'dir{x % 3}', f'file{x}.txt')))
+        # end for
+    source.joinpath('empty.txt').touch()
+    pairs.append((source.joinpath('empty.txt'), s3path.join(s3target, 'empty.txt')))
+
+    results = my_s3client.upload_many(pairs)
+
+    assert my_s3client.exit_code == 0
+    assert [(x.source, x.destination) for x in results] == [
+        (str(x), str(y)) for x, y in pairs]
+    assert all(x.succeeded for x in results)
+    assert results[10].size == len('file10')
+    assert results[10].seconds >= 0
+    assert results[-1].size == 0
+    _, files = my_s3client.ls(s3target + '/', recursive=True)
+    assert len(files) == 21
+
+    # a failure does not stop the others
+    failed_pairs = [(source.joinpath('nofile.txt'), s3path.join(s3target, 'nofile.txt'))] + pairs[:3]
+    results = my_s3client.upload_many(failed_pairs)
+    assert my_s3client.exit_code != 0
+    assert [x.succeeded for x in results] == [False, True, True, True]
+    assert results[0].error is not None
+
+    my_s3client.error_as_exception = True
+    with pytest.raises(ClientErrorException) as e:
+        my_s3client.upload_many(failed_pairs)
+        # end with
+    # the results of all the pairs are kept
+    assert [x.succeeded for x in e.value.results] == [False, True, True, True]
+    # end def
+
+
+@pytest.mark.run(order=200)
+def test_download_many(tempdir: Path, logger: Logger):
+
+    logger.info('download_many')
+
+    my_s3client = s3client(use_local=True, backend='boto3')
+    test_prefix = 'upload_many'
+    s3target = s3path.join(mock_s3_path, test_prefix)
+    get_to = tempdir.joinpath('download_many')
+
+    pairs = [(s3path.join(s3target, f'dir{x % 3}', f'file{x}.txt'),
+              get_to.joinpath(f'dir{x % 3}', f'file{x}.txt')) for x in range(20)]
+    results = my_s3client.download_many(pairs)
+
+    assert my_s3client.exit_code == 0
+    assert all(x.succeeded for x in results)
+    assert get_to.joinpath('dir1', 'file10.txt').read_text() == 'file10'
+    assert results[10].size == len('file10')
+
+    results = my_s3client.download_many(
+        [(s3path.join(s3target, 'nofile.txt'), get_to.joinpath('nofile.txt'))] + pairs[:2])
+    assert [x.succeeded for x in results] == [False, True, True]
+    assert not get_to.joinpath('nofile.txt').exists()
+    # end def
+
+
+@pytest.mark.run(order=210)
+def test_transfer_many_stop_on_error(tempdir: Path, logger: Logger):
+
+    logger.info('transfer many: stop_on_error')
+
+    # one thread, so the transfers after the failure are still queued
+    my_s3client = s3client(use_local=True, backend='boto3',
+                           transfer_config=TransferConfig(max_concurrency=1))
+    s3target = s3path.join(mock_s3_path, 'upload_many')
+    get_to = tempdir.joinpath('stop_on_error')
+
+    pairs = [(s3path.join(s3target, 'nofile.txt'), get_to.joinpath('nofile.txt'))] + \
+        [(s3path.join(s3target, f'dir{x % 3}', f'file{x}.txt'),
+          get_to.joinpath(f'file{x}.txt')) for x in range(20)]
+    results = my_s3client.download_many(pairs, stop_on_error=True)
+
+    assert my_s3client.exit_code != 0
+    assert not results[0].succeeded
+    assert not results[-1].succeeded
+    assert not get_to.joinpath('file19.txt').exists()
+    # end def
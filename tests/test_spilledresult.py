@@ -0,0 +1,96 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+
+import logging
+import shutil
+import tempfile
+from logging import Logger, StreamHandler
+from pathlib import Path
+from typing import Generator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.pyawswrapper import SpilledResult
+
+
+@pytest.fixture(scope='module')
+def logger() -> Generator[Logger, None, None]:
+    log = logging.getLogger(__name__)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s : %(message)s')
+    s_handler = StreamHandler()
+    s_handler.setLevel(logging.INFO)
+    s_handler.setFormatter(formatter)
+    log.addHandler(s_handler)
+
+    yield log
+    # end def
+
+
+@pytest.fixture(scope='module')
+def tempdir() -> Generator[Path, None, None]:
+
+    tempdir = Path(tempfile.mkdtemp())
+    yield tempdir
+    if tempdir.exists():
+        shutil.rmtree(tempdir)
+        # end if
+    # end def
+
+
+@pytest.mark.run(order=10)
+def test_write_and_load(tempdir: Path, logger: Logger):
+
+    logger.info('SpilledResult')
+
+    test_df = pd.DataFrame([[1, 'a'], [2, 'b']], columns=[
+                           'column_a', 'column_b'], index=[5, 6])
+
+    spilled = SpilledResult.write(tempdir.joinpath('spill'), test_df)
+
+    assert spilled.path.exists()
+    # no temporary file is left
+    assert list(tempdir.joinpath('spill').iterdir()) == [spilled.path]
+
+    pd.testing.assert_frame_equal(
+        spilled.load(), test_df.reset_index(drop=True))
+    pd.testing.assert_frame_equal(
+        spilled.load(columns=['column_b']), test_df[['column_b']].reset_index(drop=True))
+
+    table = spilled.read_table()
+    assert table.num_rows == 2
+    assert table.column_names == ['column_a', 'column_b']
+
+    # a handle can be made from the path
+    pd.testing.assert_frame_equal(
+        SpilledResult(str(spilled.path)).load(), spilled.load())
+
+    spilled.remove()
+    assert not spilled.path.exists()
+    # end def
+
+
+@pytest.mark.run(order=20)
+def test_memory_map(tempdir: Path, logger: Logger):
+
+    logger.info('SpilledResult: memory map')
+
+    test_df = pd.DataFrame({'column_a': np.arange(2 ** 20)})
+    spilled = SpilledResult.write(tempdir.joinpath('spill'), test_df)
+
+    allocated = pa.total_allocated_bytes()
+    table = spilled.read_table()
+    # the 8 MiB column stays in the file
+    assert pa.total_allocated_bytes() - allocated < 1024 ** 2
+    assert table.column('column_a').to_numpy()[-1] == 2 ** 20 - 1
+
+    del table
+    spilled.remove()
+    # end def
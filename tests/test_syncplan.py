@@ -0,0 +1,58 @@
+# coding:utf-8
+# ---------------------------------------------------------------------------
+# author = 'Satoshi Imai'
+# credits = ['Satoshi Imai']
+# version = '0.10.0'
+# ---------------------------------------------------------------------------
+
+import logging
+from logging import Logger, StreamHandler
+from typing import Generator
+
+import pytest
+
+from src.pyawswrapper import SyncAction, SyncPlan
+
+
+@pytest.fixture(scope='module')
+def logger() -> Generator[Logger, None, None]:
+    log = logging.getLogger(__name__)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s : %(message)s')
+    s_handler = StreamHandler()
+    s_handler.setLevel(logging.INFO)
+    s_handler.setFormatter(formatter)
+    log.addHandler(s_handler)
+
+    yield log
+    # end def
+
+
+@pytest.mark.run(order=10)
+def test_plan(logger: Logger):
+
+    logger.info('plan')
+
+    plan = SyncPlan('up', '/tmp/dummy', 's3://dummy-bucket/dummy')
+    assert plan.is_empty
+    assert plan.bytes_to_transfer == 0
+
+    plan.actions.append(SyncAction(
+        'upload', '/tmp/dummy/file1.txt', 's3://dummy-bucket/dummy/file1.txt', 10, 'new'))
+    plan.actions.append(SyncAction(
+        'upload', '/tmp/dummy/file2.txt', 's3://dummy-bucket/dummy/file2.txt', 20, 'size'))
+    plan.actions.append(SyncAction(
+        'delete', 's3://dummy-bucket/dummy/file3.txt', None, 30, 'extra'))
+    plan.unchanged = 2
+
+    assert not plan.is_empty
+    assert [x.reason for x in plan.transfers] == ['new', 'size']
+    assert [x.reason for x in plan.deletes] == ['extra']
+    # deletes are not transferred
+    assert plan.bytes_to_transfer == 30
+    assert repr(plan) == ("SyncPlan(direction='up', source='/tmp/dummy', destination='s3://dummy-bucket/dummy', "
+                          'transfers=2, deletes=1, unchanged=2, executed=False)')
+    assert plan.to_dict()['actions'][2] == {
+        'action': 'delete', 'source': 's3://dummy-bucket/dummy/file3.txt', 'destination': None,
+        'size': 30, 'reason': 'extra', 'last_modified': None}
+    # end def